@@ -0,0 +1,133 @@
+import logging
+import threading
+
+from flask import current_app, g, jsonify, request
+
+from routing import MUTATING_METHODS
+
+logger = logging.getLogger(__name__)
+
+# Route classes, most important first
+CHECKOUT = 'checkout'
+WRITE = 'write'
+READ = 'read'
+REPORT = 'report'
+
+DEFAULT_LIMITS = {CHECKOUT: 32, WRITE: 16, READ: 16, REPORT: 2}
+# How long a request may wait for a slot before it is shed (checkout queues, reports never do)
+DEFAULT_WAIT_SECONDS = {CHECKOUT: 5.0, WRITE: 1.0, READ: 0.25, REPORT: 0.0}
+
+
+def admission_class(name):
+    """Put a view in an admission class (``None`` exempts it, e.g. long polls).
+
+    Views without one are ``write`` for mutating methods and ``read`` otherwise.
+    Apply it below ``@app.route``.
+    """
+    def decorator(view):
+        view.admission_class = name
+        return view
+    return decorator
+
+
+class _RouteClass:
+    def __init__(self, limit, wait_seconds):
+        self.limit = limit
+        self.wait_seconds = wait_seconds
+        self.slots = threading.BoundedSemaphore(limit)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+
+    def acquire(self):
+        with self.lock:
+            self.waiting += 1
+        admitted = self.slots.acquire(timeout=self.wait_seconds) if self.wait_seconds > 0 else self.slots.acquire(blocking=False)
+        with self.lock:
+            self.waiting -= 1
+            if admitted:
+                self.in_flight += 1
+                self.admitted += 1
+            else:
+                self.shed += 1
+        return admitted
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+        self.slots.release()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'limit': self.limit,
+                'inFlight': self.in_flight,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'shed': self.shed
+            }
+
+
+class AdmissionControl:
+    """Bound the number of in-flight requests per route class in this worker.
+
+    When the database slows down, requests hold their slots longer and new ones
+    wait up to the class's wait time for a free slot; after that they get a ``503``
+    with ``Retry-After`` straight away instead of piling up on the connection
+    pool. Checkout and order writes get the most slots and the longest wait, and
+    reports are shed first, so order-taking and billing stay responsive.
+    Limits (``ADMISSION_LIMITS``) are per worker process.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ADMISSION_CONTROL_ENABLED', False)
+        app.config.setdefault('ADMISSION_LIMITS', {})
+        app.config.setdefault('ADMISSION_WAIT_SECONDS', {})
+        app.config.setdefault('ADMISSION_RETRY_AFTER_SECONDS', 2)
+
+        limits = dict(DEFAULT_LIMITS, **app.config['ADMISSION_LIMITS'])
+        waits = dict(DEFAULT_WAIT_SECONDS, **app.config['ADMISSION_WAIT_SECONDS'])
+        app.extensions['admission'] = {name: _RouteClass(limits[name], waits[name]) for name in DEFAULT_LIMITS}
+
+        if app.config['ADMISSION_CONTROL_ENABLED']:
+            app.before_request(self._before_request)
+            app.teardown_request(self._teardown_request)
+
+    def stats(self):
+        return {name: route_class.stats() for name, route_class in current_app.extensions['admission'].items()}
+
+    def _classify(self):
+        view = current_app.view_functions.get(request.endpoint)
+        if view is None:
+            return None
+        if hasattr(view, 'admission_class'):
+            return view.admission_class
+        return WRITE if request.method in MUTATING_METHODS else READ
+
+    def _before_request(self):
+        name = self._classify()
+        if name is None:
+            return None
+        route_class = current_app.extensions['admission'][name]
+        if not route_class.acquire():
+            logger.warning(f"Shedding {request.method} {request.path} ({name} requests at capacity)")
+            response = jsonify({'error': 'Server is busy, please retry shortly'})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(current_app.config['ADMISSION_RETRY_AFTER_SECONDS'])
+            return response
+        g.admission_class = name
+        return None
+
+    def _teardown_request(self, exc):
+        name = g.pop('admission_class', None)
+        if name is not None:
+            current_app.extensions['admission'][name].release()
+
+
+admission = AdmissionControl()
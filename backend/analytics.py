@@ -0,0 +1,406 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import sqlalchemy as sa
+from flask import current_app
+
+from models import db, Invoice
+from outlets import current_outlet_id
+from partitions import archived_invoice_tables
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+INTERVALS = ('day', 'week', 'month')
+
+# Column name -> dtype. Invoice columns have one entry per invoice, line columns one per order line.
+INVOICE_COLUMNS = {
+    'ts': np.int64,  # UTC seconds since the epoch
+    'local_ts': np.int64,  # same instant as wall-clock seconds in BUSINESS_TIMEZONE
+    'total': np.float64,
+    'order_type': np.int16,  # index into the order type dictionary
+}
+LINE_COLUMNS = {
+    'invoice': np.int64,  # row of the line's invoice
+    'item': np.int32,  # index into the item dictionary
+    'category': np.int32,  # index into the category dictionary
+    'quantity': np.float64,
+    'amount': np.float64,
+}
+
+_FETCH_CHUNK = 5000
+
+
+def _epoch_seconds(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((value - EPOCH).total_seconds())
+
+
+class _Columns:
+    """Set of equal-length columns. It is never modified: ``extended`` returns a new
+    set, so a reader holding one always sees columns of the same length."""
+
+    def __init__(self, spec, arrays=None):
+        self._spec = spec
+        self._arrays = {name: arrays[name] if arrays else np.empty(0, dtype=dtype) for name, dtype in spec.items()}
+
+    def extended(self, rows):
+        return _Columns(self._spec, {
+            name: np.concatenate([self._arrays[name], np.asarray(rows[name], dtype=dtype)])
+            for name, dtype in self._spec.items()
+        })
+
+    def get(self, name):
+        return self._arrays[name]
+
+    def __len__(self):
+        return len(self._arrays[next(iter(self._spec))])
+
+
+class _Dictionary:
+    """Maps values to dense integer codes"""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self._codes = {value: code for code, value in enumerate(self.values)}
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class AnalyticsStore:
+    """One outlet's invoice history as NumPy columns.
+
+    ``lock`` serialises refreshes; queries do not take it. ``ingest`` builds the new
+    invoice and line columns first and publishes them with one assignment to
+    ``columns``, and every query reads ``columns`` once, so it works on a
+    consistent pair even while a refresh is appending.
+    """
+
+    def __init__(self, tz_name):
+        self.tz_name = tz_name
+        self.lock = threading.Lock()
+        self.columns = (_Columns(INVOICE_COLUMNS), _Columns(LINE_COLUMNS))
+        self.order_types = _Dictionary()
+        self.items = _Dictionary()
+        self.item_names = []
+        self.categories = _Dictionary()
+        self.watermark = None  # newest invoice timestamp loaded
+        self.recent_ids = {}  # ids of invoices near the watermark -> timestamp, to skip re-reads
+        self.refreshed_at = 0.0
+        self.saved_rows = 0
+
+    @property
+    def invoices(self):
+        return self.columns[0]
+
+    @property
+    def lines(self):
+        return self.columns[1]
+
+    def ingest(self, rows):
+        """Append ``(id, timestamp, order_type, total, items JSON)`` rows not loaded yet"""
+        tz = ZoneInfo(self.tz_name)
+        invoices = {name: [] for name in INVOICE_COLUMNS}
+        lines = {name: [] for name in LINE_COLUMNS}
+        next_row = len(self.invoices)
+
+        for invoice_id, timestamp, order_type, total, items in rows:
+            if invoice_id in self.recent_ids:
+                continue
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            utc = _epoch_seconds(timestamp)
+            local = timestamp.astimezone(tz)
+            invoices['ts'].append(utc)
+            invoices['local_ts'].append(utc + int(local.utcoffset().total_seconds()))
+            invoices['total'].append(total)
+            invoices['order_type'].append(self.order_types.code(order_type))
+
+            for item in json.loads(items):
+                code = self.items.code(str(item.get('id')))
+                if code == len(self.item_names):
+                    self.item_names.append(item.get('name', ''))
+                quantity = item.get('quantity', 0)
+                lines['invoice'].append(next_row)
+                lines['item'].append(code)
+                lines['category'].append(self.categories.code(item.get('category') or 'Uncategorized'))
+                lines['quantity'].append(quantity)
+                lines['amount'].append(item.get('price', 0) * quantity)
+            next_row += 1
+
+            naive = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+            self.recent_ids[invoice_id] = naive
+            if self.watermark is None or naive > self.watermark:
+                self.watermark = naive
+
+        if invoices['ts']:
+            self.columns = (self.invoices.extended(invoices), self.lines.extended(lines))
+        return len(invoices['ts'])
+
+    def forget_old_ids(self, late_window):
+        cutoff = self.watermark - late_window
+        self.recent_ids = {key: ts for key, ts in self.recent_ids.items() if ts >= cutoff}
+
+    # Snapshots
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        invoices, lines = self.columns
+        for columns, spec in ((invoices, INVOICE_COLUMNS), (lines, LINE_COLUMNS)):
+            for name in spec:
+                path = os.path.join(directory, f'{name}.npy')
+                with open(path + '.tmp', 'wb') as f:
+                    np.save(f, columns.get(name))
+                os.replace(path + '.tmp', path)
+        meta = {
+            'timezone': self.tz_name,
+            'invoiceCount': len(invoices),
+            'lineCount': len(lines),
+            'orderTypes': self.order_types.values,
+            'items': self.items.values,
+            'itemNames': self.item_names,
+            'categories': self.categories.values,
+            'watermark': self.watermark.isoformat() if self.watermark else None,
+            'recentIds': {key: ts.isoformat() for key, ts in self.recent_ids.items()},
+        }
+        with open(os.path.join(directory, 'meta.json.tmp'), 'w') as f:
+            json.dump(meta, f)
+        os.replace(os.path.join(directory, 'meta.json.tmp'), os.path.join(directory, 'meta.json'))
+        self.saved_rows = len(invoices)
+
+    @classmethod
+    def load(cls, directory, tz_name):
+        """Memory-map a snapshot; ``None`` if it is missing, stale or incomplete"""
+        try:
+            with open(os.path.join(directory, 'meta.json')) as f:
+                meta = json.load(f)
+            if meta['timezone'] != tz_name:
+                return None
+            invoices = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in INVOICE_COLUMNS}
+            lines = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in LINE_COLUMNS}
+        except (OSError, ValueError, KeyError):
+            return None
+        if any(len(column) != meta['invoiceCount'] for column in invoices.values()) or \
+                any(len(column) != meta['lineCount'] for column in lines.values()):
+            return None
+
+        store = cls(tz_name)
+        store.columns = (_Columns(INVOICE_COLUMNS, invoices), _Columns(LINE_COLUMNS, lines))
+        store.order_types = _Dictionary(meta['orderTypes'])
+        store.items = _Dictionary(meta['items'])
+        store.item_names = meta['itemNames']
+        store.categories = _Dictionary(meta['categories'])
+        store.watermark = datetime.fromisoformat(meta['watermark']) if meta['watermark'] else None
+        store.recent_ids = {key: datetime.fromisoformat(ts) for key, ts in meta['recentIds'].items()}
+        store.saved_rows = meta['invoiceCount']
+        return store
+
+    # Queries
+
+    @staticmethod
+    def _invoice_mask(invoices, start, end):
+        ts = invoices.get('ts')
+        mask = np.ones(len(ts), dtype=bool)
+        if start is not None:
+            mask &= ts >= _epoch_seconds(start)
+        if end is not None:
+            mask &= ts < _epoch_seconds(end)
+        return mask
+
+    def heatmap(self, start=None, end=None):
+        """Revenue and invoice count by weekday (rows, Monday first) and local hour"""
+        invoices, _ = self.columns
+        mask = self._invoice_mask(invoices, start, end)
+        local = invoices.get('local_ts')[mask]
+        cells = ((local // 86400 + 3) % 7) * 24 + (local // 3600) % 24  # 1970-01-01 was a Thursday
+        revenue = np.bincount(cells, weights=invoices.get('total')[mask], minlength=7 * 24)
+        counts = np.bincount(cells, minlength=7 * 24)
+        return {
+            'weekdays': list(WEEKDAYS),
+            'revenue': np.round(revenue, 2).reshape(7, 24).tolist(),
+            'invoices': counts.reshape(7, 24).tolist()
+        }
+
+    def weekdays(self, start=None, end=None):
+        """Invoice count, revenue and average ticket per weekday"""
+        invoices, _ = self.columns
+        mask = self._invoice_mask(invoices, start, end)
+        days = (invoices.get('local_ts')[mask] // 86400 + 3) % 7
+        revenue = np.bincount(days, weights=invoices.get('total')[mask], minlength=7)
+        counts = np.bincount(days, minlength=7)
+        average = np.divide(revenue, counts, out=np.zeros(7), where=counts > 0)
+        return [
+            {'weekday': WEEKDAYS[day], 'invoices': int(counts[day]),
+             'revenue': round(float(revenue[day]), 2), 'averageTicket': round(float(average[day]), 2)}
+            for day in range(7)
+        ]
+
+    def order_type_trend(self, interval='day', start=None, end=None):
+        """Invoice count and revenue per period and order type (dine-in vs takeaway)"""
+        invoices, _ = self.columns
+        order_types = list(self.order_types.values)
+        if not order_types:
+            return []
+        mask = self._invoice_mask(invoices, start, end)
+        local = invoices.get('local_ts')[mask].astype('datetime64[s]')
+        if interval == 'month':
+            periods = local.astype('datetime64[M]').astype('datetime64[D]')
+        elif interval == 'week':
+            days = local.astype('datetime64[D]').astype(np.int64)
+            periods = (days - (days + 3) % 7).astype('datetime64[D]')  # Monday of the week
+        else:
+            periods = local.astype('datetime64[D]')
+        unique_periods, period_index = np.unique(periods, return_inverse=True)
+        type_count = len(order_types)
+        cells = period_index * type_count + invoices.get('order_type')[mask]
+        size = len(unique_periods) * type_count
+        revenue = np.bincount(cells, weights=invoices.get('total')[mask], minlength=size).reshape(-1, type_count)
+        counts = np.bincount(cells, minlength=size).reshape(-1, type_count)
+        return [
+            {
+                'period': str(period),
+                'orderTypes': {
+                    order_type: {'invoices': int(counts[row, code]), 'revenue': round(float(revenue[row, code]), 2)}
+                    for code, order_type in enumerate(order_types) if counts[row, code]
+                }
+            }
+            for row, period in enumerate(unique_periods)
+        ]
+
+    def top_items(self, start=None, end=None, limit=20, sort='amount'):
+        """Best-selling items by amount or quantity"""
+        invoices, lines = self.columns
+        # Dictionaries only grow, and codes are added before the columns using them
+        item_ids, item_names = list(self.items.values), list(self.item_names)
+        invoice_mask = self._invoice_mask(invoices, start, end)
+        line_mask = invoice_mask[lines.get('invoice')]
+        items = lines.get('item')[line_mask]
+        size = len(item_ids)
+        quantity = np.bincount(items, weights=lines.get('quantity')[line_mask], minlength=size)
+        amount = np.bincount(items, weights=lines.get('amount')[line_mask], minlength=size)
+        ranking = quantity if sort == 'quantity' else amount
+        top = np.argsort(-ranking, kind='stable')[:limit]
+        return [
+            {'id': item_ids[code], 'name': item_names[code],
+             'quantity': float(quantity[code]), 'amount': round(float(amount[code]), 2)}
+            for code in top if quantity[code] or amount[code]
+        ]
+
+    def categories_summary(self, start=None, end=None):
+        invoices, lines = self.columns
+        names = list(self.categories.values)
+        invoice_mask = self._invoice_mask(invoices, start, end)
+        line_mask = invoice_mask[lines.get('invoice')]
+        categories = lines.get('category')[line_mask]
+        size = len(names)
+        quantity = np.bincount(categories, weights=lines.get('quantity')[line_mask], minlength=size)
+        amount = np.bincount(categories, weights=lines.get('amount')[line_mask], minlength=size)
+        return [
+            {'category': name, 'quantity': float(quantity[code]), 'amount': round(float(amount[code]), 2)}
+            for code, name in enumerate(names) if quantity[code] or amount[code]
+        ]
+
+
+class Analytics:
+    """Columnar analytics over each outlet's invoice history.
+
+    Invoice totals, local times and order types, and every order line's item,
+    category, quantity and amount, are held as NumPy arrays, so reports are
+    vectorised group-bys instead of scans that parse JSON. A store is loaded on
+    first use, from the snapshot in ``ANALYTICS_SNAPSHOT_DIR`` (memory-mapped) if
+    there is one, and then from the database. New invoices are appended
+    incrementally at most every ``ANALYTICS_REFRESH_SECONDS``. Invoices are
+    re-read from ``ANALYTICS_LATE_WINDOW_HOURS`` before the newest one seen,
+    because invoice timestamps come from the terminals and can arrive out of
+    order. Snapshots are rewritten after ``ANALYTICS_SNAPSHOT_MIN_NEW_INVOICES``
+    new invoices.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ANALYTICS_SNAPSHOT_DIR', None)
+        app.config.setdefault('ANALYTICS_REFRESH_SECONDS', 5)
+        app.config.setdefault('ANALYTICS_LATE_WINDOW_HOURS', 24)
+        app.config.setdefault('ANALYTICS_SNAPSHOT_MIN_NEW_INVOICES', 1000)
+        app.config.setdefault('BUSINESS_TIMEZONE', 'UTC')
+        app.extensions['analytics'] = {'lock': threading.Lock(), 'stores': {}}
+
+    def store(self):
+        """The current outlet's store, refreshed with invoices added since the last call"""
+        state = current_app.extensions['analytics']
+        outlet_id = current_outlet_id()
+        with state['lock']:
+            store = state['stores'].get(outlet_id)
+            if store is None:
+                store = self._load_snapshot(outlet_id) or AnalyticsStore(current_app.config['BUSINESS_TIMEZONE'])
+                state['stores'][outlet_id] = store
+
+        with store.lock:
+            if time.monotonic() - store.refreshed_at >= current_app.config['ANALYTICS_REFRESH_SECONDS']:
+                self._refresh(store)
+                store.refreshed_at = time.monotonic()
+                self._maybe_save(store, outlet_id)
+        return store
+
+    def _snapshot_dir(self, outlet_id):
+        base = current_app.config['ANALYTICS_SNAPSHOT_DIR']
+        return os.path.join(base, outlet_id) if base else None
+
+    def _load_snapshot(self, outlet_id):
+        directory = self._snapshot_dir(outlet_id)
+        if directory is None:
+            return None
+        store = AnalyticsStore.load(directory, current_app.config['BUSINESS_TIMEZONE'])
+        if store is not None:
+            logger.info(f"Loaded analytics snapshot for outlet {outlet_id} ({len(store.invoices)} invoices)")
+        return store
+
+    def _maybe_save(self, store, outlet_id):
+        directory = self._snapshot_dir(outlet_id)
+        if directory is None:
+            return
+        if len(store.invoices) - store.saved_rows >= current_app.config['ANALYTICS_SNAPSHOT_MIN_NEW_INVOICES']:
+            try:
+                store.save(directory)
+            except OSError as e:
+                logger.error(f"Error saving analytics snapshot for outlet {outlet_id}: {e}")
+
+    def _refresh(self, store):
+        late_window = timedelta(hours=current_app.config['ANALYTICS_LATE_WINDOW_HOURS'])
+        since = store.watermark - late_window if store.watermark else None
+
+        tables = [Invoice.__table__]
+        if since is None:
+            tables += archived_invoice_tables(EPOCH)
+        added = 0
+        for table in tables:
+            query = sa.select(table.c.id, table.c.timestamp, table.c.order_type, table.c.total, table.c['items']) \
+                .where(table.c.outlet_id == current_outlet_id())
+            if since is not None:
+                query = query.where(table.c.timestamp >= since)
+            result = db.session.execute(query.execution_options(yield_per=_FETCH_CHUNK))
+            for rows in result.partitions():
+                added += store.ingest(rows)
+        db.session.rollback()
+        if store.watermark is not None:
+            store.forget_old_ids(late_window)
+        return added
+
+
+analytics = Analytics()
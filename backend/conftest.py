@@ -0,0 +1,45 @@
+"""pytest fixtures: every test gets its own app on a fresh in-memory database
+(see testing.py).
+
+Override ``app_config`` in a test module, or parametrize it indirectly, to run
+tests against apps with other settings::
+
+    @pytest.mark.parametrize('app_config', [{'SERVER_PRICING_ENABLED': True}], indirect=True)
+    def test_priced(client):
+        ...
+"""
+import pytest
+
+from testing import app_context
+
+
+@pytest.fixture
+def app_config(request):
+    """Settings on top of ``TEST_CONFIG``"""
+    return getattr(request, 'param', {})
+
+
+@pytest.fixture
+def app(app_config):
+    with app_context(app_config) as app:
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_app():
+    """Factory for further apps, each on its own database, torn down after the test"""
+    contexts = []
+
+    def make(config=None):
+        context = app_context(config)
+        contexts.append(context)
+        return context.__enter__()
+
+    yield make
+    for context in reversed(contexts):
+        context.__exit__(None, None, None)
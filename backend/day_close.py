@@ -0,0 +1,112 @@
+import json
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from flask import current_app
+
+from models import db, DayClose
+from partitions import invoices_between
+
+
+def business_day_bounds(business_date):
+    """UTC window ``[start, end)`` covering a business day.
+
+    The day starts at ``BUSINESS_DAY_START_HOUR`` local time in ``BUSINESS_TIMEZONE``,
+    so sales after midnight can still count towards the previous day.
+    """
+    tz = ZoneInfo(current_app.config['BUSINESS_TIMEZONE'])
+    start_hour = current_app.config['BUSINESS_DAY_START_HOUR']
+    local_start = datetime.combine(business_date, time(hour=start_hour), tzinfo=tz)
+    local_end = datetime.combine(business_date + timedelta(days=1), time(hour=start_hour), tzinfo=tz)
+    return (
+        local_start.astimezone(timezone.utc).replace(tzinfo=None),
+        local_end.astimezone(timezone.utc).replace(tzinfo=None)
+    )
+
+
+def current_business_date():
+    tz = ZoneInfo(current_app.config['BUSINESS_TIMEZONE'])
+    local_now = datetime.now(tz) - timedelta(hours=current_app.config['BUSINESS_DAY_START_HOUR'])
+    return local_now.date()
+
+
+def summarize_invoices(invoices):
+    """Totals and breakdowns for a list of invoices (oldest first), in one pass"""
+    summary = {
+        'invoice_count': 0,
+        'subtotal': 0.0,
+        'tax': 0.0,
+        'total': 0.0,
+        'first_bill_number': None,
+        'last_bill_number': None,
+    }
+    order_types = {}
+    categories = {}
+    departments = {}
+
+    for invoice in invoices:
+        summary['invoice_count'] += 1
+        summary['subtotal'] += invoice.subtotal
+        summary['tax'] += invoice.tax
+        summary['total'] += invoice.total
+        if summary['first_bill_number'] is None:
+            summary['first_bill_number'] = invoice.bill_number
+        summary['last_bill_number'] = invoice.bill_number
+
+        order_type = order_types.setdefault(invoice.order_type, {'count': 0, 'total': 0.0})
+        order_type['count'] += 1
+        order_type['total'] += invoice.total
+
+        for item in json.loads(invoice.items):
+            quantity = item.get('quantity', 0)
+            amount = item.get('price', 0) * quantity
+            for breakdown, key in ((categories, item.get('category') or 'Uncategorized'),
+                                   (departments, item.get('department') or 'Unassigned')):
+                entry = breakdown.setdefault(key, {'quantity': 0, 'amount': 0.0})
+                entry['quantity'] += quantity
+                entry['amount'] += amount
+
+    for key in ('subtotal', 'tax', 'total'):
+        summary[key] = round(summary[key], 2)
+    for breakdown in (order_types, categories, departments):
+        for entry in breakdown.values():
+            for key in ('total', 'amount'):
+                if key in entry:
+                    entry[key] = round(entry[key], 2)
+
+    summary['breakdowns'] = json.dumps({
+        'orderTypes': order_types,
+        'categories': categories,
+        'departments': departments
+    })
+    return summary
+
+
+def close_day(business_date, rebuild=False):
+    """Compute and store the snapshot for a business day.
+
+    Returns ``None`` if the day is already closed and ``rebuild`` is false. Rebuilding
+    (e.g. after late invoices) recomputes the snapshot and bumps its revision.
+    """
+    snapshot = DayClose.scoped().filter_by(business_date=business_date).with_for_update().first()
+    if snapshot is not None and not rebuild:
+        return None
+
+    start, end = business_day_bounds(business_date)
+    summary = summarize_invoices(invoices_between(start, end))
+
+    if snapshot is None:
+        snapshot = DayClose(business_date=business_date, revision=1)
+        db.session.add(snapshot)
+    else:
+        snapshot.revision += 1
+    for key, value in summary.items():
+        setattr(snapshot, key, value)
+    snapshot.closed_at = datetime.utcnow()
+
+    db.session.commit()
+    return snapshot
+
+
+def parse_business_date(value):
+    return date.fromisoformat(value)
@@ -0,0 +1,264 @@
+import atexit
+import json
+import logging
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import update
+
+from models import db, Table, TableOrder
+from outlets import current_outlet_id
+
+logger = logging.getLogger(__name__)
+
+
+def _running_total(items):
+    return round(sum(item.get('price', 0) * item.get('quantity', 0) for item in items), 2)
+
+
+class Floor:
+    """Live state of one outlet's tables: status, current order, seat time and running total"""
+
+    def __init__(self, tables, orders):
+        self._lock = threading.Lock()
+        self._tables = {}
+        self.corrections = {}  # table id -> status the database should have
+        orders_by_table = {order.table_id: order for order in orders}
+        for table in tables:
+            entry = self._entry(table)
+            order = orders_by_table.get(table.id)
+            if order is not None:
+                self._seat_locked(entry, order)
+            elif entry['status'] == 'occupied':
+                entry['status'] = 'available'
+            if entry['status'] != table.status:
+                # A status write that was never flushed (e.g. the process stopped)
+                self.corrections[table.id] = entry['status']
+            self._tables[table.id] = entry
+
+    @staticmethod
+    def _entry(table):
+        return dict(table.to_dict(), orderId=None, seatedAt=None, runningTotal=0.0)
+
+    @staticmethod
+    def _seat_locked(entry, order):
+        entry['status'] = 'occupied'
+        entry['orderId'] = order.id
+        entry['seatedAt'] = order.start_time.isoformat()
+        entry['runningTotal'] = _running_total(json.loads(order.items) if order.items else [])
+
+    def tables(self):
+        with self._lock:
+            return [dict(entry) for entry in self._tables.values()]
+
+    def get(self, table_id):
+        with self._lock:
+            entry = self._tables.get(table_id)
+            return dict(entry) if entry else None
+
+    def put_table(self, table):
+        """Add a table or apply an edit to its name, seats or category"""
+        with self._lock:
+            entry = self._tables.get(table.id)
+            if entry is None:
+                self._tables[table.id] = self._entry(table)
+            else:
+                entry.update(name=table.name, seats=table.seats, category=table.category)
+
+    def set_status(self, table_id, status):
+        with self._lock:
+            entry = self._tables.get(table_id)
+            if entry is not None:
+                entry['status'] = status
+
+    def remove_table(self, table_id):
+        with self._lock:
+            self._tables.pop(table_id, None)
+
+    def seat(self, table_id, order):
+        """Record an order's current state. Returns True if the table's status changed."""
+        with self._lock:
+            entry = self._tables.get(table_id)
+            if entry is None:
+                return False
+            changed = entry['status'] != 'occupied'
+            self._seat_locked(entry, order)
+            return changed
+
+    def clear(self, table_id):
+        with self._lock:
+            entry = self._tables.get(table_id)
+            if entry is None:
+                return False
+            changed = entry['status'] != 'available'
+            entry.update(status='available', orderId=None, seatedAt=None, runningTotal=0.0)
+            return changed
+
+
+class FloorState:
+    """In-memory floor plan, so ``/api/tables`` and the order handlers skip the
+    ``tables`` table.
+
+    Each outlet's floor is built from the database on first use. Order handlers
+    update it after committing their order, and the resulting ``Table.status``
+    changes are written behind: a background thread flushes them every
+    ``FLOOR_STATE_FLUSH_INTERVAL_SECONDS`` in one transaction per outlet. A lost
+    flush is harmless because a rebuild derives occupied/available from the open
+    orders. Floors are rebuilt after ``FLOOR_STATE_MAX_AGE_SECONDS`` so that changes
+    made by other worker processes are picked up.
+
+    Writes use their own connection, never the request's session, and whatever is
+    still pending when the process exits is flushed by an ``atexit`` hook.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FLOOR_STATE_FLUSH_INTERVAL_SECONDS', 0.5)
+        app.config.setdefault('FLOOR_STATE_MAX_AGE_SECONDS', 5)
+        app.extensions['floor_state'] = {
+            'lock': threading.RLock(),  # also taken by _write_behind while a floor is built
+            'floors': {},  # outlet id -> (Floor, built at)
+            'pending': {},  # (outlet id, table id) -> status to write
+            'pending_lock': threading.Lock(),
+            'flush_lock': threading.Lock(),  # held while a batch is taken and written
+            'wakeup': threading.Event(),
+            'writer': None,
+        }
+
+    def floor(self):
+        state = current_app.extensions['floor_state']
+        outlet_id = current_outlet_id()
+        max_age = current_app.config['FLOOR_STATE_MAX_AGE_SECONDS']
+        entry = state['floors'].get(outlet_id)
+        if entry is None or time.monotonic() - entry[1] > max_age:
+            with state['lock']:
+                entry = state['floors'].get(outlet_id)
+                if entry is None or time.monotonic() - entry[1] > max_age:
+                    entry = (Floor(Table.scoped().all(), TableOrder.scoped().all()), time.monotonic())
+                    state['floors'][outlet_id] = entry
+                    # The rebuild derives statuses from the open orders, so it replaces
+                    # whatever this outlet still had queued
+                    with state['pending_lock']:
+                        for key in [key for key in state['pending'] if key[0] == outlet_id]:
+                            del state['pending'][key]
+                    for table_id, status in entry[0].corrections.items():
+                        self._write_behind(table_id, status)
+        return entry[0]
+
+    def tables(self):
+        return self.floor().tables()
+
+    def get(self, table_id):
+        return self.floor().get(table_id)
+
+    def put_table(self, table):
+        self.floor().put_table(table)
+
+    def set_status(self, table_id, status):
+        """Reflect a status the caller has already committed (e.g. a manual edit)"""
+        self._discard_pending(table_id)
+        self.floor().set_status(table_id, status)
+
+    def committed(self, table_id, order):
+        """Reflect a table whose status the caller has already committed, with its
+        order (``None`` if the table is now free)"""
+        self._discard_pending(table_id)
+        if order is None:
+            self.floor().clear(table_id)
+        else:
+            self.floor().seat(table_id, order)
+
+    def remove_table(self, table_id):
+        self._discard_pending(table_id)
+        self.floor().remove_table(table_id)
+
+    def _discard_pending(self, table_id):
+        state = current_app.extensions['floor_state']
+        with state['pending_lock']:
+            state['pending'].pop((current_outlet_id(), table_id), None)
+
+    def seat(self, table_id, order):
+        """Mark a table occupied by a committed order (new items, new totals)"""
+        if self.floor().seat(table_id, order):
+            self._write_behind(table_id, 'occupied')
+
+    def clear(self, table_id):
+        """Mark a table available after its order was completed"""
+        if self.floor().clear(table_id):
+            self._write_behind(table_id, 'available')
+
+    def _write_behind(self, table_id, status):
+        state = current_app.extensions['floor_state']
+        with state['pending_lock']:
+            state['pending'][(current_outlet_id(), table_id)] = status
+        if state['writer'] is None:
+            with state['lock']:
+                if state['writer'] is None:
+                    app = current_app._get_current_object()
+                    # The writer is a daemon thread: write what it has not got to yet
+                    # before the process exits
+                    atexit.register(self.flush, app)
+                    state['writer'] = threading.Thread(
+                        target=self._writer,
+                        args=(app,),
+                        name='floor-state-writer',
+                        daemon=True
+                    )
+                    state['writer'].start()
+        state['wakeup'].set()
+
+    def _writer(self, app):
+        state = app.extensions['floor_state']
+        while True:
+            state['wakeup'].wait()
+            # Let changes accumulate so they are written in one batch
+            time.sleep(app.config['FLOOR_STATE_FLUSH_INTERVAL_SECONDS'])
+            state['wakeup'].clear()
+            self.flush(app)
+
+    def flush(self, app):
+        """Write every outlet's pending status changes now"""
+        state = app.extensions['floor_state']
+        with state['pending_lock']:
+            outlet_ids = {outlet_id for outlet_id, _ in state['pending']}
+        for outlet_id in outlet_ids:
+            self._flush(app, outlet_id)
+
+    def _flush(self, app, outlet_id):
+        """Write an outlet's pending status changes in one transaction, on a
+        connection of its own"""
+        state = app.extensions['floor_state']
+        # Serializes the writer thread and the exit hook, so that the hook waits for
+        # a batch the writer has already taken
+        with state['flush_lock']:
+            with state['pending_lock']:
+                batch = {key: status for key, status in state['pending'].items() if key[0] == outlet_id}
+                for key in batch:
+                    del state['pending'][key]
+            if not batch:
+                return
+
+            by_status = {}
+            for (_, table_id), status in batch.items():
+                by_status.setdefault(status, []).append(table_id)
+            try:
+                with app.app_context(), db.engine.begin() as connection:
+                    for status, table_ids in by_status.items():
+                        connection.execute(
+                            update(Table)
+                            .where(Table.outlet_id == outlet_id, Table.id.in_(table_ids))
+                            .values(status=status)
+                        )
+            except Exception as e:
+                logger.error(f"Error writing table statuses for outlet {outlet_id}: {e}")
+                with state['pending_lock']:
+                    for key, status in batch.items():
+                        state['pending'].setdefault(key, status)
+                state['wakeup'].set()
+
+
+floor_state = FloorState()
@@ -0,0 +1,139 @@
+import logging
+import queue
+import threading
+import time
+
+from flask import current_app, g
+
+from models import db
+from outlets import current_outlet_id
+
+logger = logging.getLogger(__name__)
+
+
+class _Op:
+    def __init__(self, outlet_id, fn):
+        self.outlet_id = outlet_id
+        self.fn = fn
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class GroupCommitter:
+    """Run write operations and commit them, optionally batched into shared transactions.
+
+    Handlers pass a function that makes their changes with ``db.session`` and
+    returns the objects they need. By default it runs in the request and is
+    committed straight away. With ``GROUP_COMMIT_ENABLED`` it is handed to a
+    per-process committer thread instead. That thread runs up to
+    ``GROUP_COMMIT_MAX_BATCH`` operations of an outlet, each in its own savepoint,
+    and commits them together. It waits at most ``GROUP_COMMIT_MAX_DELAY_MS`` for
+    a batch to fill. Every request is released only after the commit containing
+    its changes has succeeded, so acknowledged writes are as durable as before. An
+    operation that fails rolls back only its savepoint and gets its own error. If
+    the batch commit itself fails, each operation is retried in a transaction of
+    its own.
+
+    Returned objects are detached with their attributes loaded, so they can be
+    serialised after the call without touching the database.
+
+    Batching is off by default. In benchmark.py with 16 terminals it raised
+    throughput by only about a quarter, on SQLite and on Postgres alike, because
+    commits are not what limits order-taking there.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('GROUP_COMMIT_ENABLED', False)
+        app.config.setdefault('GROUP_COMMIT_MAX_BATCH', 64)
+        app.config.setdefault('GROUP_COMMIT_MAX_DELAY_MS', 5)
+        app.extensions['group_commit'] = {'queue': queue.Queue(), 'lock': threading.Lock(), 'thread': None}
+
+    def run(self, fn):
+        """Run ``fn()`` and commit its changes; returns what ``fn`` returned"""
+        if not current_app.config['GROUP_COMMIT_ENABLED']:
+            result = fn()
+            db.session.commit()
+            return result
+
+        state = current_app.extensions['group_commit']
+        self._ensure_thread(state)
+        op = _Op(current_outlet_id(), fn)
+        state['queue'].put(op)
+        op.done.wait()
+        if op.error is not None:
+            raise op.error
+        return op.result
+
+    def _ensure_thread(self, state):
+        if state['thread'] is not None:
+            return
+        with state['lock']:
+            if state['thread'] is None:
+                state['thread'] = threading.Thread(
+                    target=self._committer,
+                    args=(current_app._get_current_object(),),
+                    name='group-committer',
+                    daemon=True
+                )
+                state['thread'].start()
+
+    def _committer(self, app):
+        ops = app.extensions['group_commit']['queue']
+        while True:
+            batch = [ops.get()]
+            deadline = time.monotonic() + app.config['GROUP_COMMIT_MAX_DELAY_MS'] / 1000
+            while len(batch) < app.config['GROUP_COMMIT_MAX_BATCH']:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(ops.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            by_outlet = {}
+            for op in batch:
+                by_outlet.setdefault(op.outlet_id, []).append(op)
+            for outlet_id, outlet_ops in by_outlet.items():
+                with app.app_context():
+                    g.outlet_id = outlet_id
+                    try:
+                        self._commit_batch(outlet_ops)
+                    except Exception as e:
+                        logger.error(f"Group commit of {len(outlet_ops)} operations failed, committing them one by one: {e}")
+                        db.session.rollback()
+                        for op in outlet_ops:
+                            op.result, op.error = None, None
+                            self._commit_batch([op])
+                    finally:
+                        self._release(outlet_ops)
+
+    def _commit_batch(self, ops):
+        session = db.session()
+        session.expire_on_commit = False
+        try:
+            for op in ops:
+                try:
+                    with session.begin_nested():
+                        op.result = op.fn()
+                except Exception as e:
+                    op.error = e
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            if len(ops) > 1:
+                raise
+            ops[0].result, ops[0].error = None, e
+
+    def _release(self, ops):
+        db.session.expunge_all()
+        for op in ops:
+            op.done.set()
+
+
+group_committer = GroupCommitter()
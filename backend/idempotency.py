@@ -0,0 +1,184 @@
+import hashlib
+import logging
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from flask import current_app, g, jsonify, request
+from sqlalchemy.exc import IntegrityError
+
+from models import db, IdempotencyKey
+from outlets import current_outlet_id
+
+logger = logging.getLogger(__name__)
+
+MUTATING_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+MAX_KEY_LENGTH = 255
+
+
+class Idempotency:
+    """Replay stored responses for mutating requests that carry an ``Idempotency-Key`` header.
+
+    The first request with a given key claims it by inserting a pending row before the
+    handler runs. When the handler finishes, the response is stored against the key, so
+    a retry gets the stored response back without running the handler again.
+
+    Records are written in a session of their own: storing a response never commits
+    changes the handler left uncommitted.
+    """
+
+    def __init__(self, app=None):
+        self._last_purge = {}  # outlet id -> monotonic time of the last purge
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IDEMPOTENCY_TTL_SECONDS', 86400)
+        app.config.setdefault('IDEMPOTENCY_LOCK_TIMEOUT_SECONDS', 60)
+        app.config.setdefault('IDEMPOTENCY_PURGE_INTERVAL_SECONDS', 300)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def _before_request(self):
+        if request.method not in MUTATING_METHODS:
+            return None
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return None
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        # Keys are only unique per client, so keep each outlet's keys apart
+        key = f'{current_outlet_id()}:{key}'
+        request_hash = _request_fingerprint()
+        self._purge_expired()
+
+        try:
+            with _session() as session:
+                record = self._claim(session, key, request_hash)
+        except Exception as e:
+            logger.error(f"Error claiming idempotency key: {e}")
+            return jsonify({'error': 'Failed to process Idempotency-Key'}), 500
+
+        if record is None:
+            g.idempotency_key = key
+            return None
+        if record.request_hash != request_hash:
+            return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+        if record.status_code is None:
+            response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+            response.status_code = 409
+            response.headers['Retry-After'] = '1'
+            return response
+
+        response = current_app.response_class(
+            zlib.decompress(record.response_body) if record.response_body else b'',
+            status=record.status_code,
+            content_type=record.content_type,
+        )
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    def _claim(self, session, key, request_hash):
+        """Insert a pending row for ``key``. Returns ``None`` if this request now owns the
+        key, otherwise the existing record."""
+        now = datetime.utcnow()
+        ttl = timedelta(seconds=current_app.config['IDEMPOTENCY_TTL_SECONDS'])
+        lock_timeout = timedelta(seconds=current_app.config['IDEMPOTENCY_LOCK_TIMEOUT_SECONDS'])
+
+        for _ in range(2):
+            try:
+                session.add(IdempotencyKey(
+                    key=key,
+                    request_hash=request_hash,
+                    created_at=now,
+                    expires_at=now + ttl
+                ))
+                session.commit()
+                return None
+            except IntegrityError:
+                session.rollback()
+
+            existing = session.get(IdempotencyKey, key)
+            if existing is None:
+                continue
+            expired = existing.expires_at <= now
+            abandoned = existing.status_code is None and existing.created_at <= now - lock_timeout
+            if not (expired or abandoned):
+                return existing
+            # The previous owner expired or died mid-request; take the key over
+            session.delete(existing)
+            session.commit()
+
+        raise RuntimeError(f"Could not claim idempotency key {key!r}")
+
+    def _after_request(self, response):
+        key = g.pop('idempotency_key', None)
+        if key is None:
+            return response
+
+        try:
+            # Whatever the handler left uncommitted is discarded at teardown anyway;
+            # discard it now so it cannot hold SQLite's write lock against the record
+            db.session.rollback()
+            with _session() as session:
+                if response.status_code >= 500 or response.direct_passthrough:
+                    # Failed (or streamed) responses are not stored so the client can retry
+                    session.query(IdempotencyKey).filter_by(key=key).delete()
+                else:
+                    session.query(IdempotencyKey).filter_by(key=key).update({
+                        'status_code': response.status_code,
+                        'content_type': response.content_type,
+                        'response_body': zlib.compress(response.get_data())
+                    })
+                session.commit()
+        except Exception as e:
+            logger.error(f"Error storing idempotent response: {e}")
+        return response
+
+    def _teardown_request(self, exc):
+        # The handler raised before a response was produced; release the claim
+        key = g.pop('idempotency_key', None)
+        if key is None:
+            return
+        try:
+            db.session.rollback()
+            with _session() as session:
+                session.query(IdempotencyKey).filter_by(key=key).delete()
+                session.commit()
+        except Exception as e:
+            logger.error(f"Error releasing idempotency key: {e}")
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        outlet_id = current_outlet_id()
+        if now - self._last_purge.get(outlet_id, 0.0) < current_app.config['IDEMPOTENCY_PURGE_INTERVAL_SECONDS']:
+            return
+        self._last_purge[outlet_id] = now
+        try:
+            with _session() as session:
+                session.query(IdempotencyKey).filter(IdempotencyKey.expires_at <= datetime.utcnow()).delete()
+                session.commit()
+        except Exception as e:
+            logger.error(f"Error purging expired idempotency keys: {e}")
+
+
+def _session():
+    """New session, routed like ``db.session`` but with its own transaction"""
+    return db.session.session_factory()
+
+
+def _request_fingerprint():
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b'\0')
+    digest.update(request.path.encode())
+    digest.update(b'\0')
+    digest.update(request.query_string)
+    digest.update(b'\0')
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+idempotency = Idempotency()
@@ -1,16 +1,24 @@
 import os
 import sys
-from app import app, db
+from flask import g
+from app import create_app
+from models import db
+from routing import all_engines
 from models import Table, KOTConfig, BillConfig, MenuItem, Category, Department, RestaurantSettings
 
-def init_database():
-    """Initialize the database with sample data"""
+def init_database(outlet_id=None):
+    """Initialize the database with sample data for an outlet (the default outlet if not given)"""
+    app = create_app()
     with app.app_context():
+        if outlet_id:
+            g.outlet_id = outlet_id
+        
         # Create all tables
-        db.create_all()
+        for engine in all_engines():
+            db.metadata.create_all(engine)
         
         # Check if we already have data
-        if Table.query.first() is None:
+        if Table.scoped().first() is None:
             # Add sample tables
             sample_tables = [
                 Table(id="1", name="A1", seats=2, category="General", status="available"),
@@ -29,19 +37,17 @@ def init_database():
             print("Added sample tables to database")
         
         # Check if we have KOT config
-        if KOTConfig.query.first() is None:
-            kot_config = KOTConfig(print_by_department=False, number_of_copies=1)
-            db.session.add(kot_config)
+        if KOTConfig.scoped().first() is None:
+            db.session.add(KOTConfig.default())
             print("Added default KOT configuration")
         
         # Check if we have Bill config
-        if BillConfig.query.first() is None:
-            bill_config = BillConfig(auto_print_dine_in=False, auto_print_takeaway=False)
-            db.session.add(bill_config)
+        if BillConfig.scoped().first() is None:
+            db.session.add(BillConfig.default())
             print("Added default Bill configuration")
         
         # Check if we have departments
-        if Department.query.first() is None:
+        if Department.scoped().first() is None:
             departments = [
                 Department(id="1", name="Kitchen"),
                 Department(id="2", name="Bar"),
@@ -52,7 +58,7 @@ def init_database():
             print("Added default departments")
         
         # Check if we have categories
-        if Category.query.first() is None:
+        if Category.scoped().first() is None:
             categories = [
                 Category(id="1", name="Mains"),
                 Category(id="2", name="Salads"),
@@ -65,7 +71,7 @@ def init_database():
             print("Added default categories")
         
         # Check if we have menu items
-        if MenuItem.query.first() is None:
+        if MenuItem.scoped().first() is None:
             menu_items = [
                 MenuItem(id="1", name="Classic Burger", product_code="CB001", price=259, category="Mains", department="Kitchen", description="Beef patty with lettuce, tomato, cheese"),
                 MenuItem(id="2", name="Caesar Salad", product_code="CS002", price=199, category="Salads", department="Kitchen", description="Romaine lettuce, croutons, parmesan"),
@@ -83,13 +89,8 @@ def init_database():
             print("Added sample menu items")
         
         # Check if we have restaurant settings
-        if RestaurantSettings.query.first() is None:
-            settings = RestaurantSettings(
-                restaurant_name="My Restaurant",
-                currency="INR",
-                tax_rate=5.0
-            )
-            db.session.add(settings)
+        if RestaurantSettings.scoped().first() is None:
+            db.session.add(RestaurantSettings.default())
             print("Added default restaurant settings")
         
         # Commit changes
@@ -97,4 +98,4 @@ def init_database():
         print("Database initialized successfully!")
 
 if __name__ == "__main__":
-    init_database()
\ No newline at end of file
+    init_database(sys.argv[1] if len(sys.argv) > 1 else None)
\ No newline at end of file
@@ -0,0 +1,96 @@
+import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import current_app, g
+
+from models import db, Job
+from outlets import current_outlet_id
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundJobs:
+    """Run long tasks in a thread pool and track them in the ``jobs`` table.
+
+    Job state lives in the database, so any worker process can report progress for
+    (or cancel) a job started by another one.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BACKGROUND_JOB_WORKERS', 2)
+        app.extensions['jobs'] = ThreadPoolExecutor(
+            max_workers=app.config['BACKGROUND_JOB_WORKERS'],
+            thread_name_prefix='job'
+        )
+
+    def submit(self, kind, fn, *args):
+        """Create a job and run ``fn(job, *args)`` in the background.
+
+        ``fn`` runs in an app context for the current outlet and returns the final
+        stats. It should call :func:`report_progress` between batches and stop when
+        that returns ``False``.
+        """
+        job = Job(id=uuid.uuid4().hex, kind=kind)
+        db.session.add(job)
+        db.session.commit()
+
+        current_app.extensions['jobs'].submit(
+            self._run, current_app._get_current_object(), current_outlet_id(), job.id, fn, args
+        )
+        return job
+
+    def _run(self, app, outlet_id, job_id, fn, args):
+        with app.app_context():
+            g.outlet_id = outlet_id
+            # Conditional updates, so a cancel committed meanwhile by another request is kept
+            started = Job.scoped().filter_by(id=job_id, status='queued').update({'status': 'running'})
+            if not started:
+                Job.scoped().filter_by(id=job_id, status='cancelling').update(
+                    {'status': 'cancelled', 'finished_at': datetime.utcnow()}
+                )
+                db.session.commit()
+                return
+            db.session.commit()
+
+            job = Job.get_scoped(job_id)
+            try:
+                stats = fn(job, *args)
+                db.session.refresh(job)
+                job.status = 'cancelled' if job.status == 'cancelling' else 'completed'
+                job.stats = json.dumps(stats)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Background job {job_id} failed: {e}")
+                job = Job.get_scoped(job_id)
+                job.status = 'failed'
+                job.errors = json.dumps(json.loads(job.errors) + [str(e)])
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+    def cancel(self, job):
+        """Ask a queued or running job to stop at its next batch boundary"""
+        Job.scoped().filter(Job.id == job.id, Job.status.in_(('queued', 'running'))).update(
+            {'status': 'cancelling'}
+        )
+        db.session.commit()
+        db.session.refresh(job)
+        return job
+
+
+def report_progress(job, rows_processed, errors):
+    """Record progress and return ``False`` if the job has been asked to cancel"""
+    job.rows_processed = rows_processed
+    job.errors = json.dumps(errors)
+    db.session.commit()
+    status = db.session.query(Job.status).filter_by(id=job.id).scalar()
+    return status != 'cancelling'
+
+
+background_jobs = BackgroundJobs()
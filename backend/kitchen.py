@@ -0,0 +1,142 @@
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+
+from models import db, KitchenItem
+from outlets import current_outlet_id
+
+ACTIVE_STATUSES = ('pending', 'ready')
+
+
+class KitchenDisplay:
+    """Per-department queues of items sent to the kitchen, for kitchen and bar screens.
+
+    ``mark_items_as_sent`` adds a row per sent line; a station reads only its own
+    department's pending and ready rows (an indexed range, oldest fire time first)
+    and bumps or serves them. Displays long-poll :meth:`wait_for_change` with the
+    cursor of their last read: requests in the same process are woken as soon as a
+    change is committed, and changes made by other worker processes are noticed
+    within ``KITCHEN_POLL_INTERVAL_SECONDS``.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('KITCHEN_LONG_POLL_SECONDS', 25)
+        app.config.setdefault('KITCHEN_POLL_INTERVAL_SECONDS', 1)
+        app.extensions['kitchen'] = threading.Condition()
+
+    def fire(self, table_id, table_name, items):
+        """Add newly sent order lines to their departments' queues (the caller commits)"""
+        now = datetime.utcnow()
+        rows = [
+            KitchenItem(
+                department=item.get('department') or '',
+                table_id=table_id,
+                table_name=table_name,
+                item_id=str(item['id']),
+                name=item.get('name', ''),
+                quantity=item.get('quantity', 1),
+                fired_at=now
+            )
+            for item in items
+        ]
+        db.session.add_all(rows)
+        return rows
+
+    def move_table(self, source_id, target_id, target_name):
+        """Re-label a table's unserved items after its order moved (the caller commits)"""
+        KitchenItem.scoped().filter(
+            KitchenItem.table_id == source_id, KitchenItem.status.in_(ACTIVE_STATUSES)
+        ).update({'table_id': target_id, 'table_name': target_name}, synchronize_session=False)
+
+    def move_items(self, source_id, target_id, target_name, items):
+        """Re-label the unserved kitchen items for order lines split off to another
+        table (the caller commits).
+
+        Kitchen items are matched to lines by menu item id, oldest first; an item
+        with more than the moved quantity is split in two.
+        """
+        for item in items:
+            if not item.get('sentToKitchen', False):
+                continue
+            quantity = item['quantity']
+            rows = (KitchenItem.scoped()
+                    .filter(KitchenItem.table_id == source_id, KitchenItem.item_id == str(item['id']),
+                            KitchenItem.status.in_(ACTIVE_STATUSES))
+                    .order_by(KitchenItem.fired_at, KitchenItem.id)
+                    .all())
+            for row in rows:
+                if quantity <= 0:
+                    break
+                if row.quantity <= quantity:
+                    row.table_id = target_id
+                    row.table_name = target_name
+                    quantity -= row.quantity
+                else:
+                    row.quantity -= quantity
+                    db.session.add(KitchenItem(
+                        department=row.department,
+                        table_id=target_id,
+                        table_name=target_name,
+                        item_id=row.item_id,
+                        name=row.name,
+                        quantity=quantity,
+                        status=row.status,
+                        fired_at=row.fired_at,
+                        ready_at=row.ready_at
+                    ))
+                    quantity = 0
+
+    def queue(self, department, statuses=ACTIVE_STATUSES):
+        return (KitchenItem.scoped()
+                .filter(KitchenItem.department == department, KitchenItem.status.in_(statuses))
+                .order_by(KitchenItem.fired_at, KitchenItem.id)
+                .all())
+
+    def cursor(self, department):
+        """Opaque value that changes whenever the department's queue changes"""
+        latest = (db.session.query(db.func.max(KitchenItem.updated_at))
+                  .filter(KitchenItem.outlet_id == current_outlet_id(), KitchenItem.department == department)
+                  .scalar())
+        return latest.isoformat() if latest else ''
+
+    def set_status(self, item, status):
+        now = datetime.utcnow()
+        item.status = status
+        if status == 'ready':
+            item.ready_at = now
+        elif status == 'served':
+            item.served_at = now
+            item.ready_at = item.ready_at or now
+        db.session.commit()
+        self.notify()
+
+    def notify(self):
+        """Wake long-polling displays in this process after a commit"""
+        condition = current_app.extensions['kitchen']
+        with condition:
+            condition.notify_all()
+
+    def wait_for_change(self, department, since, timeout):
+        """Block until the department's cursor differs from ``since`` or ``timeout``
+        passes. Returns the current cursor."""
+        condition = current_app.extensions['kitchen']
+        poll_interval = current_app.config['KITCHEN_POLL_INTERVAL_SECONDS']
+        deadline = time.monotonic() + timeout
+        while True:
+            current = self.cursor(department)
+            # End the read transaction so the next check sees new commits
+            db.session.rollback()
+            remaining = deadline - time.monotonic()
+            if current != since or remaining <= 0:
+                return current
+            with condition:
+                condition.wait(min(poll_interval, remaining))
+
+
+kitchen_display = KitchenDisplay()
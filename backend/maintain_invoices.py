@@ -0,0 +1,21 @@
+import sys
+from app import create_app
+from partitions import archive_invoices, ensure_partitions
+from routing import all_engines
+
+DEFAULT_RETENTION_MONTHS = 12
+
+def maintain_invoices(retention_months=DEFAULT_RETENTION_MONTHS):
+    """Create upcoming invoice partitions and archive months older than the retention window"""
+    app = create_app()
+    with app.app_context():
+        for engine in all_engines():
+            created = ensure_partitions(engine)
+            if created:
+                print(f"Created invoice partitions: {', '.join(created)}")
+            
+            result = archive_invoices(engine, retention_months)
+            print(f"Archived invoices older than {retention_months} months on {engine.url.render_as_string()}: {result}")
+
+if __name__ == "__main__":
+    maintain_invoices(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RETENTION_MONTHS)
@@ -0,0 +1,124 @@
+import time
+from io import BytesIO
+
+from openpyxl import load_workbook
+
+from jobs import report_progress
+from menu_index import menu_search
+from models import db, Category, Department, MenuItem
+from pricing import pricing
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def _new_stats():
+    return {
+        'categories_added': 0,
+        'departments_added': 0,
+        'items_added': 0,
+        'errors': []
+    }
+
+
+def _names(rows):
+    for row in rows:
+        if row[0] and not str(row[0]).startswith('Example:'):
+            yield str(row[0]).strip()
+
+
+def import_workbook(wb, progress=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Import the Categories, Departments and Menu Items sheets of a workbook.
+
+    Existing names and product codes are loaded once up front instead of being
+    queried per row, and rows are committed every ``batch_size`` rows. After each
+    batch ``progress(rows_processed, errors)`` is called; if it returns ``False``
+    the import stops (rows already committed are kept). Returns ``(stats, completed)``.
+    """
+    stats = _new_stats()
+    categories = {name for name, in Category.scoped().with_entities(Category.name)}
+    departments = {name for name, in Department.scoped().with_entities(Department.name)}
+    product_codes = {code for code, in MenuItem.scoped().with_entities(MenuItem.product_code)}
+    id_prefix = str(int(time.time() * 1000))
+    rows_processed = 0
+
+    # Import Categories and Departments
+    for sheet, existing, model, counter in (
+        ('Categories', categories, Category, 'categories_added'),
+        ('Departments', departments, Department, 'departments_added'),
+    ):
+        if sheet not in wb.sheetnames:
+            continue
+        for name in _names(wb[sheet].iter_rows(min_row=2, values_only=True)):
+            if name not in existing:
+                existing.add(name)
+                db.session.add(model(id=id_prefix + str(stats[counter]), name=name))
+                stats[counter] += 1
+
+    # Commit categories and departments first
+    db.session.commit()
+
+    # Import Menu Items
+    pending = []
+    if 'Menu Items' in wb.sheetnames:
+        for row_idx, row in enumerate(wb['Menu Items'].iter_rows(min_row=2, values_only=True), start=2):
+            rows_processed += 1
+            try:
+                row = tuple(row) + (None,) * (6 - len(row))
+                if row[1] and not str(row[1]).startswith('Example:'):
+                    product_code = str(row[0]).strip() if row[0] else ''
+                    category = str(row[3]).strip() if row[3] else ''
+                    department = str(row[4]).strip() if row[4] else ''
+
+                    # Validate required fields
+                    if not product_code:
+                        stats['errors'].append(f"Row {row_idx}: Product code is required")
+                    elif product_code in product_codes:
+                        stats['errors'].append(f"Row {row_idx}: Product code '{product_code}' already exists")
+                    elif category and category not in categories:
+                        stats['errors'].append(f"Row {row_idx}: Category '{category}' does not exist")
+                    elif department and department not in departments:
+                        stats['errors'].append(f"Row {row_idx}: Department '{department}' does not exist")
+                    else:
+                        item = MenuItem(
+                            id=id_prefix + str(stats['items_added']),
+                            name=str(row[1]).strip(),
+                            product_code=product_code,
+                            price=float(row[2]) if row[2] else 0,
+                            category=category,
+                            department=department,
+                            description=str(row[5]).strip() if row[5] else ''
+                        )
+                        db.session.add(item)
+                        pending.append(item)
+                        product_codes.add(product_code)
+                        stats['items_added'] += 1
+            except Exception as e:
+                stats['errors'].append(f"Row {row_idx}: {str(e)}")
+
+            if rows_processed % batch_size == 0:
+                _commit(pending)
+                pending = []
+                if progress is not None and not progress(rows_processed, stats['errors']):
+                    return stats, False
+
+    _commit(pending)
+    if progress is not None:
+        progress(rows_processed, stats['errors'])
+    return stats, True
+
+
+def _commit(items):
+    db.session.commit()
+    for item in items:
+        menu_search.upsert(item)
+    pricing.invalidate()
+
+
+def run_import_job(job, data):
+    """Background job body: import an uploaded workbook, reporting progress on ``job``"""
+    wb = load_workbook(BytesIO(data), read_only=True)
+    try:
+        stats, _ = import_workbook(wb, progress=lambda rows, errors: report_progress(job, rows, errors))
+    finally:
+        wb.close()
+    return stats
@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app
+
+from models import MenuItem
+from outlets import current_outlet_id
+
+SHORT_PREFIX_LENGTH = 2  # queries shorter than a trigram use word-prefix postings
+
+
+def _normalize(text):
+    return ' '.join((text or '').lower().split())
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _short_prefixes(text):
+    prefixes = set()
+    for word in text.split():
+        for length in range(1, SHORT_PREFIX_LENGTH + 1):
+            prefixes.add(word[:length])
+    return prefixes
+
+
+class MenuIndex:
+    """In-memory search index over one outlet's menu items.
+
+    Names and product codes are indexed by trigram for substring search, by the
+    first one or two letters of each word for very short queries, and by exact
+    (case-insensitive) product code for O(1) lookups.
+    """
+
+    def __init__(self, items=()):
+        self._lock = threading.Lock()
+        self._items = {}  # id -> serialized menu item
+        self._keys = {}  # id -> (normalized name, normalized code, postings keys)
+        self._by_code = {}  # normalized product code -> id
+        self._postings = defaultdict(set)  # trigram or short prefix -> ids
+        for item in items:
+            self.upsert(item)
+
+    def upsert(self, item):
+        data = item.to_dict()
+        name = _normalize(data['name'])
+        code = _normalize(data['productCode'])
+        keys = _trigrams(name) | _trigrams(code) | _short_prefixes(name) | _short_prefixes(code)
+
+        with self._lock:
+            self._remove_locked(data['id'])
+            self._items[data['id']] = data
+            self._keys[data['id']] = (name, code, keys)
+            self._by_code[code] = data['id']
+            for key in keys:
+                self._postings[key].add(data['id'])
+
+    def remove(self, item_id):
+        with self._lock:
+            self._remove_locked(item_id)
+
+    def _remove_locked(self, item_id):
+        previous = self._keys.pop(item_id, None)
+        if previous is None:
+            return
+        self._items.pop(item_id, None)
+        _, code, keys = previous
+        if self._by_code.get(code) == item_id:
+            del self._by_code[code]
+        for key in keys:
+            ids = self._postings.get(key)
+            if ids is not None:
+                ids.discard(item_id)
+                if not ids:
+                    del self._postings[key]
+
+    def by_code(self, product_code):
+        with self._lock:
+            item_id = self._by_code.get(_normalize(product_code))
+            return self._items.get(item_id) if item_id else None
+
+    def search(self, query, category=None, limit=20):
+        """Items whose name or product code contains ``query``, best matches first:
+        exact code, code prefix, name prefix, word prefix, then any substring."""
+        query = _normalize(query)
+        with self._lock:
+            if not query:
+                candidates = set(self._items)
+            elif len(query) <= SHORT_PREFIX_LENGTH:
+                candidates = set(self._postings.get(query, ()))
+            else:
+                postings = sorted((self._postings.get(gram, set()) for gram in _trigrams(query)), key=len)
+                candidates = set(postings[0]).intersection(*postings[1:]) if postings else set()
+
+            ranked = []
+            for item_id in candidates:
+                item = self._items[item_id]
+                if category and item['category'] != category:
+                    continue
+                name, code, _ = self._keys[item_id]
+                rank = _rank(query, name, code)
+                if rank is not None:
+                    ranked.append((rank, name, item))
+
+        ranked.sort(key=lambda entry: (entry[0], entry[1]))
+        return [item for _, _, item in ranked[:limit]]
+
+
+def _rank(query, name, code):
+    if not query:
+        return 4
+    if code == query:
+        return 0
+    if code.startswith(query):
+        return 1
+    if name.startswith(query):
+        return 2
+    if any(word.startswith(query) for word in name.split()):
+        return 3
+    if query in name or query in code:
+        return 4
+    return None
+
+
+class MenuSearch:
+    """Per-outlet menu indexes for the current app.
+
+    Indexes are built from the database on first use and kept up to date by the
+    menu write routes. They are rebuilt after ``MENU_INDEX_MAX_AGE_SECONDS`` so that
+    writes made by other worker processes are picked up.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MENU_INDEX_MAX_AGE_SECONDS', 60)
+        app.extensions['menu_search'] = {'lock': threading.Lock(), 'indexes': {}}
+
+    def index(self):
+        state = current_app.extensions['menu_search']
+        outlet_id = current_outlet_id()
+        entry = state['indexes'].get(outlet_id)
+        if entry is None or time.monotonic() - entry[1] > current_app.config['MENU_INDEX_MAX_AGE_SECONDS']:
+            with state['lock']:
+                entry = state['indexes'].get(outlet_id)
+                if entry is None or time.monotonic() - entry[1] > current_app.config['MENU_INDEX_MAX_AGE_SECONDS']:
+                    entry = (MenuIndex(MenuItem.scoped().all()), time.monotonic())
+                    state['indexes'][outlet_id] = entry
+        return entry[0]
+
+    def upsert(self, item):
+        """Reflect a committed create or update in the outlet's index, if it is built"""
+        entry = current_app.extensions['menu_search']['indexes'].get(current_outlet_id())
+        if entry is not None:
+            entry[0].upsert(item)
+
+    def remove(self, item_id):
+        entry = current_app.extensions['menu_search']['indexes'].get(current_outlet_id())
+        if entry is not None:
+            entry[0].remove(item_id)
+
+
+menu_search = MenuSearch()
@@ -0,0 +1,360 @@
+"""Outlet keys, sync timestamps and category tax rates
+
+Upgrades a database created before multi-outlet mode. The original tables
+(tables, table_orders, invoices, the config tables, menu_items, categories,
+departments and restaurant_settings) are rebuilt with an ``outlet_id``, set to
+'default' for existing rows, and ``updated_at``, set to the time of the upgrade.
+Keys and unique constraints are rebuilt to lead with ``outlet_id``, invoices
+become partitioned by month on Postgres, and categories get ``tax_rate``.
+
+Each table is renamed out of the way, created in its new form and filled with
+INSERT ... SELECT, all in the migration's transaction. Tables that already have
+``outlet_id`` (databases created by ``create_all`` since) are left alone, so the
+migration is a no-op on new installs. Tables added after the original schema
+are created by ``create_all`` when the app starts.
+
+The downgrade rebuilds the original tables the same way, dropping ``outlet_id``,
+``updated_at`` and the category tax rates. It refuses to run when the tables
+hold more than one outlet, whose rows would collide on the original keys.
+Tables created by ``create_all`` are left in place; the older app ignores them.
+
+Revision ID: 3f1c2a9d8b7e
+Revises:
+Create Date: 2026-10-19 11:20:00
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d8b7e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+DEFAULT_OUTLET_ID = 'default'
+LEGACY_SUFFIX = '_pre_outlets'
+UPGRADED_SUFFIX = '_with_outlets'
+
+
+def _updated_at():
+    return sa.Column('updated_at', sa.DateTime(), nullable=False, index=True)
+
+
+def _new_tables(metadata):
+    """The original tables as they are after this revision, parents first"""
+    return [
+        sa.Table(
+            'tables', metadata,
+            sa.Column('outlet_id', sa.String(64), primary_key=True),
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('seats', sa.Integer(), nullable=False),
+            sa.Column('category', sa.String(), nullable=False),
+            sa.Column('status', sa.String(), nullable=False),
+            _updated_at(),
+        ),
+        sa.Table(
+            'table_orders', metadata,
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('outlet_id', sa.String(64), nullable=False),
+            sa.Column('table_id', sa.String(), nullable=False),
+            sa.Column('table_name', sa.String(), nullable=False),
+            sa.Column('items', sa.Text(), nullable=True),
+            sa.Column('start_time', sa.DateTime(), nullable=False),
+            _updated_at(),
+            sa.ForeignKeyConstraint(['outlet_id', 'table_id'], ['tables.outlet_id', 'tables.id']),
+            sa.Index('ix_table_orders_outlet_table', 'outlet_id', 'table_id'),
+        ),
+        sa.Table(
+            'invoices', metadata,
+            sa.Column('outlet_id', sa.String(64), primary_key=True),
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('bill_number', sa.String(), nullable=False),
+            sa.Column('order_type', sa.String(), nullable=False),
+            sa.Column('table_name', sa.String(), nullable=True),
+            sa.Column('items', sa.Text(), nullable=False),
+            sa.Column('subtotal', sa.Float(), nullable=False),
+            sa.Column('tax', sa.Float(), nullable=False),
+            sa.Column('total', sa.Float(), nullable=False),
+            sa.Column('timestamp', sa.DateTime(), primary_key=True),
+            sa.Index('ix_invoices_outlet_timestamp', 'outlet_id', 'timestamp'),
+            postgresql_partition_by='RANGE (timestamp)',
+        ),
+        sa.Table(
+            'kot_config', metadata,
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('outlet_id', sa.String(64), nullable=False, unique=True),
+            sa.Column('print_by_department', sa.Boolean(), nullable=False),
+            sa.Column('number_of_copies', sa.Integer(), nullable=False),
+            sa.Column('selected_printer', sa.String(), nullable=True),
+            _updated_at(),
+        ),
+        sa.Table(
+            'bill_config', metadata,
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('outlet_id', sa.String(64), nullable=False, unique=True),
+            sa.Column('auto_print_dine_in', sa.Boolean(), nullable=False),
+            sa.Column('auto_print_takeaway', sa.Boolean(), nullable=False),
+            sa.Column('selected_printer', sa.String(), nullable=True),
+            _updated_at(),
+        ),
+        sa.Table(
+            'menu_items', metadata,
+            sa.Column('outlet_id', sa.String(64), primary_key=True),
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('product_code', sa.String(), nullable=False),
+            sa.Column('price', sa.Float(), nullable=False),
+            sa.Column('category', sa.String(), nullable=False),
+            sa.Column('department', sa.String(), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            _updated_at(),
+            sa.UniqueConstraint('outlet_id', 'product_code', name='uq_menu_items_outlet_product_code'),
+            sa.Index('ix_menu_items_outlet_category', 'outlet_id', 'category'),
+        ),
+        sa.Table(
+            'categories', metadata,
+            sa.Column('outlet_id', sa.String(64), primary_key=True),
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('tax_rate', sa.Float(), nullable=True),
+            _updated_at(),
+            sa.UniqueConstraint('outlet_id', 'name', name='uq_categories_outlet_name'),
+        ),
+        sa.Table(
+            'departments', metadata,
+            sa.Column('outlet_id', sa.String(64), primary_key=True),
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('name', sa.String(), nullable=False),
+            _updated_at(),
+            sa.UniqueConstraint('outlet_id', 'name', name='uq_departments_outlet_name'),
+        ),
+        sa.Table(
+            'restaurant_settings', metadata,
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('outlet_id', sa.String(64), nullable=False, unique=True),
+            sa.Column('restaurant_name', sa.String(), nullable=False),
+            sa.Column('address', sa.String(), nullable=True),
+            sa.Column('phone', sa.String(), nullable=True),
+            sa.Column('email', sa.String(), nullable=True),
+            sa.Column('currency', sa.String(), nullable=False),
+            sa.Column('tax_rate', sa.Float(), nullable=False),
+            _updated_at(),
+        ),
+    ]
+
+
+def _old_tables(metadata):
+    """The original single-outlet tables, parents first"""
+    return [
+        sa.Table(
+            'tables', metadata,
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('seats', sa.Integer(), nullable=False),
+            sa.Column('category', sa.String(), nullable=False),
+            sa.Column('status', sa.String(), nullable=False),
+        ),
+        sa.Table(
+            'table_orders', metadata,
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('table_id', sa.String(), sa.ForeignKey('tables.id'), nullable=False),
+            sa.Column('table_name', sa.String(), nullable=False),
+            sa.Column('items', sa.Text(), nullable=True),
+            sa.Column('start_time', sa.DateTime(), nullable=False),
+        ),
+        sa.Table(
+            'invoices', metadata,
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('bill_number', sa.String(), nullable=False),
+            sa.Column('order_type', sa.String(), nullable=False),
+            sa.Column('table_name', sa.String(), nullable=True),
+            sa.Column('items', sa.Text(), nullable=False),
+            sa.Column('subtotal', sa.Float(), nullable=False),
+            sa.Column('tax', sa.Float(), nullable=False),
+            sa.Column('total', sa.Float(), nullable=False),
+            sa.Column('timestamp', sa.DateTime(), nullable=False),
+        ),
+        sa.Table(
+            'kot_config', metadata,
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('print_by_department', sa.Boolean(), nullable=False),
+            sa.Column('number_of_copies', sa.Integer(), nullable=False),
+            sa.Column('selected_printer', sa.String(), nullable=True),
+        ),
+        sa.Table(
+            'bill_config', metadata,
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('auto_print_dine_in', sa.Boolean(), nullable=False),
+            sa.Column('auto_print_takeaway', sa.Boolean(), nullable=False),
+            sa.Column('selected_printer', sa.String(), nullable=True),
+        ),
+        sa.Table(
+            'menu_items', metadata,
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('product_code', sa.String(), nullable=False, unique=True),
+            sa.Column('price', sa.Float(), nullable=False),
+            sa.Column('category', sa.String(), nullable=False),
+            sa.Column('department', sa.String(), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+        ),
+        sa.Table(
+            'categories', metadata,
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('name', sa.String(), nullable=False, unique=True),
+        ),
+        sa.Table(
+            'departments', metadata,
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('name', sa.String(), nullable=False, unique=True),
+        ),
+        sa.Table(
+            'restaurant_settings', metadata,
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('restaurant_name', sa.String(), nullable=False),
+            sa.Column('address', sa.String(), nullable=True),
+            sa.Column('phone', sa.String(), nullable=True),
+            sa.Column('email', sa.String(), nullable=True),
+            sa.Column('currency', sa.String(), nullable=False),
+            sa.Column('tax_rate', sa.Float(), nullable=False),
+        ),
+    ]
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing = set(inspector.get_table_names())
+    tables = _new_tables(sa.MetaData())
+
+    legacy = [
+        table for table in tables
+        if table.name in existing
+        and 'outlet_id' not in {column['name'] for column in inspector.get_columns(table.name)}
+    ]
+    upgraded = {table.name for table in legacy}
+
+    # Databases created by create_all during this series, before categories had tax rates
+    if 'categories' in existing and 'categories' not in upgraded:
+        if 'tax_rate' not in {column['name'] for column in inspector.get_columns('categories')}:
+            op.add_column('categories', sa.Column('tax_rate', sa.Float(), nullable=True))
+
+    if not legacy:
+        return
+
+    for table in legacy:
+        _rename_aside(bind, table.name, LEGACY_SUFFIX)
+    for table in legacy:
+        table.create(bind)
+        if table.name == 'invoices' and bind.dialect.name == 'postgresql':
+            _create_invoice_partitions(bind)
+
+    now = datetime.utcnow()
+    for table in legacy:
+        old = sa.Table(table.name + LEGACY_SUFFIX, sa.MetaData(), autoload_with=bind)
+        copied = [column.name for column in table.columns if column.name in old.c]
+        values = [old.c[name] for name in copied] + [sa.literal(DEFAULT_OUTLET_ID, sa.String(64))]
+        columns = copied + ['outlet_id']
+        if 'updated_at' in table.c:
+            values.append(sa.literal(now, sa.DateTime()))
+            columns.append('updated_at')
+        bind.execute(table.insert().from_select(columns, sa.select(*values)))
+
+    # Children first, so no foreign key is left dangling
+    for table in reversed(legacy):
+        op.drop_table(table.name + LEGACY_SUFFIX)
+
+    _reset_sequences(bind, legacy)
+
+
+def _reset_sequences(bind, tables):
+    """Continue each rebuilt table's serial ids after the ids copied into it"""
+    if bind.dialect.name != 'postgresql':
+        return
+    for table in tables:
+        column = table.autoincrement_column
+        if column is not None:
+            bind.execute(sa.text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', '{column.name}'), "
+                f"(SELECT COALESCE(MAX({column.name}), 0) + 1 FROM {table.name}), false)"
+            ))
+
+
+def _rename_aside(bind, name, suffix):
+    aside = name + suffix
+    op.rename_table(name, aside)
+    if bind.dialect.name != 'postgresql':
+        return
+    # Index, constraint and sequence names are schema-wide on Postgres and keep their
+    # names when the table is renamed: move them aside for the rebuilt table's
+    for index_name in bind.execute(
+        sa.text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table"),
+        {'table': aside}
+    ).scalars().all():
+        bind.execute(sa.text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name[:50]}{suffix}"'))
+    for sequence in bind.execute(
+        sa.text(
+            "SELECT s.relname FROM pg_class s "
+            "JOIN pg_depend d ON d.objid = s.oid AND d.deptype = 'a' "
+            "JOIN pg_class t ON t.oid = d.refobjid "
+            "WHERE s.relkind = 'S' AND t.relname = :table"
+        ),
+        {'table': aside}
+    ).scalars().all():
+        bind.execute(sa.text(f'ALTER SEQUENCE "{sequence}" RENAME TO "{sequence[:50]}{suffix}"'))
+
+
+def _create_invoice_partitions(bind):
+    """Default partition, plus one partition per month the existing invoices cover"""
+    bind.execute(sa.text('CREATE TABLE IF NOT EXISTS invoices_default PARTITION OF invoices DEFAULT'))
+    months = bind.execute(sa.text(
+        f"SELECT DISTINCT date_trunc('month', timestamp) FROM invoices{LEGACY_SUFFIX}"
+    )).scalars().all()
+    for month in months:
+        next_month = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+        bind.execute(sa.text(
+            f"CREATE TABLE invoices_{month.year:04d}_{month.month:02d} PARTITION OF invoices "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')"
+        ))
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing = set(inspector.get_table_names())
+    tables = [
+        table for table in _old_tables(sa.MetaData())
+        if table.name in existing
+        and 'outlet_id' in {column['name'] for column in inspector.get_columns(table.name)}
+    ]
+    if not tables:
+        return
+
+    # Rows of different outlets would collide on the original single-column keys
+    outlets = set()
+    for table in tables:
+        outlets.update(bind.execute(sa.text(f'SELECT DISTINCT outlet_id FROM {table.name}')).scalars().all())
+    if len(outlets) > 1:
+        raise RuntimeError(
+            f"Cannot downgrade a database holding {len(outlets)} outlets ({', '.join(sorted(outlets))}): "
+            f"move all but one to other databases first (snapshot.py)"
+        )
+
+    for table in tables:
+        _rename_aside(bind, table.name, UPGRADED_SUFFIX)
+    for table in tables:
+        table.create(bind)
+    for table in tables:
+        new = sa.Table(table.name + UPGRADED_SUFFIX, sa.MetaData(), autoload_with=bind)
+        columns = [column.name for column in table.columns]
+        bind.execute(table.insert().from_select(columns, sa.select(*(new.c[name] for name in columns))))
+
+    # Children first; on Postgres this also drops the invoice partitions
+    for table in reversed(tables):
+        op.drop_table(table.name + UPGRADED_SUFFIX)
+    _reset_sequences(bind, tables)
@@ -1,13 +1,49 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
 from datetime import datetime
 import json
 
-# Initialize SQLAlchemy
-db = SQLAlchemy()
+from outlets import current_outlet_id
+from routing import RoutingSession
 
-class Table(db.Model):
+class POSSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy that can adopt an existing engine as an app's default bind.
+
+    ``create_app(engine=...)`` puts the engine in ``SQLALCHEMY_ENGINE``; every other
+    bind is created from its URL as usual.
+    """
+    
+    def _make_engine(self, bind_key, options, app):
+        if bind_key is None and app.config.get('SQLALCHEMY_ENGINE') is not None:
+            return app.config['SQLALCHEMY_ENGINE']
+        return super()._make_engine(bind_key, options, app)
+
+# Initialize SQLAlchemy (the routing session sends each outlet to its own database if configured)
+db = POSSQLAlchemy(session_options={'class_': RoutingSession})
+
+class OutletScoped:
+    """Query helpers for models partitioned by outlet"""
+    
+    @classmethod
+    def scoped(cls):
+        """Query limited to the current request's outlet"""
+        return cls.query.filter_by(outlet_id=current_outlet_id())
+    
+    @classmethod
+    def get_scoped(cls, ident):
+        """Get a row by id within the current request's outlet"""
+        return cls.scoped().filter_by(id=ident).first()
+
+class SyncTracked:
+    """Rows the delta sync feed (``/api/sync``) reports: ``updated_at`` changes on
+    every insert and update, and deletes leave a :class:`Tombstone`"""
+    
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+class Table(OutletScoped, SyncTracked, db.Model):
     __tablename__ = 'tables'
     
+    outlet_id = db.Column(db.String(64), primary_key=True, default=current_outlet_id)
     id = db.Column(db.String, primary_key=True)
     name = db.Column(db.String, nullable=False)
     seats = db.Column(db.Integer, nullable=False)
@@ -23,11 +59,16 @@ class Table(db.Model):
             'status': self.status
         }
 
-class TableOrder(db.Model):
+class TableOrder(OutletScoped, SyncTracked, db.Model):
     __tablename__ = 'table_orders'
+    __table_args__ = (
+        db.ForeignKeyConstraint(['outlet_id', 'table_id'], ['tables.outlet_id', 'tables.id']),
+        db.Index('ix_table_orders_outlet_table', 'outlet_id', 'table_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    table_id = db.Column(db.String, db.ForeignKey('tables.id'), nullable=False)
+    outlet_id = db.Column(db.String(64), nullable=False, default=current_outlet_id)
+    table_id = db.Column(db.String, nullable=False)
     table_name = db.Column(db.String, nullable=False)
     items = db.Column(db.Text, nullable=True)  # JSON string
     start_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -41,9 +82,15 @@ class TableOrder(db.Model):
             'startTime': self.start_time.isoformat()
         }
 
-class Invoice(db.Model):
+class Invoice(OutletScoped, db.Model):
     __tablename__ = 'invoices'
+    __table_args__ = (
+        db.Index('ix_invoices_outlet_timestamp', 'outlet_id', 'timestamp'),
+        # Monthly partitions on Postgres (see partitions.py); the partition key must be part of the primary key
+        {'postgresql_partition_by': 'RANGE (timestamp)'},
+    )
     
+    outlet_id = db.Column(db.String(64), primary_key=True, default=current_outlet_id)
     id = db.Column(db.String, primary_key=True)
     bill_number = db.Column(db.String, nullable=False)
     order_type = db.Column(db.String, nullable=False)  # 'dine-in' or 'takeaway'
@@ -52,7 +99,7 @@ class Invoice(db.Model):
     subtotal = db.Column(db.Float, nullable=False)
     tax = db.Column(db.Float, nullable=False)
     total = db.Column(db.Float, nullable=False)
-    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, primary_key=True, default=datetime.utcnow)
     
     def to_dict(self):
         return {
@@ -67,14 +114,27 @@ class Invoice(db.Model):
             'timestamp': self.timestamp.isoformat()
         }
 
-class KOTConfig(db.Model):
+# Catch-all partition so inserts never fail for a month whose partition has not been created yet
+event.listen(
+    Invoice.__table__,
+    'after_create',
+    DDL('CREATE TABLE IF NOT EXISTS invoices_default PARTITION OF invoices DEFAULT').execute_if(dialect='postgresql')
+)
+
+class KOTConfig(OutletScoped, SyncTracked, db.Model):
     __tablename__ = 'kot_config'
     
     id = db.Column(db.Integer, primary_key=True)
+    outlet_id = db.Column(db.String(64), nullable=False, unique=True, default=current_outlet_id)  # one row per outlet
     print_by_department = db.Column(db.Boolean, nullable=False, default=False)
     number_of_copies = db.Column(db.Integer, nullable=False, default=1)
     selected_printer = db.Column(db.String, nullable=True)  # Selected printer for KOT
     
+    @classmethod
+    def default(cls):
+        """Unsaved config for an outlet without one (init_db.py seeds the row)"""
+        return cls(print_by_department=False, number_of_copies=1)
+    
     def to_dict(self):
         return {
             'printByDepartment': self.print_by_department,
@@ -82,14 +142,20 @@ class KOTConfig(db.Model):
             'selectedPrinter': self.selected_printer
         }
 
-class BillConfig(db.Model):
+class BillConfig(OutletScoped, SyncTracked, db.Model):
     __tablename__ = 'bill_config'
     
     id = db.Column(db.Integer, primary_key=True)
+    outlet_id = db.Column(db.String(64), nullable=False, unique=True, default=current_outlet_id)  # one row per outlet
     auto_print_dine_in = db.Column(db.Boolean, nullable=False, default=False)
     auto_print_takeaway = db.Column(db.Boolean, nullable=False, default=False)
     selected_printer = db.Column(db.String, nullable=True)  # Selected printer for Bills
     
+    @classmethod
+    def default(cls):
+        """Unsaved config for an outlet without one (init_db.py seeds the row)"""
+        return cls(auto_print_dine_in=False, auto_print_takeaway=False)
+    
     def to_dict(self):
         return {
             'autoPrintDineIn': self.auto_print_dine_in,
@@ -97,12 +163,17 @@ class BillConfig(db.Model):
             'selectedPrinter': self.selected_printer
         }
 
-class MenuItem(db.Model):
+class MenuItem(OutletScoped, SyncTracked, db.Model):
     __tablename__ = 'menu_items'
+    __table_args__ = (
+        db.UniqueConstraint('outlet_id', 'product_code', name='uq_menu_items_outlet_product_code'),
+        db.Index('ix_menu_items_outlet_category', 'outlet_id', 'category'),
+    )
     
+    outlet_id = db.Column(db.String(64), primary_key=True, default=current_outlet_id)
     id = db.Column(db.String, primary_key=True)
     name = db.Column(db.String, nullable=False)
-    product_code = db.Column(db.String, nullable=False, unique=True)
+    product_code = db.Column(db.String, nullable=False)
     price = db.Column(db.Float, nullable=False)
     category = db.Column(db.String, nullable=False)
     department = db.Column(db.String, nullable=False)
@@ -119,23 +190,33 @@ class MenuItem(db.Model):
             'description': self.description
         }
 
-class Category(db.Model):
+class Category(OutletScoped, SyncTracked, db.Model):
     __tablename__ = 'categories'
+    __table_args__ = (
+        db.UniqueConstraint('outlet_id', 'name', name='uq_categories_outlet_name'),
+    )
     
+    outlet_id = db.Column(db.String(64), primary_key=True, default=current_outlet_id)
     id = db.Column(db.String, primary_key=True)
-    name = db.Column(db.String, nullable=False, unique=True)
+    name = db.Column(db.String, nullable=False)
+    tax_rate = db.Column(db.Float, nullable=True)  # percent; NULL uses RestaurantSettings.tax_rate
     
     def to_dict(self):
         return {
             'id': self.id,
-            'name': self.name
+            'name': self.name,
+            'taxRate': self.tax_rate
         }
 
-class Department(db.Model):
+class Department(OutletScoped, SyncTracked, db.Model):
     __tablename__ = 'departments'
+    __table_args__ = (
+        db.UniqueConstraint('outlet_id', 'name', name='uq_departments_outlet_name'),
+    )
     
+    outlet_id = db.Column(db.String(64), primary_key=True, default=current_outlet_id)
     id = db.Column(db.String, primary_key=True)
-    name = db.Column(db.String, nullable=False, unique=True)
+    name = db.Column(db.String, nullable=False)
     
     def to_dict(self):
         return {
@@ -143,10 +224,11 @@ class Department(db.Model):
             'name': self.name
         }
 
-class RestaurantSettings(db.Model):
+class RestaurantSettings(OutletScoped, SyncTracked, db.Model):
     __tablename__ = 'restaurant_settings'
     
     id = db.Column(db.Integer, primary_key=True)
+    outlet_id = db.Column(db.String(64), nullable=False, unique=True, default=current_outlet_id)  # one row per outlet
     restaurant_name = db.Column(db.String, nullable=False)
     address = db.Column(db.String, nullable=True)
     phone = db.Column(db.String, nullable=True)
@@ -154,6 +236,11 @@ class RestaurantSettings(db.Model):
     currency = db.Column(db.String, nullable=False, default='INR')
     tax_rate = db.Column(db.Float, nullable=False, default=5.0)
     
+    @classmethod
+    def default(cls):
+        """Unsaved settings for an outlet without any (init_db.py seeds the row)"""
+        return cls(restaurant_name='My Restaurant', currency='INR', tax_rate=5.0)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -163,4 +250,220 @@ class RestaurantSettings(db.Model):
             'email': self.email,
             'currency': self.currency,
             'taxRate': self.tax_rate
-        }
\ No newline at end of file
+        }
+
+class PriceRule(OutletScoped, SyncTracked, db.Model):
+    """Happy-hour price for an item, a category or the whole menu during a daily time window"""
+    __tablename__ = 'price_rules'
+    
+    outlet_id = db.Column(db.String(64), primary_key=True, default=current_outlet_id)
+    id = db.Column(db.String, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    item_id = db.Column(db.String, nullable=True)  # MenuItem.id; takes precedence over category
+    category = db.Column(db.String, nullable=True)  # Category.name; neither set means every item
+    kind = db.Column(db.String, nullable=False, default='percent')  # 'percent' off, or a fixed 'price'
+    value = db.Column(db.Float, nullable=False)
+    days = db.Column(db.String(7), nullable=True)  # weekdays as digits, 0 = Monday; NULL means every day
+    start_time = db.Column(db.String(5), nullable=False)  # HH:MM business-local time
+    end_time = db.Column(db.String(5), nullable=False)  # exclusive; earlier than start_time runs past midnight
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'itemId': self.item_id,
+            'category': self.category,
+            'kind': self.kind,
+            'value': self.value,
+            'days': [int(day) for day in self.days] if self.days is not None else None,
+            'startTime': self.start_time,
+            'endTime': self.end_time,
+            'active': self.active
+        }
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    
+    key = db.Column(db.String(320), primary_key=True)  # "<outlet id>:<client key>"
+    request_hash = db.Column(db.String(64), nullable=False)  # sha256 of method, path, query string and body
+    status_code = db.Column(db.Integer, nullable=True)  # NULL while the original request is in flight
+    content_type = db.Column(db.String, nullable=True)
+    response_body = db.Column(db.LargeBinary, nullable=True)  # zlib-compressed response body
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class DayClose(OutletScoped, db.Model):
+    """Snapshot of one business day's sales, written by the end-of-day close"""
+    __tablename__ = 'day_closes'
+    __table_args__ = (
+        db.UniqueConstraint('outlet_id', 'business_date', name='uq_day_closes_outlet_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    outlet_id = db.Column(db.String(64), nullable=False, default=current_outlet_id)
+    business_date = db.Column(db.Date, nullable=False)
+    revision = db.Column(db.Integer, nullable=False, default=1)  # bumped when the day is rebuilt
+    invoice_count = db.Column(db.Integer, nullable=False)
+    subtotal = db.Column(db.Float, nullable=False)
+    tax = db.Column(db.Float, nullable=False)
+    total = db.Column(db.Float, nullable=False)
+    first_bill_number = db.Column(db.String, nullable=True)
+    last_bill_number = db.Column(db.String, nullable=True)
+    breakdowns = db.Column(db.Text, nullable=False)  # JSON: by order type, category and department
+    closed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def to_dict(self):
+        breakdowns = json.loads(self.breakdowns)
+        return {
+            'businessDate': self.business_date.isoformat(),
+            'revision': self.revision,
+            'invoiceCount': self.invoice_count,
+            'subtotal': self.subtotal,
+            'tax': self.tax,
+            'total': self.total,
+            'firstBillNumber': self.first_bill_number,
+            'lastBillNumber': self.last_bill_number,
+            'orderTypes': breakdowns['orderTypes'],
+            'categories': breakdowns['categories'],
+            'departments': breakdowns['departments'],
+            'closedAt': self.closed_at.isoformat()
+        }
+
+class Printer(OutletScoped, db.Model):
+    """Receipt printer reachable by the server-side print spooler"""
+    __tablename__ = 'printers'
+    __table_args__ = (
+        db.UniqueConstraint('outlet_id', 'name', name='uq_printers_outlet_name'),
+    )
+    
+    outlet_id = db.Column(db.String(64), primary_key=True, default=current_outlet_id)
+    id = db.Column(db.String, primary_key=True)
+    name = db.Column(db.String, nullable=False)  # matches KOTConfig/BillConfig.selected_printer
+    address = db.Column(db.String, nullable=False)  # tcp://host:9100, unix:///path or file:///path
+    department = db.Column(db.String, nullable=True)  # KOTs for this department print here
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'address': self.address,
+            'department': self.department
+        }
+
+class PrintJob(OutletScoped, db.Model):
+    __tablename__ = 'print_jobs'
+    __table_args__ = (
+        db.Index('ix_print_jobs_outlet_status', 'outlet_id', 'status', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    outlet_id = db.Column(db.String(64), nullable=False, default=current_outlet_id)
+    kind = db.Column(db.String, nullable=False)  # 'kot' or 'bill'
+    printer_id = db.Column(db.String, nullable=False)
+    department = db.Column(db.String, nullable=True)
+    copies = db.Column(db.Integer, nullable=False, default=1)
+    payload = db.Column(db.Text, nullable=False)  # JSON ticket content, rendered by the spooler
+    status = db.Column(db.String, nullable=False, default='queued')  # queued, printing, printed or failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'printerId': self.printer_id,
+            'department': self.department,
+            'copies': self.copies,
+            'status': self.status,
+            'attempts': self.attempts,
+            'lastError': self.last_error,
+            'createdAt': self.created_at.isoformat(),
+            'updatedAt': self.updated_at.isoformat()
+        }
+
+class Job(OutletScoped, db.Model):
+    """Background job (e.g. an asynchronous menu import) and its progress"""
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    outlet_id = db.Column(db.String(64), nullable=False, default=current_outlet_id)
+    kind = db.Column(db.String, nullable=False)
+    status = db.Column(db.String, nullable=False, default='queued')  # queued, running, cancelling, cancelled, completed or failed
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Text, nullable=False, default='[]')  # JSON list
+    stats = db.Column(db.Text, nullable=True)  # JSON, set when the job finishes
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'rowsProcessed': self.rows_processed,
+            'errors': json.loads(self.errors),
+            'stats': json.loads(self.stats) if self.stats else None,
+            'createdAt': self.created_at.isoformat(),
+            'updatedAt': self.updated_at.isoformat(),
+            'finishedAt': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class KitchenItem(OutletScoped, db.Model):
+    """An order line sent to the kitchen, shown on its department's display until served"""
+    __tablename__ = 'kitchen_items'
+    __table_args__ = (
+        db.Index('ix_kitchen_items_outlet_department_status', 'outlet_id', 'department', 'status', 'fired_at'),
+        db.Index('ix_kitchen_items_outlet_department_updated', 'outlet_id', 'department', 'updated_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    outlet_id = db.Column(db.String(64), nullable=False, default=current_outlet_id)
+    department = db.Column(db.String, nullable=False, default='')
+    table_id = db.Column(db.String, nullable=False)
+    table_name = db.Column(db.String, nullable=False)
+    item_id = db.Column(db.String, nullable=False)
+    name = db.Column(db.String, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String, nullable=False, default='pending')  # pending, ready or served
+    fired_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    ready_at = db.Column(db.DateTime, nullable=True)
+    served_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'department': self.department,
+            'tableId': self.table_id,
+            'tableName': self.table_name,
+            'itemId': self.item_id,
+            'name': self.name,
+            'quantity': self.quantity,
+            'status': self.status,
+            'firedAt': self.fired_at.isoformat(),
+            'readyAt': self.ready_at.isoformat() if self.ready_at else None,
+            'servedAt': self.served_at.isoformat() if self.served_at else None
+        }
+
+class Tombstone(OutletScoped, db.Model):
+    """Record of a deleted synced row, so the delta sync feed can report deletes"""
+    __tablename__ = 'tombstones'
+    __table_args__ = (
+        db.Index('ix_tombstones_outlet_deleted_at', 'outlet_id', 'deleted_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    outlet_id = db.Column(db.String(64), nullable=False, default=current_outlet_id)
+    entity = db.Column(db.String(64), nullable=False)  # table name of the deleted row
+    entity_id = db.Column(db.String, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _record_tombstones(session, flush_context, instances):
+    for obj in session.deleted:
+        if isinstance(obj, SyncTracked):
+            session.add(Tombstone(outlet_id=obj.outlet_id, entity=obj.__tablename__, entity_id=str(obj.id)))
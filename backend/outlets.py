@@ -0,0 +1,61 @@
+import re
+
+from flask import current_app, g, has_app_context, jsonify, request
+
+DEFAULT_OUTLET_ID = 'default'
+OUTLET_HEADER = 'X-Outlet-Id'
+
+_OUTLET_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def current_outlet_id():
+    """Outlet the current request (or app context) is scoped to"""
+    if has_app_context():
+        return g.get('outlet_id', DEFAULT_OUTLET_ID)
+    return DEFAULT_OUTLET_ID
+
+
+def outlet_bind_key(outlet_id):
+    """SQLALCHEMY_BINDS key of an outlet that has its own database"""
+    return f'outlet:{outlet_id}'
+
+
+class Outlets:
+    """Resolve the outlet of each request in multi-outlet mode.
+
+    With ``MULTI_OUTLET_ENABLED`` the outlet id comes from the ``X-Outlet-Id`` header
+    (or the ``outlet`` query parameter, for plain download links). Otherwise every
+    request belongs to the default outlet. Outlets listed in ``OUTLET_DATABASE_URLS``
+    are registered as extra binds so the routing session can send them to their
+    own database.
+
+    Must be initialised before ``db.init_app`` so the binds are picked up.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MULTI_OUTLET_ENABLED', False)
+        app.config.setdefault('OUTLET_DATABASE_URLS', {})
+
+        binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+        for outlet_id, url in app.config['OUTLET_DATABASE_URLS'].items():
+            binds[outlet_bind_key(outlet_id)] = url
+
+        app.before_request(self._resolve_outlet)
+
+    def _resolve_outlet(self):
+        if not current_app.config['MULTI_OUTLET_ENABLED']:
+            g.outlet_id = DEFAULT_OUTLET_ID
+            return None
+
+        outlet_id = request.headers.get(OUTLET_HEADER) or request.args.get('outlet') or DEFAULT_OUTLET_ID
+        if not _OUTLET_ID_PATTERN.match(outlet_id):
+            return jsonify({'error': 'Invalid outlet id'}), 400
+        g.outlet_id = outlet_id
+        return None
+
+
+outlets = Outlets()
@@ -0,0 +1,259 @@
+import logging
+import re
+import time
+import weakref
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+
+from models import db, Invoice
+from outlets import current_outlet_id
+
+logger = logging.getLogger(__name__)
+
+# Non-Postgres backends move old invoices into this table
+ARCHIVE_TABLE = 'invoices_archive'
+DEFAULT_PARTITION = 'invoices_default'
+PARTITION_LOCK_KEY = 0x1d2c0001  # pg_advisory_xact_lock key held while creating partitions
+
+_PARTITION_NAME = re.compile(r'^invoices_(\d{4})_(\d{2})$')
+_ARCHIVED_PARTITION_NAME = re.compile(r'^invoices_archive_(\d{4})_(\d{2})$')
+_TABLE_NAMES_TTL_SECONDS = 60
+_table_names_cache = weakref.WeakKeyDictionary()  # engine -> (expires at, table names)
+
+
+def month_start(dt):
+    return datetime(dt.year, dt.month, 1)
+
+
+def add_months(dt, months):
+    years, month_index = divmod(dt.month - 1 + months, 12)
+    return datetime(dt.year + years, month_index + 1, 1)
+
+
+def parse_timestamp(value):
+    """Parse an ISO timestamp from a query string into the naive UTC form invoices are stored in"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def partition_name(month):
+    return f'invoices_{month.year:04d}_{month.month:02d}'
+
+
+def ensure_partitions(engine, months_ahead=2, now=None):
+    """Create monthly partitions for the current month and the next ``months_ahead``
+    months. Only Postgres uses native partitions; other backends are left untouched.
+
+    Safe to run from several workers at once: creation is serialised by an advisory
+    lock. Invoices that already landed in the default partition for a month (after
+    downtime, or from a terminal with a clock ahead) are moved into the new
+    partition, as Postgres refuses to create a partition whose rows the default
+    partition holds.
+    """
+    if engine.dialect.name != 'postgresql':
+        return []
+
+    current = month_start(now or datetime.utcnow())
+    created = []
+    with engine.begin() as conn:
+        if not _is_partitioned(conn):
+            logger.warning("invoices is not partitioned, run `flask db upgrade`; skipping invoice partitions")
+            return []
+        conn.execute(sa.text('SELECT pg_advisory_xact_lock(:key)'), {'key': PARTITION_LOCK_KEY})
+        existing = set(sa.inspect(conn).get_table_names())
+        for offset in range(months_ahead + 1):
+            start = add_months(current, offset)
+            name = partition_name(start)
+            if name in existing:
+                continue
+            _create_partition(conn, name, start, add_months(start, 1), DEFAULT_PARTITION in existing)
+            created.append(name)
+    _table_names_cache.pop(engine, None)
+    return created
+
+
+def _is_partitioned(conn):
+    return conn.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'invoices' AND c.relnamespace = current_schema()::regnamespace)"
+    )).scalar()
+
+
+def _create_partition(conn, name, start, end, has_default):
+    in_range = {'start': start, 'end': end}
+    stranded = has_default and conn.execute(sa.text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end)"
+    ), in_range).scalar()
+    if stranded:
+        conn.execute(sa.text(
+            f"CREATE TEMPORARY TABLE stranded_invoices ON COMMIT DROP AS "
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end RETURNING *) "
+            f"SELECT * FROM moved"
+        ), in_range)
+    conn.execute(sa.text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF invoices "
+        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+    ))
+    if stranded:
+        moved = conn.execute(sa.text(f"INSERT INTO {name} SELECT * FROM stranded_invoices")).rowcount
+        conn.execute(sa.text("DROP TABLE stranded_invoices"))
+        logger.info(f"Moved {moved} invoices from {DEFAULT_PARTITION} into {name}")
+
+
+def archive_invoices(engine, retention_months, now=None):
+    """Move invoices from months older than the retention window out of the live table.
+
+    On Postgres whole monthly partitions are detached and renamed to
+    ``invoices_archive_YYYY_MM``. Elsewhere the rows are moved, a month per
+    transaction, into the ``invoices_archive`` table. Returns a description of what
+    was archived.
+    """
+    cutoff = add_months(month_start(now or datetime.utcnow()), -retention_months)
+    try:
+        if engine.dialect.name == 'postgresql':
+            return _detach_partitions(engine, cutoff)
+        return _move_to_archive_table(engine, cutoff)
+    finally:
+        _table_names_cache.pop(engine, None)
+
+
+def _detach_partitions(engine, cutoff):
+    detached = []
+    with engine.connect() as conn:
+        names = conn.execute(sa.text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'invoices'"
+        )).scalars().all()
+
+    for name in sorted(names):
+        match = _PARTITION_NAME.match(name)
+        if not match:
+            continue  # the default partition is never detached
+        month = datetime(int(match.group(1)), int(match.group(2)), 1)
+        if add_months(month, 1) > cutoff:
+            continue
+        archived_name = f'invoices_archive_{month.year:04d}_{month.month:02d}'
+        with engine.begin() as conn:
+            conn.execute(sa.text(f'ALTER TABLE invoices DETACH PARTITION {name}'))
+            conn.execute(sa.text(f'ALTER TABLE {name} RENAME TO {archived_name}'))
+        logger.info(f"Detached invoice partition {name} as {archived_name}")
+        detached.append(archived_name)
+    return {'detached': detached}
+
+
+def _move_to_archive_table(engine, cutoff):
+    archive = invoice_table(ARCHIVE_TABLE)
+    archive.metadata.create_all(engine)
+    live = Invoice.__table__
+    columns = [column.name for column in live.columns]
+
+    moved = 0
+    while True:
+        with engine.begin() as conn:
+            oldest = conn.execute(
+                sa.select(sa.func.min(live.c.timestamp)).where(live.c.timestamp < cutoff)
+            ).scalar()
+            if oldest is None:
+                break
+            month_end = min(add_months(month_start(oldest), 1), cutoff)
+            in_month = live.c.timestamp < month_end
+            conn.execute(archive.insert().from_select(columns, sa.select(*live.c).where(in_month)))
+            moved += conn.execute(live.delete().where(in_month)).rowcount
+    if moved:
+        logger.info(f"Moved {moved} invoices older than {cutoff:%Y-%m-%d} to {ARCHIVE_TABLE}")
+    return {'moved': moved}
+
+
+def invoices_between(start=None, end=None):
+    """Invoices of the current outlet with ``start <= timestamp < end``, oldest first.
+
+    The timestamp filter lets Postgres prune to the partitions covering the range.
+    When a range is given, archived months that overlap it are read as well, so
+    callers do not need to know what has been archived. Without a start only live
+    invoices are returned.
+    """
+    query = Invoice.scoped()
+    if start is not None:
+        query = query.filter(Invoice.timestamp >= start)
+    if end is not None:
+        query = query.filter(Invoice.timestamp < end)
+    invoices = query.order_by(Invoice.timestamp).all()
+
+    if start is not None:
+        archived = _archived_invoices(start, end)
+        if archived:
+            invoices = sorted(archived + invoices, key=lambda invoice: invoice.timestamp)
+    return invoices
+
+
+def find_invoice(invoice_id):
+    """Invoice of the current outlet by id, live or archived (``None`` if there is none).
+
+    Archived invoices are returned as transient instances, for reading only.
+    """
+    invoice = Invoice.get_scoped(invoice_id)
+    if invoice is not None:
+        return invoice
+    for table in archived_invoice_tables(datetime.min):
+        row = db.session.execute(
+            sa.select(table).where(table.c.outlet_id == current_outlet_id(), table.c.id == invoice_id)
+        ).first()
+        if row is not None:
+            return Invoice(**row._mapping)
+    return None
+
+
+def archived_invoice_tables(start, end=None):
+    """Archive tables (as Core tables) that may hold invoices with ``start <= timestamp < end``"""
+    engine = db.session.get_bind(mapper=Invoice)
+    table_names = _table_names(engine)
+
+    tables = []
+    if engine.dialect.name == 'postgresql':
+        for name in table_names:
+            match = _ARCHIVED_PARTITION_NAME.match(name)
+            if not match:
+                continue
+            month = datetime(int(match.group(1)), int(match.group(2)), 1)
+            if add_months(month, 1) > start and (end is None or month < end):
+                tables.append(invoice_table(name))
+    elif ARCHIVE_TABLE in table_names:
+        tables.append(invoice_table(ARCHIVE_TABLE))
+    return tables
+
+
+def _archived_invoices(start, end):
+    archived = []
+    for table in archived_invoice_tables(start, end):
+        query = sa.select(table).where(table.c.outlet_id == current_outlet_id(), table.c.timestamp >= start)
+        if end is not None:
+            query = query.where(table.c.timestamp < end)
+        # Transient (never added to the session) so they serialise like live invoices
+        archived.extend(Invoice(**row._mapping) for row in db.session.execute(query))
+    return archived
+
+
+def _table_names(engine):
+    cached = _table_names_cache.get(engine)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    names = set(sa.inspect(engine).get_table_names())
+    _table_names_cache[engine] = (time.monotonic() + _TABLE_NAMES_TTL_SECONDS, names)
+    return names
+
+
+def invoice_table(name):
+    """Table with the invoice columns, outside the model metadata (archives are not
+    created by ``create_all``)"""
+    return sa.Table(
+        name,
+        sa.MetaData(),
+        *[sa.Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+          for column in Invoice.__table__.columns],
+        sa.Index(f'ix_{name}_outlet_timestamp', 'outlet_id', 'timestamp')
+    )
@@ -0,0 +1,264 @@
+import bisect
+import hashlib
+import json
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from zoneinfo import ZoneInfo
+
+from flask import current_app
+
+from models import Category, MenuItem, PriceRule, RestaurantSettings
+from outlets import current_outlet_id
+
+CENT = Decimal('0.01')
+HUNDRED = Decimal(100)
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_TAX_RATE = 5.0  # RestaurantSettings.tax_rate default, for outlets without settings
+
+RULE_KINDS = ('percent', 'price')
+
+# Decimal price and tax rate, plus their float forms for the JSON response
+PricedItem = namedtuple('PricedItem', 'id name category department price tax_rate price_float tax_rate_float')
+
+
+class PricingError(Exception):
+    """An order that cannot be priced; ``status_code`` is the HTTP status"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def to_decimal(value):
+    # Through str, so a stored 2.675 is 2.675 rather than its binary approximation
+    return Decimal(str(value))
+
+
+def money(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def tax_breakdown(lines):
+    """Tax per rate on priced lines (``amount`` and ``taxRate``), as [{rate, taxable, tax}].
+
+    Tax is computed once per rate on the sum of the line amounts at that rate and
+    rounded half-up to the cent, so a receipt printed from a stored invoice shows
+    the same figures as the quote it was priced from.
+    """
+    taxable = {}  # tax rate -> amount
+    for line in lines:
+        rate = to_decimal(line['taxRate'])
+        taxable[rate] = taxable.get(rate, 0) + to_decimal(line['amount'])
+    return [
+        {'rate': float(rate), 'taxable': float(money(amount)), 'tax': float(money(amount * rate / HUNDRED))}
+        for rate, amount in sorted(taxable.items())
+    ]
+
+
+def parse_minutes(value):
+    """Minutes after midnight of an ``HH:MM`` time"""
+    hours, minutes = value.split(':')
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Invalid time {value!r}, expected HH:MM")
+    return hours * 60 + minutes
+
+
+def _number(value):
+    # Whole quantities serialise as ints, like the client sends them
+    return int(value) if value == value.to_integral_value() else float(value)
+
+
+class PriceList:
+    """One outlet's prices, tax rates and happy-hour rules, compiled for lookups.
+
+    Every menu item is resolved to its base price and tax rate (its category's rate,
+    or the outlet's). Rules are compiled into one table per weekday: the minute
+    boundaries where any rule starts or ends, and for each segment between them the
+    discounted price of every item a rule covers. Pricing a line is then a bisect and
+    two dict lookups. When several rules cover an item the lowest price wins, and a
+    rule never raises an item above its menu price.
+    """
+
+    def __init__(self, items, categories, settings, rules):
+        default_rate = to_decimal(settings.tax_rate if settings is not None else DEFAULT_TAX_RATE)
+        category_rates = {
+            category.name: to_decimal(category.tax_rate) for category in categories if category.tax_rate is not None
+        }
+        self.items = {}
+        for item in items:
+            price = money(to_decimal(item.price))
+            tax_rate = category_rates.get(item.category, default_rate)
+            self.items[item.id] = PricedItem(
+                item.id, item.name, item.category, item.department, price, tax_rate, float(price), float(tax_rate)
+            )
+        rules = [rule for rule in rules if rule.active]
+        self.days = self._compile_rules(rules)
+        self.version = hashlib.sha1(json.dumps([
+            sorted((item.id, str(item.price), str(item.tax_rate)) for item in self.items.values()),
+            sorted((rule.to_dict() for rule in rules), key=lambda rule: rule['id'])
+        ]).encode()).hexdigest()[:16]
+
+    def _compile_rules(self, rules):
+        windows = [[] for _ in range(7)]  # weekday -> (start minute, end minute, rule)
+        for rule in rules:
+            start, end = parse_minutes(rule.start_time), parse_minutes(rule.end_time)
+            days = [int(day) for day in rule.days] if rule.days is not None else range(7)
+            for day in days:
+                if start < end:
+                    windows[day].append((start, end, rule))
+                else:
+                    # Runs past midnight into the next day
+                    windows[day].append((start, MINUTES_PER_DAY, rule))
+                    windows[(day + 1) % 7].append((0, end, rule))
+
+        by_category = {}
+        for item in self.items.values():
+            by_category.setdefault(item.category, []).append(item)
+
+        days = []
+        for day_windows in windows:
+            boundaries = sorted({0} | {start for start, _, _ in day_windows} | {end for _, end, _ in day_windows}
+                                - {MINUTES_PER_DAY})
+            segments = []
+            for segment_start in boundaries:
+                overrides = {}
+                for start, end, rule in day_windows:
+                    if start <= segment_start < end:
+                        self._apply_rule(rule, by_category, overrides)
+                segments.append(overrides)
+            days.append((boundaries, segments))
+        return days
+
+    def _apply_rule(self, rule, by_category, overrides):
+        if rule.item_id is not None:
+            covered = [self.items[rule.item_id]] if rule.item_id in self.items else []
+        elif rule.category is not None:
+            covered = by_category.get(rule.category, [])
+        else:
+            covered = self.items.values()
+
+        value = to_decimal(rule.value)
+        for item in covered:
+            if rule.kind == 'price':
+                price = money(value)
+            else:
+                price = money(item.price * (HUNDRED - value) / HUNDRED)
+            if price < overrides.get(item.id, (item.price,))[0]:
+                overrides[item.id] = (price, float(price), rule.name)
+
+    def overrides_at(self, at, tz):
+        """Happy-hour prices in force at ``at`` (naive UTC or aware): item id -> (price, float price, rule name)"""
+        if at.tzinfo is None:
+            at = at.replace(tzinfo=timezone.utc)
+        local = at.astimezone(tz)
+        boundaries, segments = self.days[local.weekday()]
+        return segments[bisect.bisect_right(boundaries, local.hour * 60 + local.minute) - 1]
+
+    def quote(self, lines, at, tz):
+        """Price order lines (``id`` and ``quantity``; client prices are ignored).
+
+        Line amounts are rounded to the cent and the subtotal is their sum, so the
+        printed lines add up; tax is computed per rate by ``tax_breakdown``.
+        """
+        overrides = self.overrides_at(at, tz)
+        priced = []
+        unknown = []
+        subtotal = Decimal(0)
+        for line in lines:
+            item = self.items.get(str(line.get('id')))
+            if item is None:
+                unknown.append(str(line.get('id')))
+                continue
+            quantity = line.get('quantity', 1)
+            try:
+                exact_quantity = Decimal(quantity) if type(quantity) is int else to_decimal(quantity)
+            except InvalidOperation:
+                raise PricingError(f"Invalid quantity for {item.name}")
+            if not exact_quantity.is_finite() or exact_quantity <= 0:
+                raise PricingError(f"Invalid quantity for {item.name}")
+
+            price, price_float, rule = overrides.get(item.id) or (item.price, item.price_float, None)
+            amount = money(price * exact_quantity)
+            subtotal += amount
+            priced.append({
+                'id': item.id,
+                'name': item.name,
+                'category': item.category,
+                'department': item.department,
+                'quantity': quantity if type(quantity) is int else _number(exact_quantity),
+                'price': price_float,
+                'basePrice': item.price_float,
+                'amount': float(amount),
+                'taxRate': item.tax_rate_float,
+                'priceRule': rule
+            })
+        if unknown:
+            raise PricingError(f"Items not on the menu: {', '.join(unknown)}")
+
+        taxes = tax_breakdown(priced)
+        tax = sum((to_decimal(entry['tax']) for entry in taxes), Decimal(0))
+        return {
+            'priceListVersion': self.version,
+            'items': priced,
+            'subtotal': float(subtotal),
+            'tax': float(tax),
+            'total': float(subtotal + tax),
+            'taxes': taxes
+        }
+
+
+class Pricing:
+    """Server-side order pricing from cached per-outlet price lists.
+
+    Price lists are built from the database on first use and dropped by the routes
+    that change menu items, categories, restaurant settings or price rules. They
+    are rebuilt after ``PRICING_MAX_AGE_SECONDS`` so that changes made by other
+    worker processes are picked up. With ``SERVER_PRICING_ENABLED`` (off by default),
+    invoices are priced here and client totals are ignored.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SERVER_PRICING_ENABLED', False)
+        app.config.setdefault('PRICING_MAX_AGE_SECONDS', 30)
+        app.extensions['pricing'] = {'lock': threading.Lock(), 'price_lists': {}}
+
+    @property
+    def enabled(self):
+        return current_app.config['SERVER_PRICING_ENABLED']
+
+    def price_list(self):
+        state = current_app.extensions['pricing']
+        outlet_id = current_outlet_id()
+        entry = state['price_lists'].get(outlet_id)
+        if entry is None or time.monotonic() - entry[1] > current_app.config['PRICING_MAX_AGE_SECONDS']:
+            with state['lock']:
+                entry = state['price_lists'].get(outlet_id)
+                if entry is None or time.monotonic() - entry[1] > current_app.config['PRICING_MAX_AGE_SECONDS']:
+                    price_list = PriceList(
+                        MenuItem.scoped().all(),
+                        Category.scoped().all(),
+                        RestaurantSettings.scoped().first(),
+                        PriceRule.scoped().all()
+                    )
+                    entry = (price_list, time.monotonic())
+                    state['price_lists'][outlet_id] = entry
+        return entry[0]
+
+    def invalidate(self):
+        """Drop the outlet's price list after a committed change to anything it is built from"""
+        current_app.extensions['pricing']['price_lists'].pop(current_outlet_id(), None)
+
+    def quote(self, lines, at=None):
+        tz = ZoneInfo(current_app.config['BUSINESS_TIMEZONE'])
+        return self.price_list().quote(lines, at or datetime.utcnow(), tz)
+
+
+pricing = Pricing()
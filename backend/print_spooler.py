@@ -0,0 +1,249 @@
+import json
+import logging
+import queue
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+from flask import current_app, g
+
+from models import db, MenuItem, PrintJob, Printer, RestaurantSettings
+from outlets import current_outlet_id
+from receipts import receipt_renderer
+
+logger = logging.getLogger(__name__)
+
+
+def deliver(address, data, timeout):
+    """Send raw bytes to a printer address.
+
+    ``tcp://host:port`` is a raw (JetDirect/ESC-POS) network printer. ``unix:///path``
+    and ``file:///path`` write to a local socket or append to a file, which stand in
+    for real printers when testing.
+    """
+    target = urlparse(address)
+    if target.scheme == 'tcp':
+        with socket.create_connection((target.hostname, target.port or 9100), timeout=timeout) as conn:
+            conn.sendall(data)
+    elif target.scheme == 'unix':
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(timeout)
+            conn.connect(target.path)
+            conn.sendall(data)
+    elif target.scheme == 'file':
+        with open(target.path, 'ab') as f:
+            f.write(data)
+    else:
+        raise ValueError(f"Unsupported printer address: {address}")
+
+
+class PrintSpooler:
+    """Server-side print queue with one worker thread per printer.
+
+    Jobs are stored in the ``print_jobs`` table before they are queued, so their
+    status can be polled and failed jobs retried. Each printer drains its own queue,
+    which means a slow or offline printer only delays its own tickets. Failed
+    deliveries are retried with backoff up to ``PRINT_MAX_ATTEMPTS`` times.
+
+    A job stays ``printing`` while it is being delivered. If it has not finished
+    after ``PRINT_JOB_LEASE_SECONDS`` the process delivering it is assumed to have
+    died, and the job is queued again when the next job is submitted.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PRINT_SPOOLER_ENABLED', False)
+        app.config.setdefault('PRINT_MAX_ATTEMPTS', 5)
+        app.config.setdefault('PRINT_TIMEOUT_SECONDS', 5)
+        app.config.setdefault('PRINT_JOB_LEASE_SECONDS', 120)
+        app.extensions['print_spooler'] = {'lock': threading.Lock(), 'queues': {}, 'recovered': set()}
+
+    @property
+    def enabled(self):
+        return current_app.config['PRINT_SPOOLER_ENABLED']
+
+    def enqueue_kot(self, ticket, kot_config):
+        """Queue KOT jobs for newly sent items, split by department if configured.
+
+        ``ticket`` holds ``tableName``, ``timestamp`` and ``items``. Items are routed
+        by their menu item's department; the ``department`` sent with an item is only
+        used for items that are not on the menu. Returns the new jobs; they are
+        committed here and handed to the printer workers.
+        """
+        printers = Printer.scoped().all()
+        default_printer = next((p for p in printers if p.name == kot_config.selected_printer), None)
+        department_printers = {p.department: p for p in printers if p.department}
+
+        if kot_config.print_by_department:
+            item_ids = {item.get('id') for item in ticket['items'] if item.get('id')}
+            menu_departments = dict(
+                MenuItem.scoped().filter(MenuItem.id.in_(item_ids))
+                .with_entities(MenuItem.id, MenuItem.department).all()
+            ) if item_ids else {}
+            groups = {}
+            for item in ticket['items']:
+                department = menu_departments.get(item.get('id')) or item.get('department') or None
+                groups.setdefault(department, []).append(item)
+        else:
+            groups = {None: ticket['items']}
+
+        jobs = []
+        for department, items in groups.items():
+            printer = department_printers.get(department, default_printer)
+            if printer is None:
+                logger.warning(f"No printer configured for KOT department {department!r}")
+                continue
+            jobs.append(PrintJob(
+                kind='kot',
+                printer_id=printer.id,
+                department=department,
+                copies=max(kot_config.number_of_copies, 1),
+                payload=json.dumps(dict(ticket, items=items, department=department))
+            ))
+        return self._submit(jobs)
+
+    def enqueue_bill(self, invoice, printer_name):
+        printer = Printer.scoped().filter_by(name=printer_name).first()
+        if printer is None:
+            logger.warning(f"Bill printer {printer_name!r} is not configured")
+            return []
+        return self._submit([PrintJob(kind='bill', printer_id=printer.id, payload=json.dumps(invoice))])
+
+    def retry(self, job):
+        """Queue a failed job again. Returns False if it is no longer failed."""
+        retried = PrintJob.scoped().filter_by(id=job.id, status='failed').update(
+            {'status': 'queued', 'attempts': 0, 'last_error': None}
+        )
+        db.session.commit()
+        if not retried:
+            return False
+        db.session.refresh(job)
+        self._dispatch(job)
+        return True
+
+    def _submit(self, jobs):
+        if not jobs:
+            return []
+        db.session.add_all(jobs)
+        db.session.commit()
+        self._recover()
+        self._reclaim_stale()
+        for job in jobs:
+            self._dispatch(job)
+        return jobs
+
+    def _dispatch(self, job):
+        self._queue_for(job.outlet_id, job.printer_id).put(job.id)
+
+    def _queue_for(self, outlet_id, printer_id):
+        state = current_app.extensions['print_spooler']
+        key = (outlet_id, printer_id)
+        with state['lock']:
+            jobs = state['queues'].get(key)
+            if jobs is None:
+                jobs = state['queues'][key] = queue.Queue()
+                threading.Thread(
+                    target=self._worker,
+                    args=(current_app._get_current_object(), outlet_id, jobs),
+                    name=f'print-{outlet_id}-{printer_id}',
+                    daemon=True
+                ).start()
+        return jobs
+
+    def _recover(self):
+        """Requeue jobs left queued by a previous process (once per outlet)"""
+        state = current_app.extensions['print_spooler']
+        outlet_id = current_outlet_id()
+        with state['lock']:
+            if outlet_id in state['recovered']:
+                return
+            state['recovered'].add(outlet_id)
+        for job in PrintJob.scoped().filter_by(status='queued').order_by(PrintJob.id).all():
+            self._dispatch(job)
+
+    def _reclaim_stale(self):
+        """Queue jobs again whose delivery outlived the lease (their process died)"""
+        cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['PRINT_JOB_LEASE_SECONDS'])
+        stale = PrintJob.scoped().filter(
+            PrintJob.status == 'printing', PrintJob.updated_at < cutoff
+        ).order_by(PrintJob.id).all()
+        for job in stale:
+            # Conditional, so a job that finished meanwhile (or that another process
+            # reclaimed) is left alone
+            reclaimed = PrintJob.scoped().filter_by(id=job.id, status='printing', updated_at=job.updated_at).update(
+                {'status': 'queued'}, synchronize_session=False
+            )
+            db.session.commit()
+            if reclaimed:
+                logger.warning(f"Print job {job.id} was still printing after its lease expired, queueing it again")
+                self._dispatch(job)
+
+    def _worker(self, app, outlet_id, jobs):
+        while True:
+            job_id = jobs.get()
+            # Retry in place so this printer's tickets stay in order
+            while True:
+                retry_after = self._run(app, outlet_id, job_id)
+                if retry_after is None:
+                    break
+                time.sleep(retry_after)
+
+    def _run(self, app, outlet_id, job_id):
+        with app.app_context():
+            g.outlet_id = outlet_id
+            try:
+                return self._print(job_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Print job {job_id} crashed: {e}")
+                return None
+
+    def _print(self, job_id):
+        """Deliver one job. Returns seconds to wait before retrying, or ``None``."""
+        # Claim the job so a job queued twice (or by two processes) prints once
+        claimed = PrintJob.scoped().filter_by(id=job_id, status='queued').update(
+            {'status': 'printing', 'attempts': PrintJob.attempts + 1}
+        )
+        db.session.commit()
+        if not claimed:
+            return None
+
+        job = PrintJob.scoped().filter_by(id=job_id).first()
+        printer = Printer.get_scoped(job.printer_id)
+        try:
+            if printer is None:
+                raise LookupError(f"Printer {job.printer_id} no longer exists")
+            data = self._render(job) * job.copies
+            deliver(printer.address, data, current_app.config['PRINT_TIMEOUT_SECONDS'])
+        except Exception as e:
+            job.last_error = str(e)[:500]
+            if job.attempts < current_app.config['PRINT_MAX_ATTEMPTS'] and printer is not None:
+                job.status = 'queued'
+                db.session.commit()
+                logger.warning(f"Print job {job.id} failed (attempt {job.attempts}), retrying: {e}")
+                return min(2 ** job.attempts, 30)
+            job.status = 'failed'
+            db.session.commit()
+            logger.error(f"Print job {job.id} failed permanently: {e}")
+            return None
+
+        job.status = 'printed'
+        job.last_error = None
+        db.session.commit()
+        return None
+
+    def _render(self, job):
+        settings = RestaurantSettings.scoped().first()
+        settings = settings.to_dict() if settings else {}
+        payload = json.loads(job.payload)
+        if job.kind == 'kot':
+            return receipt_renderer.render_kot(payload, settings)
+        return receipt_renderer.render_bill(payload, settings)
+
+
+print_spooler = PrintSpooler()
@@ -0,0 +1,299 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import current_app
+
+from outlets import current_outlet_id
+from pricing import tax_breakdown
+
+# ESC/POS control sequences
+ESC = b'\x1b'
+GS = b'\x1d'
+INIT = ESC + b'@'
+ALIGN_LEFT = ESC + b'a\x00'
+ALIGN_CENTER = ESC + b'a\x01'
+BOLD_ON = ESC + b'E\x01'
+BOLD_OFF = ESC + b'E\x00'
+DOUBLE_SIZE = GS + b'!\x11'
+NORMAL_SIZE = GS + b'!\x00'
+FEED_AND_CUT = GS + b'V\x42\x03'
+
+DEFAULT_LINE_WIDTH = 42  # characters per line on an 80 mm printer with font A
+
+FORMATS = ('escpos', 'pdf')
+
+# Line styles shared by both output formats
+NORMAL = 'normal'
+BOLD = 'bold'
+CENTER = 'center'
+TITLE = 'title'
+
+
+class LRUCache:
+    """Small thread-safe least-recently-used cache"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+def _format_time(value):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).strftime('%d/%m/%Y %H:%M')
+    except (AttributeError, ValueError):
+        return value or ''
+
+
+def _columns(left, right, width):
+    space = max(width - len(left) - len(right), 1)
+    return left + ' ' * space + right
+
+
+def _rule(width):
+    return ('-' * width, NORMAL)
+
+
+# Ticket layouts. Header and footer lines depend only on the settings and the line
+# width, so they are compiled once per template; body lines are rendered per ticket.
+
+def _bill_header(settings, width):
+    lines = [(settings.get('restaurantName') or '', TITLE)]
+    for field in ('address', 'phone', 'email'):
+        if settings.get(field):
+            lines.append((settings[field][:width], CENTER))
+    lines.append(_rule(width))
+    return lines
+
+
+def _bill_footer(settings, width):
+    return [_rule(width), ('Thank you! Visit again', CENTER)]
+
+
+def _bill_body(invoice, settings, width):
+    currency = settings.get('currency') or ''
+    lines = [(_columns('Bill No:', invoice.get('billNumber') or '', width), NORMAL)]
+    if invoice.get('tableName'):
+        lines.append((_columns('Table:', invoice['tableName'], width), NORMAL))
+    lines.append((_columns('Date:', _format_time(invoice.get('timestamp')), width), NORMAL))
+    lines.append(_rule(width))
+    for item in invoice['items']:
+        amount = f"{item.get('amount', item.get('price', 0) * item.get('quantity', 0)):.2f}"
+        name = f"{item.get('quantity', 0)} x {item.get('name', '')}"
+        lines.append((_columns(name[:width - len(amount) - 1], amount, width), NORMAL))
+    lines.append(_rule(width))
+    lines.append((_columns('Subtotal:', f"{invoice.get('subtotal', 0):.2f}", width), NORMAL))
+    if invoice['items'] and all('taxRate' in item and 'amount' in item for item in invoice['items']):
+        # Priced by the server: tax per rate, as billed
+        taxes = tax_breakdown(invoice['items'])
+        for entry in taxes:
+            label = f"Tax ({entry['rate']:g}%):" if len(taxes) == 1 else f"Tax {entry['rate']:g}% on {entry['taxable']:.2f}:"
+            lines.append((_columns(label, f"{entry['tax']:.2f}", width), NORMAL))
+    else:
+        lines.append((_columns(f"Tax ({settings.get('taxRate', 0)}%):", f"{invoice.get('tax', 0):.2f}", width), NORMAL))
+    lines.append((_columns('Total:', f"{currency} {invoice.get('total', 0):.2f}", width), BOLD))
+    return lines
+
+
+def _kot_header(settings, width):
+    return [('KOT', TITLE)]
+
+
+def _kot_footer(settings, width):
+    return [_rule(width)]
+
+
+def _kot_body(ticket, settings, width):
+    lines = []
+    if ticket.get('department'):
+        lines.append((ticket['department'], CENTER))
+    lines.append(_rule(width))
+    lines.append((_columns('Table:', ticket.get('tableName') or '-', width), NORMAL))
+    lines.append((_columns('Time:', _format_time(ticket.get('timestamp')), width), NORMAL))
+    lines.append(_rule(width))
+    for item in ticket['items']:
+        lines.append((f"{item.get('quantity', 0):>3} x {item.get('name', '')}"[:width], BOLD))
+    return lines
+
+
+LAYOUTS = {
+    'bill': (_bill_header, _bill_body, _bill_footer),
+    'kot': (_kot_header, _kot_body, _kot_footer),
+}
+
+
+# Output formats
+
+class EscPosFormat:
+    mimetype = 'application/octet-stream'
+    extension = 'bin'
+
+    _STYLES = {
+        NORMAL: (b'', b''),
+        BOLD: (BOLD_ON, BOLD_OFF),
+        CENTER: (ALIGN_CENTER, ALIGN_LEFT),
+        TITLE: (ALIGN_CENTER + BOLD_ON + DOUBLE_SIZE, NORMAL_SIZE + BOLD_OFF + ALIGN_LEFT),
+    }
+
+    def compile(self, lines, width):
+        return self.encode(lines, width)
+
+    def encode(self, lines, width):
+        out = []
+        for text, style in lines:
+            before, after = self._STYLES[style]
+            out.append(before + text.encode('cp437', errors='replace') + b'\n' + after)
+        return b''.join(out)
+
+    def assemble(self, header, body, footer, line_count, width):
+        return INIT + header + body + footer + FEED_AND_CUT
+
+
+class PdfFormat:
+    """Single-page text PDF in Courier, sized to the receipt"""
+    mimetype = 'application/pdf'
+    extension = 'pdf'
+
+    FONT_SIZE = 8
+    LEADING = 10
+    MARGIN = 12
+
+    def compile(self, lines, width):
+        return self.encode(lines, width)
+
+    def encode(self, lines, width):
+        # Every line is drawn relative to the previous one (the ' operator), so
+        # compiled fragments do not depend on where the page ends
+        out = []
+        for text, style in lines:
+            if style in (CENTER, TITLE):
+                text = text.center(width)
+            font = b'/F2' if style in (BOLD, TITLE) else b'/F1'
+            escaped = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            out.append(font + b' %d Tf (' % self.FONT_SIZE + escaped.encode('latin-1', errors='replace') + b") '\n")
+        return b''.join(out)
+
+    def assemble(self, header, body, footer, line_count, width):
+        page_width = width * self.FONT_SIZE * 0.6 + 2 * self.MARGIN
+        page_height = (line_count + 1) * self.LEADING + 2 * self.MARGIN
+        content = (
+            b'BT %d TL %.1f %.1f Td\n' % (self.LEADING, self.MARGIN, page_height - self.MARGIN)
+            + header + body + footer + b'ET'
+        )
+        objects = [
+            b'<< /Type /Catalog /Pages 2 0 R >>',
+            b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.1f %.1f] /Contents 4 0 R '
+            b'/Resources << /Font << /F1 5 0 R /F2 6 0 R >> >> >>' % (page_width, page_height),
+            b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream',
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>',
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier-Bold >>',
+        ]
+        out = bytearray(b'%PDF-1.4\n')
+        offsets = []
+        for number, body_bytes in enumerate(objects, start=1):
+            offsets.append(len(out))
+            out += b'%d 0 obj\n' % number + body_bytes + b'\nendobj\n'
+        xref_offset = len(out)
+        out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        for offset in offsets:
+            out += b'%010d 00000 n \n' % offset
+        out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref_offset)
+        return bytes(out)
+
+
+OUTPUT_FORMATS = {'escpos': EscPosFormat(), 'pdf': PdfFormat()}
+
+
+class CompiledTemplate:
+    """A ticket layout with its static header and footer already encoded"""
+
+    def __init__(self, kind, fmt, settings, width):
+        header, self._body, footer = LAYOUTS[kind]
+        self._format = OUTPUT_FORMATS[fmt]
+        self._settings = settings
+        self._width = width
+        header_lines = header(settings, width)
+        footer_lines = footer(settings, width)
+        self._static_line_count = len(header_lines) + len(footer_lines)
+        self._header = self._format.compile(header_lines, width)
+        self._footer = self._format.compile(footer_lines, width)
+
+    def render(self, data):
+        body_lines = self._body(data, self._settings, self._width)
+        body = self._format.encode(body_lines, self._width)
+        return self._format.assemble(
+            self._header, body, self._footer, self._static_line_count + len(body_lines), self._width
+        )
+
+
+def settings_version(settings):
+    """Fingerprint of the settings a template was compiled from"""
+    return hashlib.sha1(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ReceiptRenderer:
+    """Render bills and KOTs as ESC/POS or PDF.
+
+    Templates are compiled once per (ticket kind, format, line width, settings
+    version), so only the variable line section is rendered per ticket. Rendered
+    invoices are kept in an LRU cache (``RECEIPT_CACHE_SIZE``) keyed by outlet,
+    invoice id and template, so reprints are served without rendering again.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RECEIPT_LINE_WIDTH', DEFAULT_LINE_WIDTH)
+        app.config.setdefault('RECEIPT_CACHE_SIZE', 256)
+        app.extensions['receipts'] = {
+            'templates': LRUCache(32),
+            'invoices': LRUCache(app.config['RECEIPT_CACHE_SIZE']),
+        }
+
+    def template(self, kind, fmt, settings):
+        width = current_app.config['RECEIPT_LINE_WIDTH']
+        key = (kind, fmt, width, settings_version(settings))
+        templates = current_app.extensions['receipts']['templates']
+        compiled = templates.get(key)
+        if compiled is None:
+            compiled = CompiledTemplate(kind, fmt, settings, width)
+            templates.put(key, compiled)
+        return compiled, key
+
+    def render_kot(self, ticket, settings, fmt='escpos'):
+        compiled, _ = self.template('kot', fmt, settings)
+        return compiled.render(ticket)
+
+    def render_bill(self, invoice, settings, fmt='escpos'):
+        """Render a serialized invoice, reusing the bytes of earlier renders of the same invoice"""
+        compiled, template_key = self.template('bill', fmt, settings)
+        invoices = current_app.extensions['receipts']['invoices']
+        key = (current_outlet_id(), invoice['id'], template_key)
+        data = invoices.get(key)
+        if data is None:
+            data = compiled.render(invoice)
+            invoices.put(key, data)
+        return data
+
+
+receipt_renderer = ReceiptRenderer()
@@ -0,0 +1,1552 @@
+import os
+import time
+from flask import Blueprint, current_app, request, jsonify, send_file
+from datetime import datetime
+import json
+import logging
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font, PatternFill, Alignment
+from io import BytesIO
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Table, TableOrder, Invoice, KOTConfig, BillConfig, MenuItem, Category, Department, RestaurantSettings, DayClose, Printer, PrintJob, Job, KitchenItem, PriceRule
+from routing import read_only
+from partitions import find_invoice, invoices_between, parse_timestamp
+from menu_index import menu_search
+from receipts import FORMATS, OUTPUT_FORMATS, receipt_renderer
+from print_spooler import print_spooler
+from floor_state import floor_state
+from sync import change_feed
+from kitchen import kitchen_display
+from admission import CHECKOUT, REPORT, admission, admission_class
+from single_flight import single_flight
+from group_commit import group_committer
+from analytics import INTERVALS as ANALYTICS_INTERVALS, analytics
+from table_ops import TableOperationError, merge_order_items, merge_orders, split_order, transfer_order
+from day_close import close_day, current_business_date, parse_business_date
+from jobs import background_jobs
+from menu_import import import_workbook, run_import_job
+from pricing import RULE_KINDS, PricingError, parse_minutes, pricing
+
+logger = logging.getLogger(__name__)
+
+# JSON API under /api, and the React build served for every other path
+api = Blueprint('api', __name__)
+frontend = Blueprint('frontend', __name__)
+
+@api.route('/api/tables', methods=['GET'])
+@single_flight
+def get_tables():
+    """Get all tables with their live order state (current order, seat time, running total)"""
+    try:
+        return jsonify(floor_state.tables())
+    except Exception as e:
+        logger.error(f"Error getting tables: {e}")
+        return jsonify({'error': 'Failed to retrieve tables'}), 500
+
+@api.route('/api/tables', methods=['POST'])
+def create_table():
+    """Create a new table"""
+    try:
+        data = request.get_json()
+        
+        new_table = Table(
+            id=data.get('id', str(int(time.time() * 1000))),  # Generate ID if not provided
+            name=data['name'],
+            seats=data['seats'],
+            category=data['category'],
+            status=data.get('status', 'available')
+        )
+        
+        db.session.add(new_table)
+        db.session.commit()
+        floor_state.put_table(new_table)
+        
+        return jsonify(new_table.to_dict()), 201
+    except Exception as e:
+        logger.error(f"Error creating table: {e}")
+        return jsonify({'error': 'Failed to create table'}), 500
+
+@api.route('/api/tables/bulk', methods=['PUT'])
+def bulk_upsert_tables():
+    """Create or update many tables in one transaction (floor-plan edits).
+    Tables with an existing id are updated, the others are created."""
+    try:
+        data = request.get_json()
+        if not isinstance(data, list):
+            return jsonify({'error': 'Expected a list of tables'}), 400
+        
+        ids = [str(entry['id']) for entry in data if entry.get('id')]
+        existing = {table.id: table for table in Table.scoped().filter(Table.id.in_(ids))} if ids else {}
+        
+        tables = []
+        for index, entry in enumerate(data):
+            table = existing.get(str(entry['id'])) if entry.get('id') else None
+            if table is None:
+                table = Table(
+                    id=str(entry.get('id') or f'{int(time.time() * 1000)}{index}'),
+                    name=entry['name'],
+                    seats=entry['seats'],
+                    category=entry['category'],
+                    status=entry.get('status', 'available')
+                )
+                db.session.add(table)
+                existing[table.id] = table
+            else:
+                table.name = entry.get('name', table.name)
+                table.seats = entry.get('seats', table.seats)
+                table.category = entry.get('category', table.category)
+                table.status = entry.get('status', table.status)
+            tables.append((table, 'status' in entry))
+        
+        db.session.commit()
+        
+        for table, status_changed in tables:
+            floor_state.put_table(table)
+            if status_changed:
+                floor_state.set_status(table.id, table.status)
+        
+        return jsonify([floor_state.get(table.id) for table, _ in tables])
+    except KeyError as e:
+        db.session.rollback()
+        return jsonify({'error': f'Missing field {e}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error updating tables: {e}")
+        return jsonify({'error': 'Failed to update tables'}), 500
+
+@api.route('/api/tables/<string:table_id>', methods=['PUT'])
+def update_table(table_id):
+    """Update a table"""
+    try:
+        table = Table.get_scoped(table_id)
+        if not table:
+            return jsonify({'error': 'Table not found'}), 404
+        
+        data = request.get_json()
+        table.name = data.get('name', table.name)
+        table.seats = data.get('seats', table.seats)
+        table.category = data.get('category', table.category)
+        table.status = data.get('status', table.status)
+        
+        db.session.commit()
+        floor_state.put_table(table)
+        if 'status' in data:
+            floor_state.set_status(table_id, table.status)
+        
+        return jsonify(floor_state.get(table_id))
+    except Exception as e:
+        logger.error(f"Error updating table: {e}")
+        return jsonify({'error': 'Failed to update table'}), 500
+
+@api.route('/api/tables/<string:table_id>', methods=['DELETE'])
+def delete_table(table_id):
+    """Delete a table"""
+    try:
+        table = Table.get_scoped(table_id)
+        if not table:
+            return jsonify({'error': 'Table not found'}), 404
+        
+        db.session.delete(table)
+        db.session.commit()
+        floor_state.remove_table(table_id)
+        
+        return jsonify({'message': 'Table deleted successfully'})
+    except Exception as e:
+        logger.error(f"Error deleting table: {e}")
+        return jsonify({'error': 'Failed to delete table'}), 500
+
+def queue_kot(table_name, items):
+    """Queue KOTs for items sent to the kitchen. Printing problems never fail the order."""
+    if not print_spooler.enabled:
+        return
+    try:
+        kot_config = KOTConfig.scoped().first() or KOTConfig.default()
+        print_spooler.enqueue_kot({
+            'tableName': table_name,
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'items': items
+        }, kot_config)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error queueing KOT: {e}")
+
+def queue_bill(invoice):
+    """Queue a bill if auto-print is on for the invoice's order type"""
+    if not print_spooler.enabled:
+        return
+    try:
+        config = BillConfig.scoped().first()
+        if not config or not config.selected_printer:
+            return
+        auto_print = config.auto_print_dine_in if invoice.order_type == 'dine-in' else config.auto_print_takeaway
+        if auto_print:
+            print_spooler.enqueue_bill(invoice.to_dict(), config.selected_printer)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error queueing bill: {e}")
+
+@api.route('/api/orders', methods=['GET'])
+def get_orders():
+    """Get all orders"""
+    try:
+        orders = TableOrder.scoped().all()
+        return jsonify([order.to_dict() for order in orders])
+    except Exception as e:
+        logger.error(f"Error getting orders: {e}")
+        return jsonify({'error': 'Failed to retrieve orders'}), 500
+
+@api.route('/api/orders/table/<string:table_id>', methods=['GET'])
+def get_table_order(table_id):
+    """Get order for a specific table"""
+    try:
+        order = TableOrder.scoped().filter_by(table_id=table_id).first()
+        if order:
+            return jsonify(order.to_dict())
+        return jsonify(None)
+    except Exception as e:
+        logger.error(f"Error getting table order: {e}")
+        return jsonify({'error': 'Failed to retrieve table order'}), 500
+
+@api.route('/api/orders/table/<string:table_id>', methods=['POST'])
+@admission_class(CHECKOUT)
+def add_items_to_table(table_id):
+    """Add items to a table order"""
+    try:
+        data = request.get_json()
+        
+        def add_items():
+            # Check if order exists for this table
+            order = TableOrder.scoped().filter_by(table_id=table_id).first()
+            
+            if not order:
+                # Create new order
+                order = TableOrder(
+                    table_id=table_id,
+                    table_name=data['table_name'],
+                    items=json.dumps(data['items']),
+                    start_time=datetime.now()
+                )
+                db.session.add(order)
+            else:
+                # Update existing order (items already sent to the kitchen are never changed)
+                existing_items = json.loads(order.items) if order.items else []
+                merge_order_items(existing_items, data['items'])
+                
+                order.items = json.dumps(existing_items)
+            return order
+        
+        # Committed on its own or batched with other writes (GROUP_COMMIT_ENABLED)
+        order = group_committer.run(add_items)
+        
+        # Table status and running total (the status is written behind)
+        floor_state.seat(table_id, order)
+        
+        return jsonify(order.to_dict())
+    except Exception as e:
+        logger.error(f"Error adding items to table: {e}")
+        return jsonify({'error': 'Failed to add items to table'}), 500
+
+@api.route('/api/orders/table/<string:table_id>/sent', methods=['POST'])
+@admission_class(CHECKOUT)
+def mark_items_as_sent(table_id):
+    """Mark all items in an order as sent to kitchen"""
+    try:
+        order = TableOrder.scoped().filter_by(table_id=table_id).first()
+        if not order:
+            return jsonify({'error': 'Order not found'}), 404
+        
+        items = json.loads(order.items) if order.items else []
+        newly_sent = [item for item in items if not item.get('sentToKitchen', False)]
+        for item in items:
+            item['sentToKitchen'] = True
+        
+        order.items = json.dumps(items)
+        kitchen_display.fire(order.table_id, order.table_name, newly_sent)
+        db.session.commit()
+        
+        if newly_sent:
+            kitchen_display.notify()
+            queue_kot(order.table_name, newly_sent)
+        
+        return jsonify(order.to_dict())
+    except Exception as e:
+        logger.error(f"Error marking items as sent: {e}")
+        return jsonify({'error': 'Failed to mark items as sent'}), 500
+
+@api.route('/api/orders/table/<string:table_id>/complete', methods=['POST'])
+@admission_class(CHECKOUT)
+def complete_table_order(table_id):
+    """Complete an order and remove it"""
+    try:
+        order = TableOrder.scoped().filter_by(table_id=table_id).first()
+        if order:
+            db.session.delete(order)
+        
+        db.session.commit()
+        
+        # Update table status (written behind)
+        floor_state.clear(table_id)
+        
+        return jsonify({'message': 'Order completed successfully'})
+    except Exception as e:
+        logger.error(f"Error completing table order: {e}")
+        return jsonify({'error': 'Failed to complete order'}), 500
+
+def move_order(operation, table_id, *args):
+    """Run a transfer, merge or split and return both tables' orders"""
+    data = request.get_json() or {}
+    target_id = data.get('targetTableId')
+    if not target_id:
+        return jsonify({'error': 'targetTableId is required'}), 400
+    try:
+        source, target = operation(table_id, str(target_id), *args)
+    except TableOperationError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), e.status_code
+    
+    floor_state.committed(table_id, source)
+    floor_state.committed(str(target_id), target)
+    kitchen_display.notify()
+    
+    return jsonify({
+        'source': source.to_dict() if source else None,
+        'target': target.to_dict() if target else None
+    })
+
+@api.route('/api/orders/table/<string:table_id>/transfer', methods=['POST'])
+@admission_class(CHECKOUT)
+def transfer_table_order(table_id):
+    """Move a table's order to an empty table ({"targetTableId": ...})"""
+    try:
+        return move_order(transfer_order, table_id)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error transferring table order: {e}")
+        return jsonify({'error': 'Failed to transfer order'}), 500
+
+@api.route('/api/orders/table/<string:table_id>/merge', methods=['POST'])
+@admission_class(CHECKOUT)
+def merge_table_orders(table_id):
+    """Merge a table's order into another table's order ({"targetTableId": ...})"""
+    try:
+        return move_order(merge_orders, table_id)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error merging table orders: {e}")
+        return jsonify({'error': 'Failed to merge orders'}), 500
+
+@api.route('/api/orders/table/<string:table_id>/split', methods=['POST'])
+@admission_class(CHECKOUT)
+def split_table_order(table_id):
+    """Move some order lines to another table
+    ({"targetTableId": ..., "lines": [{"index": 0, "quantity": 1}]})"""
+    try:
+        lines = (request.get_json() or {}).get('lines')
+        if not isinstance(lines, list):
+            return jsonify({'error': 'lines must be a list'}), 400
+        return move_order(split_order, table_id, lines)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error splitting table order: {e}")
+        return jsonify({'error': 'Failed to split order'}), 500
+
+@api.route('/api/invoices', methods=['GET'])
+@read_only
+@admission_class(REPORT)
+def get_invoices():
+    """Get invoices, optionally limited to a time range (?from=&to=, ISO timestamps)"""
+    try:
+        start = parse_timestamp(request.args['from']) if request.args.get('from') else None
+        end = parse_timestamp(request.args['to']) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid from/to timestamp'}), 400
+    
+    try:
+        if start is None and end is None:
+            invoices = Invoice.scoped().all()
+        else:
+            invoices = invoices_between(start, end)
+        return jsonify([invoice.to_dict() for invoice in invoices])
+    except Exception as e:
+        logger.error(f"Error getting invoices: {e}")
+        return jsonify({'error': 'Failed to retrieve invoices'}), 500
+
+@api.route('/api/invoices', methods=['POST'])
+@admission_class(CHECKOUT)
+def add_invoice():
+    """Add a new invoice, priced by the server unless SERVER_PRICING_ENABLED is off"""
+    try:
+        data = request.get_json()
+        timestamp = datetime.fromisoformat(data['timestamp'].replace('Z', '+00:00'))
+        
+        if pricing.enabled:
+            # Client prices and totals are ignored; happy hours apply at billing time
+            try:
+                priced = pricing.quote(data['items'], at=timestamp)
+            except PricingError as e:
+                return jsonify({'error': str(e)}), e.status_code
+        else:
+            priced = {key: data[key] for key in ('items', 'subtotal', 'tax', 'total')}
+        
+        new_invoice = Invoice(
+            id=data.get('id', str(int(time.time() * 1000))),  # Generate ID if not provided
+            bill_number=data['billNumber'],
+            order_type=data['orderType'],
+            table_name=data.get('tableName'),
+            items=json.dumps(priced['items']),
+            subtotal=priced['subtotal'],
+            tax=priced['tax'],
+            total=priced['total'],
+            timestamp=timestamp
+        )
+        
+        def add():
+            db.session.add(new_invoice)
+            return new_invoice
+        
+        # Committed on its own or batched with other writes (GROUP_COMMIT_ENABLED)
+        group_committer.run(add)
+        
+        queue_bill(new_invoice)
+        
+        response = new_invoice.to_dict()
+        if 'taxes' in priced:
+            response['taxes'] = priced['taxes']
+        return jsonify(response), 201
+    except Exception as e:
+        logger.error(f"Error adding invoice: {e}")
+        return jsonify({'error': 'Failed to add invoice'}), 500
+
+# Pricing API
+@api.route('/api/pricing/quote', methods=['POST'])
+@admission_class(CHECKOUT)
+def quote_order():
+    """Price order lines ({"items": [{"id", "quantity"}], "at": optional ISO time}) with current prices and taxes"""
+    try:
+        data = request.get_json() or {}
+        at = parse_timestamp(data['at']) if data.get('at') else None
+        return jsonify(pricing.quote(data.get('items', []), at=at))
+    except PricingError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except ValueError:
+        return jsonify({'error': 'Invalid time, expected ISO 8601'}), 400
+    except Exception as e:
+        logger.error(f"Error pricing order: {e}")
+        return jsonify({'error': 'Failed to price order'}), 500
+
+def apply_price_rule(rule, data):
+    """Copy and validate price rule fields from a request body (raises ValueError)"""
+    rule.name = data.get('name', rule.name)
+    rule.item_id = data.get('itemId', rule.item_id)
+    rule.category = data.get('category', rule.category)
+    rule.kind = data.get('kind', rule.kind or 'percent')
+    rule.value = data.get('value', rule.value)
+    if 'days' in data:
+        days = sorted({int(day) for day in data['days']}) if data['days'] is not None else None
+        if days is not None and not all(0 <= day <= 6 for day in days):
+            raise ValueError('days are weekday numbers, 0 (Monday) to 6')
+        rule.days = ''.join(str(day) for day in days) if days is not None else None
+    rule.start_time = data.get('startTime', rule.start_time)
+    rule.end_time = data.get('endTime', rule.end_time)
+    rule.active = data.get('active', True if rule.active is None else rule.active)
+    
+    if not rule.name or rule.value is None or not rule.start_time or not rule.end_time:
+        raise ValueError('name, value, startTime and endTime are required')
+    if rule.kind not in RULE_KINDS:
+        raise ValueError(f"kind must be one of {', '.join(RULE_KINDS)}")
+    if rule.kind == 'percent' and not 0 <= rule.value <= 100:
+        raise ValueError('A percent value must be between 0 and 100')
+    if rule.kind == 'price' and rule.value < 0:
+        raise ValueError('A price cannot be negative')
+    parse_minutes(rule.start_time)
+    parse_minutes(rule.end_time)
+
+@api.route('/api/price-rules', methods=['GET'])
+@read_only
+def get_price_rules():
+    """Get all price rules"""
+    try:
+        rules = PriceRule.scoped().order_by(PriceRule.start_time).all()
+        return jsonify([rule.to_dict() for rule in rules])
+    except Exception as e:
+        logger.error(f"Error getting price rules: {e}")
+        return jsonify({'error': 'Failed to retrieve price rules'}), 500
+
+@api.route('/api/price-rules', methods=['POST'])
+def create_price_rule():
+    """Create a happy-hour price rule"""
+    try:
+        data = request.get_json()
+        
+        new_rule = PriceRule(id=data.get('id', str(int(time.time() * 1000))))
+        try:
+            apply_price_rule(new_rule, data)
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        db.session.add(new_rule)
+        db.session.commit()
+        pricing.invalidate()
+        
+        return jsonify(new_rule.to_dict()), 201
+    except Exception as e:
+        logger.error(f"Error creating price rule: {e}")
+        return jsonify({'error': 'Failed to create price rule'}), 500
+
+@api.route('/api/price-rules/<string:rule_id>', methods=['PUT'])
+def update_price_rule(rule_id):
+    """Update a price rule"""
+    try:
+        rule = PriceRule.get_scoped(rule_id)
+        if not rule:
+            return jsonify({'error': 'Price rule not found'}), 404
+        
+        try:
+            apply_price_rule(rule, request.get_json())
+        except (ValueError, TypeError) as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+        
+        db.session.commit()
+        pricing.invalidate()
+        
+        return jsonify(rule.to_dict())
+    except Exception as e:
+        logger.error(f"Error updating price rule: {e}")
+        return jsonify({'error': 'Failed to update price rule'}), 500
+
+@api.route('/api/price-rules/<string:rule_id>', methods=['DELETE'])
+def delete_price_rule(rule_id):
+    """Delete a price rule"""
+    try:
+        rule = PriceRule.get_scoped(rule_id)
+        if not rule:
+            return jsonify({'error': 'Price rule not found'}), 404
+        
+        db.session.delete(rule)
+        db.session.commit()
+        pricing.invalidate()
+        
+        return jsonify({'message': 'Price rule deleted successfully'})
+    except Exception as e:
+        logger.error(f"Error deleting price rule: {e}")
+        return jsonify({'error': 'Failed to delete price rule'}), 500
+
+# End-of-day close (Z-report) API
+@api.route('/api/day-close', methods=['POST'])
+@admission_class(REPORT)
+def close_business_day():
+    """Close a business day (defaults to the current one) and store its snapshot"""
+    data = request.get_json(silent=True) or {}
+    try:
+        business_date = parse_business_date(data['date']) if data.get('date') else current_business_date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date, expected YYYY-MM-DD'}), 400
+    
+    try:
+        snapshot = close_day(business_date)
+        if snapshot is None:
+            return jsonify({'error': 'Day is already closed, rebuild it instead'}), 409
+        return jsonify(snapshot.to_dict()), 201
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Day is already closed, rebuild it instead'}), 409
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error closing business day: {e}")
+        return jsonify({'error': 'Failed to close business day'}), 500
+
+@api.route('/api/day-close/<string:business_date>/rebuild', methods=['POST'])
+@admission_class(REPORT)
+def rebuild_business_day(business_date):
+    """Recompute a closed day's snapshot, e.g. after late invoices arrived"""
+    try:
+        business_date = parse_business_date(business_date)
+    except ValueError:
+        return jsonify({'error': 'Invalid date, expected YYYY-MM-DD'}), 400
+    
+    try:
+        if not DayClose.scoped().filter_by(business_date=business_date).first():
+            return jsonify({'error': 'Day is not closed'}), 404
+        snapshot = close_day(business_date, rebuild=True)
+        return jsonify(snapshot.to_dict())
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error rebuilding business day: {e}")
+        return jsonify({'error': 'Failed to rebuild business day'}), 500
+
+@api.route('/api/day-close/<string:business_date>', methods=['GET'])
+@read_only
+@admission_class(REPORT)
+def get_business_day(business_date):
+    """Get the snapshot of a closed day"""
+    try:
+        business_date = parse_business_date(business_date)
+    except ValueError:
+        return jsonify({'error': 'Invalid date, expected YYYY-MM-DD'}), 400
+    
+    try:
+        snapshot = DayClose.scoped().filter_by(business_date=business_date).first()
+        if not snapshot:
+            return jsonify({'error': 'Day is not closed'}), 404
+        return jsonify(snapshot.to_dict())
+    except Exception as e:
+        logger.error(f"Error getting business day: {e}")
+        return jsonify({'error': 'Failed to retrieve business day'}), 500
+
+@api.route('/api/day-close', methods=['GET'])
+@read_only
+@admission_class(REPORT)
+def get_business_days():
+    """Get closed-day snapshots, optionally within ?from=&to= dates (inclusive)"""
+    try:
+        start = parse_business_date(request.args['from']) if request.args.get('from') else None
+        end = parse_business_date(request.args['to']) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date, expected YYYY-MM-DD'}), 400
+    
+    try:
+        query = DayClose.scoped()
+        if start:
+            query = query.filter(DayClose.business_date >= start)
+        if end:
+            query = query.filter(DayClose.business_date <= end)
+        return jsonify([snapshot.to_dict() for snapshot in query.order_by(DayClose.business_date).all()])
+    except Exception as e:
+        logger.error(f"Error getting business days: {e}")
+        return jsonify({'error': 'Failed to retrieve business days'}), 500
+
+@api.route('/api/config/kot', methods=['GET'])
+def get_kot_config():
+    """Get KOT configuration (the defaults until the outlet saves its own)"""
+    try:
+        config = KOTConfig.scoped().first() or KOTConfig.default()
+        return jsonify(config.to_dict())
+    except Exception as e:
+        logger.error(f"Error getting KOT config: {e}")
+        return jsonify({'error': 'Failed to retrieve KOT configuration'}), 500
+
+@api.route('/api/config/kot', methods=['PUT'])
+def update_kot_config():
+    """Update KOT configuration"""
+    try:
+        config = KOTConfig.scoped().first()
+        if not config:
+            config = KOTConfig.default()
+            db.session.add(config)
+        
+        data = request.get_json()
+        config.print_by_department = data.get('printByDepartment', config.print_by_department)
+        config.number_of_copies = data.get('numberOfCopies', config.number_of_copies)
+        config.selected_printer = data.get('selectedPrinter', config.selected_printer)
+        
+        db.session.commit()
+        
+        return jsonify(config.to_dict())
+    except Exception as e:
+        logger.error(f"Error updating KOT config: {e}")
+        return jsonify({'error': 'Failed to update KOT configuration'}), 500
+
+@api.route('/api/config/bill', methods=['GET'])
+def get_bill_config():
+    """Get bill configuration (the defaults until the outlet saves its own)"""
+    try:
+        config = BillConfig.scoped().first() or BillConfig.default()
+        return jsonify(config.to_dict())
+    except Exception as e:
+        logger.error(f"Error getting bill config: {e}")
+        return jsonify({'error': 'Failed to retrieve bill configuration'}), 500
+
+@api.route('/api/config/bill', methods=['PUT'])
+def update_bill_config():
+    """Update bill configuration"""
+    try:
+        config = BillConfig.scoped().first()
+        if not config:
+            config = BillConfig.default()
+            db.session.add(config)
+        
+        data = request.get_json()
+        config.auto_print_dine_in = data.get('autoPrintDineIn', config.auto_print_dine_in)
+        config.auto_print_takeaway = data.get('autoPrintTakeaway', config.auto_print_takeaway)
+        config.selected_printer = data.get('selectedPrinter', config.selected_printer)
+        
+        db.session.commit()
+        
+        return jsonify(config.to_dict())
+    except Exception as e:
+        logger.error(f"Error updating bill config: {e}")
+        return jsonify({'error': 'Failed to update bill configuration'}), 500
+
+# Printer and print job API
+@api.route('/api/printers', methods=['GET'])
+def get_printers():
+    """Get all printers"""
+    try:
+        printers = Printer.scoped().all()
+        return jsonify([printer.to_dict() for printer in printers])
+    except Exception as e:
+        logger.error(f"Error getting printers: {e}")
+        return jsonify({'error': 'Failed to retrieve printers'}), 500
+
+@api.route('/api/printers', methods=['POST'])
+def create_printer():
+    """Register a printer"""
+    try:
+        data = request.get_json()
+        
+        new_printer = Printer(
+            id=data.get('id', str(int(time.time() * 1000))),
+            name=data['name'],
+            address=data['address'],
+            department=data.get('department')
+        )
+        
+        db.session.add(new_printer)
+        db.session.commit()
+        
+        return jsonify(new_printer.to_dict()), 201
+    except Exception as e:
+        logger.error(f"Error creating printer: {e}")
+        return jsonify({'error': 'Failed to create printer'}), 500
+
+@api.route('/api/printers/<string:printer_id>', methods=['PUT'])
+def update_printer(printer_id):
+    """Update a printer"""
+    try:
+        printer = Printer.get_scoped(printer_id)
+        if not printer:
+            return jsonify({'error': 'Printer not found'}), 404
+        
+        data = request.get_json()
+        printer.name = data.get('name', printer.name)
+        printer.address = data.get('address', printer.address)
+        printer.department = data.get('department', printer.department)
+        
+        db.session.commit()
+        
+        return jsonify(printer.to_dict())
+    except Exception as e:
+        logger.error(f"Error updating printer: {e}")
+        return jsonify({'error': 'Failed to update printer'}), 500
+
+@api.route('/api/printers/<string:printer_id>', methods=['DELETE'])
+def delete_printer(printer_id):
+    """Delete a printer"""
+    try:
+        printer = Printer.get_scoped(printer_id)
+        if not printer:
+            return jsonify({'error': 'Printer not found'}), 404
+        
+        db.session.delete(printer)
+        db.session.commit()
+        
+        return jsonify({'message': 'Printer deleted successfully'})
+    except Exception as e:
+        logger.error(f"Error deleting printer: {e}")
+        return jsonify({'error': 'Failed to delete printer'}), 500
+
+@api.route('/api/print-jobs', methods=['GET'])
+def get_print_jobs():
+    """Get the most recent print jobs (?status= to filter)"""
+    try:
+        query = PrintJob.scoped()
+        if request.args.get('status'):
+            query = query.filter_by(status=request.args['status'])
+        jobs = query.order_by(PrintJob.id.desc()).limit(100).all()
+        return jsonify([job.to_dict() for job in jobs])
+    except Exception as e:
+        logger.error(f"Error getting print jobs: {e}")
+        return jsonify({'error': 'Failed to retrieve print jobs'}), 500
+
+@api.route('/api/print-jobs/<int:job_id>', methods=['GET'])
+def get_print_job(job_id):
+    """Get the status of a print job"""
+    try:
+        job = PrintJob.get_scoped(job_id)
+        if not job:
+            return jsonify({'error': 'Print job not found'}), 404
+        return jsonify(job.to_dict())
+    except Exception as e:
+        logger.error(f"Error getting print job: {e}")
+        return jsonify({'error': 'Failed to retrieve print job'}), 500
+
+@api.route('/api/print-jobs/<int:job_id>/retry', methods=['POST'])
+def retry_print_job(job_id):
+    """Queue a failed print job again"""
+    try:
+        job = PrintJob.get_scoped(job_id)
+        if not job:
+            return jsonify({'error': 'Print job not found'}), 404
+        if job.status != 'failed' or not print_spooler.retry(job):
+            return jsonify({'error': f'Print job is {job.status}'}), 400
+        
+        return jsonify(job.to_dict())
+    except Exception as e:
+        logger.error(f"Error retrying print job: {e}")
+        return jsonify({'error': 'Failed to retry print job'}), 500
+
+@api.route('/api/print-jobs/kot', methods=['POST'])
+@admission_class(CHECKOUT)
+def print_kot():
+    """Queue KOTs for items that are not tied to a table order (e.g. takeaway)"""
+    try:
+        data = request.get_json()
+        kot_config = KOTConfig.scoped().first() or KOTConfig.default()
+        jobs = print_spooler.enqueue_kot({
+            'tableName': data.get('tableName'),
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'items': data['items']
+        }, kot_config)
+        return jsonify([job.to_dict() for job in jobs]), 202
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error queueing KOT: {e}")
+        return jsonify({'error': 'Failed to queue KOT'}), 500
+
+@api.route('/api/invoices/<string:invoice_id>/receipt', methods=['GET'])
+def get_invoice_receipt(invoice_id):
+    """Render an invoice's bill (?format=escpos|pdf)"""
+    fmt = request.args.get('format', 'pdf')
+    if fmt not in FORMATS:
+        return jsonify({'error': f"Invalid format, expected one of {', '.join(FORMATS)}"}), 400
+    
+    try:
+        invoice = find_invoice(invoice_id)
+        if not invoice:
+            return jsonify({'error': 'Invoice not found'}), 404
+        
+        settings = RestaurantSettings.scoped().first()
+        data = receipt_renderer.render_bill(invoice.to_dict(), settings.to_dict() if settings else {}, fmt)
+        
+        return send_file(
+            BytesIO(data),
+            mimetype=OUTPUT_FORMATS[fmt].mimetype,
+            download_name=f'bill_{invoice.bill_number}.{OUTPUT_FORMATS[fmt].extension}'
+        )
+    except Exception as e:
+        logger.error(f"Error rendering receipt: {e}")
+        return jsonify({'error': 'Failed to render receipt'}), 500
+
+@api.route('/api/invoices/<string:invoice_id>/print', methods=['POST'])
+@admission_class(CHECKOUT)
+def print_invoice(invoice_id):
+    """Queue a (re)print of a bill on the configured or given printer"""
+    try:
+        invoice = find_invoice(invoice_id)
+        if not invoice:
+            return jsonify({'error': 'Invoice not found'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        config = BillConfig.scoped().first()
+        printer_name = data.get('printer') or (config.selected_printer if config else None)
+        if not printer_name:
+            return jsonify({'error': 'No bill printer selected'}), 400
+        
+        jobs = print_spooler.enqueue_bill(invoice.to_dict(), printer_name)
+        if not jobs:
+            return jsonify({'error': 'Printer not found'}), 404
+        return jsonify(jobs[0].to_dict()), 202
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error queueing bill: {e}")
+        return jsonify({'error': 'Failed to queue bill'}), 500
+
+# Analytics API (columnar, in-memory)
+def analytics_range():
+    start = parse_timestamp(request.args['from']) if request.args.get('from') else None
+    end = parse_timestamp(request.args['to']) if request.args.get('to') else None
+    return start, end
+
+@api.route('/api/analytics/heatmap', methods=['GET'])
+@read_only
+@admission_class(REPORT)
+def get_analytics_heatmap():
+    """Revenue by weekday and hour of day (?from=&to=)"""
+    try:
+        return jsonify(analytics.store().heatmap(*analytics_range()))
+    except ValueError:
+        return jsonify({'error': 'Invalid from/to timestamp'}), 400
+    except Exception as e:
+        logger.error(f"Error getting analytics heatmap: {e}")
+        return jsonify({'error': 'Failed to retrieve analytics'}), 500
+
+@api.route('/api/analytics/weekdays', methods=['GET'])
+@read_only
+@admission_class(REPORT)
+def get_analytics_weekdays():
+    """Invoices, revenue and average ticket per weekday (?from=&to=)"""
+    try:
+        return jsonify(analytics.store().weekdays(*analytics_range()))
+    except ValueError:
+        return jsonify({'error': 'Invalid from/to timestamp'}), 400
+    except Exception as e:
+        logger.error(f"Error getting weekday analytics: {e}")
+        return jsonify({'error': 'Failed to retrieve analytics'}), 500
+
+@api.route('/api/analytics/order-types', methods=['GET'])
+@read_only
+@admission_class(REPORT)
+def get_analytics_order_types():
+    """Dine-in vs takeaway per day, week or month (?interval=&from=&to=)"""
+    try:
+        interval = request.args.get('interval', 'day')
+        if interval not in ANALYTICS_INTERVALS:
+            return jsonify({'error': f'interval must be one of {", ".join(ANALYTICS_INTERVALS)}'}), 400
+        return jsonify(analytics.store().order_type_trend(interval, *analytics_range()))
+    except ValueError:
+        return jsonify({'error': 'Invalid from/to timestamp'}), 400
+    except Exception as e:
+        logger.error(f"Error getting order type analytics: {e}")
+        return jsonify({'error': 'Failed to retrieve analytics'}), 500
+
+@api.route('/api/analytics/items', methods=['GET'])
+@read_only
+@admission_class(REPORT)
+def get_analytics_items():
+    """Best-selling items (?sort=amount|quantity&limit=&from=&to=)"""
+    try:
+        start, end = analytics_range()
+        limit = min(int(request.args.get('limit', 20)), 500)
+        sort = 'quantity' if request.args.get('sort') == 'quantity' else 'amount'
+        return jsonify(analytics.store().top_items(start, end, limit, sort))
+    except ValueError:
+        return jsonify({'error': 'Invalid query parameters'}), 400
+    except Exception as e:
+        logger.error(f"Error getting item analytics: {e}")
+        return jsonify({'error': 'Failed to retrieve analytics'}), 500
+
+@api.route('/api/analytics/categories', methods=['GET'])
+@read_only
+@admission_class(REPORT)
+def get_analytics_categories():
+    """Quantity and amount sold per category (?from=&to=)"""
+    try:
+        return jsonify(analytics.store().categories_summary(*analytics_range()))
+    except ValueError:
+        return jsonify({'error': 'Invalid from/to timestamp'}), 400
+    except Exception as e:
+        logger.error(f"Error getting category analytics: {e}")
+        return jsonify({'error': 'Failed to retrieve analytics'}), 500
+
+# Kitchen display API
+@api.route('/api/kitchen/queue', methods=['GET'])
+@admission_class(None)
+def get_kitchen_queue():
+    """Pending and ready items for one department (?department=), oldest first.
+    With ?since=<cursor>&wait=<seconds> the request waits until the queue changes."""
+    try:
+        department = request.args.get('department', '')
+        since = request.args.get('since')
+        if since is not None:
+            wait = min(float(request.args.get('wait', current_app.config['KITCHEN_LONG_POLL_SECONDS'])),
+                       current_app.config['KITCHEN_LONG_POLL_SECONDS'])
+            cursor = kitchen_display.wait_for_change(department, since, wait)
+        else:
+            cursor = kitchen_display.cursor(department)
+        items = kitchen_display.queue(department)
+        return jsonify({
+            'department': department,
+            'cursor': cursor,
+            'items': [item.to_dict() for item in items]
+        })
+    except ValueError:
+        return jsonify({'error': 'wait must be a number'}), 400
+    except Exception as e:
+        logger.error(f"Error getting kitchen queue: {e}")
+        return jsonify({'error': 'Failed to retrieve kitchen queue'}), 500
+
+def update_kitchen_item(item_id, status, allowed_from):
+    item = KitchenItem.get_scoped(item_id)
+    if not item:
+        return jsonify({'error': 'Kitchen item not found'}), 404
+    if item.status not in allowed_from:
+        return jsonify({'error': f'Item is already {item.status}'}), 409
+    kitchen_display.set_status(item, status)
+    return jsonify(item.to_dict())
+
+@api.route('/api/kitchen/items/<int:item_id>/bump', methods=['POST'])
+def bump_kitchen_item(item_id):
+    """Mark a kitchen item as ready to serve"""
+    try:
+        return update_kitchen_item(item_id, 'ready', ('pending',))
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error bumping kitchen item: {e}")
+        return jsonify({'error': 'Failed to bump kitchen item'}), 500
+
+@api.route('/api/kitchen/items/<int:item_id>/serve', methods=['POST'])
+def serve_kitchen_item(item_id):
+    """Mark a kitchen item as served, removing it from the display"""
+    try:
+        return update_kitchen_item(item_id, 'served', ('pending', 'ready'))
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error serving kitchen item: {e}")
+        return jsonify({'error': 'Failed to serve kitchen item'}), 500
+
+# Delta sync API
+@api.route('/api/sync', methods=['GET'])
+def sync_changes():
+    """Entities changed or deleted since a watermark (?since=, from the previous sync)"""
+    try:
+        since = parse_timestamp(request.args['since']) if request.args.get('since') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid since watermark'}), 400
+    try:
+        return jsonify(change_feed.changes_since(since))
+    except Exception as e:
+        logger.error(f"Error getting sync changes: {e}")
+        return jsonify({'error': 'Failed to retrieve changes'}), 500
+
+@api.route('/api/admission/stats', methods=['GET'])
+@admission_class(None)
+def get_admission_stats():
+    """In-flight, waiting, admitted and shed request counts per route class (this worker)"""
+    return jsonify({
+        'enabled': current_app.config['ADMISSION_CONTROL_ENABLED'],
+        'classes': admission.stats()
+    })
+
+@api.route('/api/single-flight/stats', methods=['GET'])
+@admission_class(None)
+def get_single_flight_stats():
+    """How many hot GET requests ran the query (leaders) and how many shared a result (this worker)"""
+    return jsonify(single_flight.stats())
+
+@api.route('/api/login', methods=['POST'])
+def login():
+    """User login"""
+    try:
+        data = request.get_json()
+        # In a real application, you would validate credentials against a user database
+        # For now, we'll just return a success response
+        return jsonify({'message': 'Login successful'})
+    except Exception as e:
+        logger.error(f"Error during login: {e}")
+        return jsonify({'error': 'Login failed'}), 500
+
+# Menu Item API
+@api.route('/api/menu-items', methods=['GET'])
+@single_flight
+@read_only
+def get_menu_items():
+    """Get all menu items"""
+    try:
+        items = MenuItem.scoped().all()
+        return jsonify([item.to_dict() for item in items])
+    except Exception as e:
+        logger.error(f"Error getting menu items: {e}")
+        return jsonify({'error': 'Failed to retrieve menu items'}), 500
+
+@api.route('/api/menu-items/search', methods=['GET'])
+@read_only
+def search_menu_items():
+    """Search menu items by partial name or product code (?q=&category=&limit=)"""
+    try:
+        limit = min(int(request.args.get('limit', 20)), 200)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    
+    try:
+        items = menu_search.index().search(
+            request.args.get('q', ''),
+            category=request.args.get('category') or None,
+            limit=limit
+        )
+        return jsonify(items)
+    except Exception as e:
+        logger.error(f"Error searching menu items: {e}")
+        return jsonify({'error': 'Failed to search menu items'}), 500
+
+@api.route('/api/menu-items/by-code/<string:product_code>', methods=['GET'])
+@read_only
+def get_menu_item_by_code(product_code):
+    """Get a menu item by its exact product code (barcode or short-code entry)"""
+    try:
+        item = menu_search.index().by_code(product_code)
+        if not item:
+            return jsonify({'error': 'Menu item not found'}), 404
+        return jsonify(item)
+    except Exception as e:
+        logger.error(f"Error getting menu item by code: {e}")
+        return jsonify({'error': 'Failed to retrieve menu item'}), 500
+
+@api.route('/api/menu-items', methods=['POST'])
+def create_menu_item():
+    """Create a new menu item"""
+    try:
+        data = request.get_json()
+        
+        # Check if product_code already exists
+        existing = MenuItem.scoped().filter_by(product_code=data['productCode']).first()
+        if existing:
+            return jsonify({'error': 'Product code already exists'}), 400
+        
+        new_item = MenuItem(
+            id=data.get('id', str(int(time.time() * 1000))),
+            name=data['name'],
+            product_code=data['productCode'],
+            price=data['price'],
+            category=data['category'],
+            department=data['department'],
+            description=data.get('description', '')
+        )
+        
+        db.session.add(new_item)
+        db.session.commit()
+        menu_search.upsert(new_item)
+        pricing.invalidate()
+        
+        return jsonify(new_item.to_dict()), 201
+    except Exception as e:
+        logger.error(f"Error creating menu item: {e}")
+        return jsonify({'error': 'Failed to create menu item'}), 500
+
+@api.route('/api/menu-items/<string:item_id>', methods=['PUT'])
+def update_menu_item(item_id):
+    """Update a menu item"""
+    try:
+        item = MenuItem.get_scoped(item_id)
+        if not item:
+            return jsonify({'error': 'Menu item not found'}), 404
+        
+        data = request.get_json()
+        
+        # Check if product_code is being changed and if new code already exists
+        if 'productCode' in data and data['productCode'] != item.product_code:
+            existing = MenuItem.scoped().filter_by(product_code=data['productCode']).first()
+            if existing:
+                return jsonify({'error': 'Product code already exists'}), 400
+            item.product_code = data['productCode']
+        
+        item.name = data.get('name', item.name)
+        item.price = data.get('price', item.price)
+        item.category = data.get('category', item.category)
+        item.department = data.get('department', item.department)
+        item.description = data.get('description', item.description)
+        
+        db.session.commit()
+        menu_search.upsert(item)
+        pricing.invalidate()
+        
+        return jsonify(item.to_dict())
+    except Exception as e:
+        logger.error(f"Error updating menu item: {e}")
+        return jsonify({'error': 'Failed to update menu item'}), 500
+
+@api.route('/api/menu-items/<string:item_id>', methods=['DELETE'])
+def delete_menu_item(item_id):
+    """Delete a menu item"""
+    try:
+        item = MenuItem.get_scoped(item_id)
+        if not item:
+            return jsonify({'error': 'Menu item not found'}), 404
+        
+        db.session.delete(item)
+        db.session.commit()
+        menu_search.remove(item_id)
+        pricing.invalidate()
+        
+        return jsonify({'message': 'Menu item deleted successfully'})
+    except Exception as e:
+        logger.error(f"Error deleting menu item: {e}")
+        return jsonify({'error': 'Failed to delete menu item'}), 500
+
+# Category API
+@api.route('/api/categories', methods=['GET'])
+@read_only
+def get_categories():
+    """Get all categories"""
+    try:
+        categories = Category.scoped().all()
+        return jsonify([cat.to_dict() for cat in categories])
+    except Exception as e:
+        logger.error(f"Error getting categories: {e}")
+        return jsonify({'error': 'Failed to retrieve categories'}), 500
+
+@api.route('/api/categories', methods=['POST'])
+def create_category():
+    """Create a new category"""
+    try:
+        data = request.get_json()
+        
+        new_category = Category(
+            id=data.get('id', str(int(time.time() * 1000))),
+            name=data['name'],
+            tax_rate=data.get('taxRate')
+        )
+        
+        db.session.add(new_category)
+        db.session.commit()
+        pricing.invalidate()
+        
+        return jsonify(new_category.to_dict()), 201
+    except Exception as e:
+        logger.error(f"Error creating category: {e}")
+        return jsonify({'error': 'Failed to create category'}), 500
+
+@api.route('/api/categories/<string:category_id>', methods=['PUT'])
+def update_category(category_id):
+    """Update a category (taxRate null reverts to the restaurant's tax rate)"""
+    try:
+        category = Category.get_scoped(category_id)
+        if not category:
+            return jsonify({'error': 'Category not found'}), 404
+        
+        data = request.get_json()
+        category.name = data.get('name', category.name)
+        category.tax_rate = data.get('taxRate', category.tax_rate)
+        
+        db.session.commit()
+        pricing.invalidate()
+        
+        return jsonify(category.to_dict())
+    except Exception as e:
+        logger.error(f"Error updating category: {e}")
+        return jsonify({'error': 'Failed to update category'}), 500
+
+@api.route('/api/categories/<string:category_id>', methods=['DELETE'])
+def delete_category(category_id):
+    """Delete a category"""
+    try:
+        category = Category.get_scoped(category_id)
+        if not category:
+            return jsonify({'error': 'Category not found'}), 404
+        
+        db.session.delete(category)
+        db.session.commit()
+        pricing.invalidate()
+        
+        return jsonify({'message': 'Category deleted successfully'})
+    except Exception as e:
+        logger.error(f"Error deleting category: {e}")
+        return jsonify({'error': 'Failed to delete category'}), 500
+
+# Department API
+@api.route('/api/departments', methods=['GET'])
+@read_only
+def get_departments():
+    """Get all departments"""
+    try:
+        departments = Department.scoped().all()
+        return jsonify([dept.to_dict() for dept in departments])
+    except Exception as e:
+        logger.error(f"Error getting departments: {e}")
+        return jsonify({'error': 'Failed to retrieve departments'}), 500
+
+@api.route('/api/departments', methods=['POST'])
+def create_department():
+    """Create a new department"""
+    try:
+        data = request.get_json()
+        
+        new_department = Department(
+            id=data.get('id', str(int(time.time() * 1000))),
+            name=data['name']
+        )
+        
+        db.session.add(new_department)
+        db.session.commit()
+        
+        return jsonify(new_department.to_dict()), 201
+    except Exception as e:
+        logger.error(f"Error creating department: {e}")
+        return jsonify({'error': 'Failed to create department'}), 500
+
+@api.route('/api/departments/<string:department_id>', methods=['DELETE'])
+def delete_department(department_id):
+    """Delete a department"""
+    try:
+        department = Department.get_scoped(department_id)
+        if not department:
+            return jsonify({'error': 'Department not found'}), 404
+        
+        db.session.delete(department)
+        db.session.commit()
+        
+        return jsonify({'message': 'Department deleted successfully'})
+    except Exception as e:
+        logger.error(f"Error deleting department: {e}")
+        return jsonify({'error': 'Failed to delete department'}), 500
+
+# Restaurant Settings API
+@api.route('/api/restaurant-settings', methods=['GET'])
+@single_flight
+def get_restaurant_settings():
+    """Get restaurant settings (the defaults until the outlet saves its own)"""
+    try:
+        settings = RestaurantSettings.scoped().first() or RestaurantSettings.default()
+        return jsonify(settings.to_dict())
+    except Exception as e:
+        logger.error(f"Error getting restaurant settings: {e}")
+        return jsonify({'error': 'Failed to retrieve restaurant settings'}), 500
+
+@api.route('/api/restaurant-settings', methods=['PUT'])
+def update_restaurant_settings():
+    """Update restaurant settings"""
+    try:
+        settings = RestaurantSettings.scoped().first()
+        if not settings:
+            settings = RestaurantSettings.default()
+            db.session.add(settings)
+        
+        data = request.get_json()
+        settings.restaurant_name = data.get('restaurantName', settings.restaurant_name)
+        settings.address = data.get('address', settings.address)
+        settings.phone = data.get('phone', settings.phone)
+        settings.email = data.get('email', settings.email)
+        settings.currency = data.get('currency', settings.currency)
+        settings.tax_rate = data.get('taxRate', settings.tax_rate)
+        
+        db.session.commit()
+        pricing.invalidate()
+        
+        return jsonify(settings.to_dict())
+    except Exception as e:
+        logger.error(f"Error updating restaurant settings: {e}")
+        return jsonify({'error': 'Failed to update restaurant settings'}), 500
+
+# Excel Import/Export API
+@api.route('/api/menu/export-template', methods=['GET'])
+@read_only
+@admission_class(REPORT)
+def export_menu_template():
+    """Download Excel template for bulk menu import"""
+    try:
+        # Create a new workbook
+        wb = Workbook()
+        
+        # Create Categories sheet
+        ws_categories = wb.active
+        ws_categories.title = "Categories"
+        ws_categories['A1'] = "Category Name"
+        ws_categories['A1'].font = Font(bold=True)
+        ws_categories['A1'].fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+        ws_categories['A1'].font = Font(bold=True, color="FFFFFF")
+        ws_categories.column_dimensions['A'].width = 30
+        
+        # Add sample data
+        ws_categories['A2'] = "Example: Appetizers"
+        
+        # Create Departments sheet
+        ws_departments = wb.create_sheet("Departments")
+        ws_departments['A1'] = "Department Name"
+        ws_departments['A1'].font = Font(bold=True)
+        ws_departments['A1'].fill = PatternFill(start_color="70AD47", end_color="70AD47", fill_type="solid")
+        ws_departments['A1'].font = Font(bold=True, color="FFFFFF")
+        ws_departments.column_dimensions['A'].width = 30
+        
+        # Add sample data
+        ws_departments['A2'] = "Example: Kitchen"
+        
+        # Create Menu Items sheet
+        ws_items = wb.create_sheet("Menu Items")
+        headers = ["Product Code", "Item Name", "Price", "Category", "Department", "Description"]
+        for col, header in enumerate(headers, start=1):
+            cell = ws_items.cell(row=1, column=col, value=header)
+            cell.font = Font(bold=True, color="FFFFFF")
+            cell.fill = PatternFill(start_color="ED7D31", end_color="ED7D31", fill_type="solid")
+            cell.alignment = Alignment(horizontal="center")
+        
+        # Set column widths
+        ws_items.column_dimensions['A'].width = 20
+        ws_items.column_dimensions['B'].width = 30
+        ws_items.column_dimensions['C'].width = 15
+        ws_items.column_dimensions['D'].width = 20
+        ws_items.column_dimensions['E'].width = 20
+        ws_items.column_dimensions['F'].width = 50
+        
+        # Add sample data
+        ws_items['A2'] = "CB001"
+        ws_items['B2'] = "Example: Chicken Burger"
+        ws_items['C2'] = 299
+        ws_items['D2'] = "Mains"
+        ws_items['E2'] = "Kitchen"
+        ws_items['F2'] = "Grilled chicken with lettuce and mayo"
+        
+        # Save to BytesIO
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        
+        return send_file(
+            output,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name='menu_import_template.xlsx'
+        )
+    except Exception as e:
+        logger.error(f"Error generating template: {e}")
+        return jsonify({'error': 'Failed to generate template'}), 500
+
+@api.route('/api/menu/export', methods=['GET'])
+@read_only
+@admission_class(REPORT)
+def export_menu_data():
+    """Export current menu data to Excel"""
+    try:
+        # Create a new workbook
+        wb = Workbook()
+        
+        # Export Categories
+        ws_categories = wb.active
+        ws_categories.title = "Categories"
+        ws_categories['A1'] = "Category Name"
+        ws_categories['A1'].font = Font(bold=True, color="FFFFFF")
+        ws_categories['A1'].fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+        ws_categories.column_dimensions['A'].width = 30
+        
+        categories = Category.scoped().all()
+        for idx, cat in enumerate(categories, start=2):
+            ws_categories[f'A{idx}'] = cat.name
+        
+        # Export Departments
+        ws_departments = wb.create_sheet("Departments")
+        ws_departments['A1'] = "Department Name"
+        ws_departments['A1'].font = Font(bold=True, color="FFFFFF")
+        ws_departments['A1'].fill = PatternFill(start_color="70AD47", end_color="70AD47", fill_type="solid")
+        ws_departments.column_dimensions['A'].width = 30
+        
+        departments = Department.scoped().all()
+        for idx, dept in enumerate(departments, start=2):
+            ws_departments[f'A{idx}'] = dept.name
+        
+        # Export Menu Items
+        ws_items = wb.create_sheet("Menu Items")
+        headers = ["Product Code", "Item Name", "Price", "Category", "Department", "Description"]
+        for col, header in enumerate(headers, start=1):
+            cell = ws_items.cell(row=1, column=col, value=header)
+            cell.font = Font(bold=True, color="FFFFFF")
+            cell.fill = PatternFill(start_color="ED7D31", end_color="ED7D31", fill_type="solid")
+            cell.alignment = Alignment(horizontal="center")
+        
+        ws_items.column_dimensions['A'].width = 20
+        ws_items.column_dimensions['B'].width = 30
+        ws_items.column_dimensions['C'].width = 15
+        ws_items.column_dimensions['D'].width = 20
+        ws_items.column_dimensions['E'].width = 20
+        ws_items.column_dimensions['F'].width = 50
+        
+        items = MenuItem.scoped().all()
+        for idx, item in enumerate(items, start=2):
+            ws_items[f'A{idx}'] = item.product_code
+            ws_items[f'B{idx}'] = item.name
+            ws_items[f'C{idx}'] = item.price
+            ws_items[f'D{idx}'] = item.category
+            ws_items[f'E{idx}'] = item.department
+            ws_items[f'F{idx}'] = item.description
+        
+        # Save to BytesIO
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        
+        return send_file(
+            output,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name='menu_data_export.xlsx'
+        )
+    except Exception as e:
+        logger.error(f"Error exporting menu data: {e}")
+        return jsonify({'error': 'Failed to export menu data'}), 500
+
+@api.route('/api/menu/import', methods=['POST'])
+@admission_class(REPORT)
+def import_menu_data():
+    """Import menu data from Excel file"""
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        if not file.filename.endswith(('.xlsx', '.xls')):
+            return jsonify({'error': 'Invalid file format. Please upload an Excel file'}), 400
+        
+        # Large files can be imported in the background and polled via /api/jobs/<id>
+        if request.args.get('async', request.form.get('async', '')).lower() == 'true':
+            job = background_jobs.submit('menu_import', run_import_job, file.read())
+            return jsonify({
+                'success': True,
+                'jobId': job.id,
+                'status': job.status,
+                'statusUrl': f'/api/jobs/{job.id}'
+            }), 202
+        
+        # Load workbook
+        wb = load_workbook(file, read_only=True)
+        try:
+            stats, _ = import_workbook(wb)
+        finally:
+            wb.close()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Import completed successfully',
+            'stats': stats
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error importing menu data: {e}")
+        return jsonify({'error': f'Failed to import menu data: {str(e)}'}), 500
+
+@api.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status and progress of a background job"""
+    try:
+        job = Job.get_scoped(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job.to_dict())
+    except Exception as e:
+        logger.error(f"Error fetching job: {e}")
+        return jsonify({'error': 'Failed to fetch job'}), 500
+
+@api.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a background job; it stops after the batch it is working on"""
+    try:
+        job = Job.get_scoped(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        if job.status not in ('queued', 'running'):
+            return jsonify({'error': f'Job is already {job.status}'}), 409
+        background_jobs.cancel(job)
+        return jsonify(job.to_dict())
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error cancelling job: {e}")
+        return jsonify({'error': 'Failed to cancel job'}), 500
+
+# Serve React App (for production deployment)
+@frontend.route('/', defaults={'path': ''})
+@frontend.route('/<path:path>')
+@admission_class(None)
+def serve_react_app(path):
+    """Serve the React frontend application"""
+    try:
+        # Get the build folder path (parent directory of backend)
+        build_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'build')
+        
+        # If path is provided and file exists, serve it
+        if path != "" and os.path.exists(os.path.join(build_folder, path)):
+            return send_file(os.path.join(build_folder, path))
+        
+        # Check if it's an API request (should have been handled by API routes)
+        if path.startswith('api/'):
+            return jsonify({'error': 'API endpoint not found'}), 404
+        
+        # Otherwise, serve index.html for React routing
+        index_path = os.path.join(build_folder, 'index.html')
+        if os.path.exists(index_path):
+            return send_file(index_path)
+        else:
+            return jsonify({'error': 'Frontend build not found. Please run: npm run build'}), 404
+    except Exception as e:
+        logger.error(f"Error serving frontend: {e}")
+        return jsonify({'error': 'Failed to serve frontend application'}), 500
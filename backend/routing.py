@@ -0,0 +1,208 @@
+import functools
+import itertools
+import logging
+import threading
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from outlets import current_outlet_id, outlet_bind_key
+
+logger = logging.getLogger(__name__)
+
+MUTATING_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+STICKY_COOKIE = 'pos_primary_until'
+STICKY_HEADER = 'X-Primary-Until'  # for cross-origin clients, which do not send the cookie
+
+
+class RoutingSession(Session):
+    """Session that picks the engine for each statement.
+
+    Outlets configured with their own database (``OUTLET_DATABASE_URLS``) are sent to
+    that engine. Otherwise, reads in views marked :func:`read_only` go to a read
+    replica until the session writes anything; everything else uses the default
+    ``DATABASE_URL`` engine.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            engine = outlet_engine(current_outlet_id())
+            if engine is not None:
+                return engine
+
+            if self._flushing or getattr(clause, 'is_dml', False):
+                # Once the session writes, later reads must see those writes
+                self.info['wrote'] = True
+            elif not self.info.get('wrote') and g.get('read_only'):
+                engine = replicas.engine_for_request()
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def outlet_engine(outlet_id):
+    """Dedicated engine of an outlet, or ``None`` if it shares the default database"""
+    return current_app.extensions['sqlalchemy'].engines.get(outlet_bind_key(outlet_id))
+
+
+def all_engines():
+    """Default engine followed by every dedicated outlet engine"""
+    engines = current_app.extensions['sqlalchemy'].engines
+    return [engines[None]] + [engine for key, engine in engines.items() if key and key.startswith('outlet:')]
+
+
+def read_only(view):
+    """Mark a view as safe to serve from a read replica.
+
+    If the replica fails while the view runs, the view is run again on the primary.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        response = view(*args, **kwargs)
+        if g.pop('replica_failed', False):
+            current_app.extensions['sqlalchemy'].session.rollback()
+            g.replica_key = None
+            response = view(*args, **kwargs)
+        return response
+    return wrapper
+
+
+class ReplicaRouter:
+    """Round-robin selection over the ``DATABASE_REPLICA_URLS`` engines.
+
+    A replica that raises a connection error is skipped for ``REPLICA_RETRY_SECONDS``
+    and probed with ``SELECT 1`` before it is used again; with no healthy replica,
+    reads fall back to the primary. After a successful write, the client is pinned to
+    the primary for ``REPLICA_STICKY_SECONDS`` so it reads its own writes despite
+    replication lag. The pin is sent as a cookie and as an ``X-Primary-Until``
+    response header; the frontend calls the API cross-origin without credentials,
+    so it echoes the header back on its next requests instead.
+
+    Must be initialised before ``db.init_app`` so the binds are picked up.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._unhealthy_until = {}  # bind key -> time the replica may be probed again
+        self._watched = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DATABASE_REPLICA_URLS', [])
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+        app.config.setdefault('REPLICA_RETRY_SECONDS', 30)
+
+        binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+        for index, url in enumerate(app.config['DATABASE_REPLICA_URLS']):
+            binds[_replica_bind_key(index)] = url
+
+        if app.config['DATABASE_REPLICA_URLS']:
+            app.after_request(self._pin_writer_to_primary)
+
+    def engine_for_request(self):
+        """Replica engine for the current request, or ``None`` to use the primary"""
+        if 'replica_key' not in g:
+            g.replica_key = None if pinned_to_primary() else self._choose()
+        if g.replica_key is None:
+            return None
+        return current_app.extensions['sqlalchemy'].engines[g.replica_key]
+
+    def _choose(self):
+        engines = current_app.extensions['sqlalchemy'].engines
+        keys = [_replica_bind_key(i) for i in range(len(current_app.config['DATABASE_REPLICA_URLS']))]
+        if not keys:
+            return None
+
+        start = next(self._counter)
+        for offset in range(len(keys)):
+            key = keys[(start + offset) % len(keys)]
+            engine = engines[key]
+            self._watch(key, engine)
+            if self._is_healthy(key, engine):
+                return key
+        return None
+
+    def _is_healthy(self, key, engine):
+        retry_at = self._unhealthy_until.get(key)
+        if retry_at is None:
+            return True
+        if time.monotonic() < retry_at:
+            return False
+        try:
+            with engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+        except Exception as e:
+            self._mark_unhealthy(key, e)
+            return False
+        with self._lock:
+            self._unhealthy_until.pop(key, None)
+        logger.info(f"Read replica {key} is healthy again")
+        return True
+
+    def _mark_unhealthy(self, key, error):
+        with self._lock:
+            self._unhealthy_until[key] = time.monotonic() + current_app.config['REPLICA_RETRY_SECONDS']
+        logger.error(f"Read replica {key} failed, using other replicas or the primary: {error}")
+
+    def _watch(self, key, engine):
+        """Take a replica out of rotation as soon as it reports a connection error"""
+        if engine in self._watched:
+            return
+        with self._lock:
+            if engine in self._watched:
+                return
+            self._watched.add(engine)
+
+        app = current_app._get_current_object()
+
+        @event.listens_for(engine, 'handle_error')
+        def _on_error(context):
+            if not (context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError)):
+                return
+            if has_app_context():
+                self._mark_unhealthy(key, context.original_exception)
+                g.replica_failed = True
+            else:
+                with app.app_context():
+                    self._mark_unhealthy(key, context.original_exception)
+
+    def _pin_writer_to_primary(self, response):
+        if request.method in MUTATING_METHODS and response.status_code < 400:
+            sticky_seconds = current_app.config['REPLICA_STICKY_SECONDS']
+            primary_until = str(int(time.time() + sticky_seconds))
+            response.set_cookie(
+                STICKY_COOKIE,
+                primary_until,
+                max_age=sticky_seconds,
+                httponly=True,
+                samesite='Lax'
+            )
+            response.headers[STICKY_HEADER] = primary_until
+        return response
+
+
+def _replica_bind_key(index):
+    return f'replica:{index}'
+
+
+def pinned_to_primary():
+    """Whether the current request must read from the primary to see its client's recent writes"""
+    if not has_request_context():
+        return False
+    now = time.time()
+    for value in (request.headers.get(STICKY_HEADER), request.cookies.get(STICKY_COOKIE)):
+        try:
+            if value and float(value) > now:
+                return True
+        except ValueError:
+            pass
+    return False
+
+
+replicas = ReplicaRouter()
@@ -0,0 +1,79 @@
+import functools
+import threading
+
+from flask import current_app, request
+
+from outlets import current_outlet_id
+from routing import pinned_to_primary
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None  # (body, status, content type), or None if the leader raised
+
+
+class SingleFlight:
+    """Coalesce identical concurrent GET requests within a worker.
+
+    The first request for a given outlet and URL runs the view; requests for the
+    same key that arrive while it is running wait for it and get a copy of its
+    serialized response, so a stampede of tablets at shift start costs one query.
+    Clients pinned to the primary after a write (see ``routing.py``) are keyed
+    apart, so they never get a response read from a lagging replica.
+    Nothing is cached once the call finishes. If the leading request raises, the
+    waiting requests run the view themselves.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['single_flight'] = {
+            'lock': threading.Lock(),
+            'calls': {},  # (outlet id, pinned to primary, full path) -> _Call
+            'stats': {'leaders': 0, 'coalesced': 0, 'fallbacks': 0},
+        }
+
+    def __call__(self, view):
+        """Decorator for idempotent GET views (views that never write)"""
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            state = current_app.extensions['single_flight']
+            key = (current_outlet_id(), pinned_to_primary(), request.full_path)
+            with state['lock']:
+                call = state['calls'].get(key)
+                leader = call is None
+                if leader:
+                    call = state['calls'][key] = _Call()
+                    state['stats']['leaders'] += 1
+                else:
+                    state['stats']['coalesced'] += 1
+
+            if leader:
+                try:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    call.result = (response.get_data(), response.status_code, response.content_type)
+                    return response
+                finally:
+                    with state['lock']:
+                        del state['calls'][key]
+                    call.done.set()
+
+            call.done.wait()
+            if call.result is None:
+                with state['lock']:
+                    state['stats']['fallbacks'] += 1
+                return view(*args, **kwargs)
+            body, status, content_type = call.result
+            return current_app.response_class(body, status=status, content_type=content_type)
+        return wrapper
+
+    def stats(self):
+        state = current_app.extensions['single_flight']
+        with state['lock']:
+            return dict(state['stats'], inFlight=len(state['calls']))
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,267 @@
+import csv
+import io
+import json
+import sys
+import time
+import zipfile
+from datetime import date, datetime
+
+import sqlalchemy as sa
+from flask import g
+
+from app import create_app
+from models import db
+from outlets import DEFAULT_OUTLET_ID
+from partitions import archived_invoice_tables, invoice_table
+from routing import outlet_engine
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+NULL = '\\N'  # same NULL marker as Postgres COPY, so either side can read the other's files
+BATCH_SIZE = 5000
+EPOCH = datetime(1970, 1, 1)
+
+USAGE = """usage: python snapshot.py snapshot <file.zip> [outlet_id]
+       python snapshot.py restore <file.zip>"""
+
+
+def outlet_tables():
+    """Tables holding outlet data, parents before children"""
+    return [table for table in db.metadata.sorted_tables if 'outlet_id' in table.c]
+
+
+def snapshot(path, outlet_id=DEFAULT_OUTLET_ID):
+    """Dump every table of an outlet, including archived invoices, to a zip file.
+
+    Each table is streamed to its own CSV entry (``\\N`` for NULL), with
+    ``COPY ... TO STDOUT`` on Postgres and batched reads elsewhere. All tables are
+    read in one transaction, so the snapshot is consistent. Returns the manifest.
+    """
+    app = create_app()
+    with app.app_context():
+        g.outlet_id = outlet_id
+        engine = outlet_engine(outlet_id) or db.engine
+        tables = outlet_tables() + archived_invoice_tables(EPOCH)
+        manifest = {
+            'format': FORMAT_VERSION,
+            'outlet': outlet_id,
+            'createdAt': datetime.utcnow().isoformat(),
+            'dialect': engine.dialect.name,
+            'tables': []
+        }
+
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive, engine.connect() as conn:
+            if engine.dialect.name == 'postgresql':
+                conn = conn.execution_options(isolation_level='REPEATABLE READ', postgresql_readonly=True)
+            for table in tables:
+                columns = [column.name for column in table.columns]
+                entry = zipfile.ZipInfo(f'{table.name}.csv', date_time=time.localtime()[:6])
+                entry.compress_type = zipfile.ZIP_DEFLATED
+                with archive.open(entry, 'w', force_zip64=True) as out:
+                    if engine.dialect.name == 'postgresql':
+                        rows = _copy_out(conn, table, columns, outlet_id, out)
+                    else:
+                        rows = _write_rows(conn, table, outlet_id, out)
+                manifest['tables'].append({'name': table.name, 'columns': columns, 'rows': rows})
+            archive.writestr(MANIFEST, json.dumps(manifest, indent=2))
+        return manifest
+
+
+def surrogate_key(table):
+    """The table's integer id if it is a database-wide serial rather than part of an
+    ``(outlet_id, id)`` key, else ``None``"""
+    column = table.autoincrement_column
+    if column is None or 'outlet_id' in table.primary_key.columns:
+        return None
+    return column.name
+
+
+def restore(path):
+    """Replace an outlet's data with the contents of a snapshot.
+
+    The outlet is the one the snapshot was taken from. Its current rows are deleted
+    and the snapshot loaded in dependency order, in a single transaction with
+    foreign key checks deferred: either the whole outlet is restored or nothing
+    changes. Uses ``COPY ... FROM STDIN`` on Postgres and batched ``executemany``
+    inserts elsewhere.
+
+    Rows keep their ids, except in tables keyed by a database-wide serial id
+    (:func:`surrogate_key`: orders, configs, print jobs, kitchen items, ...). Those
+    ids may already belong to another outlet on the target server, so the rows get
+    new ids there; nothing refers to them. Ids that clients hold, such as order
+    ids, therefore change.
+
+    Running servers pick the restored data up as their floor, menu and analytics
+    caches expire; terminals should run a full sync (``/api/sync`` without
+    ``since``), as deletions made by the restore leave no tombstones.
+    """
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read(MANIFEST))
+        if manifest.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format: {manifest.get('format')}")
+        outlet_id = manifest['outlet']
+
+        app = create_app()
+        with app.app_context():
+            g.outlet_id = outlet_id
+            engine = outlet_engine(outlet_id) or db.engine
+            live_tables = outlet_tables()
+            order = {table.name: position for position, table in enumerate(live_tables)}
+            entries = sorted(manifest['tables'], key=lambda entry: order.get(entry['name'], len(order)))
+            tables = {table.name: table for table in live_tables + archived_invoice_tables(EPOCH)}
+            for entry in entries:
+                # Archive tables only exist where invoices have been archived
+                tables.setdefault(entry['name'], invoice_table(entry['name']))
+                missing = set(entry['columns']) - set(tables[entry['name']].c.keys())
+                if missing:
+                    raise ValueError(f"Table {entry['name']} has no columns {', '.join(sorted(missing))}")
+
+            with engine.begin() as conn:
+                _defer_constraints(conn)
+                for table in tables.values():
+                    table.create(conn, checkfirst=True)
+                # Children first, so no foreign key is left dangling
+                for table in reversed(list(tables.values())):
+                    conn.execute(table.delete().where(table.c.outlet_id == outlet_id))
+
+                for entry in entries:
+                    table = tables[entry['name']]
+                    skip = surrogate_key(table)
+                    with archive.open(f"{entry['name']}.csv") as src:
+                        if engine.dialect.name == 'postgresql':
+                            rows = _copy_in(conn, table, entry['columns'], src, skip)
+                        else:
+                            rows = _insert_rows(conn, table, entry['columns'], src, skip)
+                    if rows != entry['rows']:
+                        raise ValueError(f"Table {entry['name']}: expected {entry['rows']} rows, read {rows}")
+
+                _restore_constraints(conn)
+        return manifest
+
+
+def _format(value):
+    if value is None:
+        return NULL
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _parser(column):
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return str
+    if python_type is bool:
+        return lambda value: value in ('t', 'true', '1')
+    if python_type is datetime:
+        return datetime.fromisoformat
+    if python_type is date:
+        return date.fromisoformat
+    if python_type in (int, float):
+        return python_type
+    return str
+
+
+def _write_rows(conn, table, outlet_id, out):
+    text = io.TextIOWrapper(out, encoding='utf-8', newline='')
+    writer = csv.writer(text, lineterminator='\n')
+    # In key order, so rows that get new ids on restore keep their relative order
+    result = conn.execution_options(yield_per=BATCH_SIZE).execute(
+        sa.select(table).where(table.c.outlet_id == outlet_id).order_by(*table.primary_key.columns)
+    )
+    rows = 0
+    for partition in result.partitions():
+        writer.writerows([_format(value) for value in row] for row in partition)
+        rows += len(partition)
+    text.flush()
+    text.detach()
+    return rows
+
+
+def _insert_rows(conn, table, columns, src, skip=None):
+    parsers = [_parser(table.c[name]) for name in columns]
+    reader = csv.reader(io.TextIOWrapper(src, encoding='utf-8', newline=''))
+    insert = table.insert()
+    rows = 0
+    batch = []
+    for record in reader:
+        batch.append({
+            name: None if value == NULL else parse(value)
+            for name, parse, value in zip(columns, parsers, record)
+            if name != skip
+        })
+        if len(batch) >= BATCH_SIZE:
+            conn.execute(insert, batch)
+            rows += len(batch)
+            batch = []
+    if batch:
+        conn.execute(insert, batch)
+        rows += len(batch)
+    return rows
+
+
+def _column_list(conn, columns):
+    return ', '.join(conn.dialect.identifier_preparer.quote(name) for name in columns)
+
+
+def _copy_out(conn, table, columns, outlet_id, out):
+    cursor = conn.connection.dbapi_connection.cursor()
+    query = cursor.mogrify(
+        f"SELECT {_column_list(conn, columns)} FROM {conn.dialect.identifier_preparer.format_table(table)} "
+        f"WHERE outlet_id = %s ORDER BY {_column_list(conn, [column.name for column in table.primary_key.columns])}",
+        (outlet_id,)
+    ).decode()
+    cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, NULL '\\N')", out)
+    return cursor.rowcount
+
+
+def _copy_in(conn, table, columns, src, skip=None):
+    cursor = conn.connection.dbapi_connection.cursor()
+    target = conn.dialect.identifier_preparer.format_table(table)
+    if skip is None:
+        cursor.copy_expert(f"COPY {target} ({_column_list(conn, columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", src)
+        return cursor.rowcount
+
+    # COPY cannot leave out a column of the file: load a staging table, then insert
+    # everything but the id, which the table's sequence assigns
+    kept = _column_list(conn, [name for name in columns if name != skip])
+    cursor.execute(f"CREATE TEMP TABLE restore_staging (LIKE {target}) ON COMMIT DROP")
+    cursor.copy_expert(f"COPY restore_staging ({_column_list(conn, columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", src)
+    rows = cursor.rowcount
+    cursor.execute(f"INSERT INTO {target} ({kept}) SELECT {kept} FROM restore_staging ORDER BY {conn.dialect.identifier_preparer.quote(skip)}")
+    cursor.execute("DROP TABLE restore_staging")
+    return rows
+
+
+def _defer_constraints(conn):
+    if conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql('SET CONSTRAINTS ALL DEFERRED')
+    elif conn.dialect.name == 'sqlite':
+        conn.exec_driver_sql('PRAGMA defer_foreign_keys = ON')
+    elif conn.dialect.name == 'mysql':
+        conn.exec_driver_sql('SET FOREIGN_KEY_CHECKS = 0')
+
+
+def _restore_constraints(conn):
+    if conn.dialect.name == 'mysql':
+        conn.exec_driver_sql('SET FOREIGN_KEY_CHECKS = 1')
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ('snapshot', 'restore'):
+        sys.exit(USAGE)
+
+    started = time.monotonic()
+    if sys.argv[1] == 'snapshot':
+        result = snapshot(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else DEFAULT_OUTLET_ID)
+    else:
+        result = restore(sys.argv[2])
+    rows = sum(entry['rows'] for entry in result['tables'])
+    action = 'Wrote' if sys.argv[1] == 'snapshot' else 'Restored'
+    print(f"{action} {rows} rows in {len(result['tables'])} tables for outlet {result['outlet']} "
+          f"({sys.argv[2]}, {time.monotonic() - started:.1f}s)")
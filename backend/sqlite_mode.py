@@ -0,0 +1,101 @@
+import logging
+import os
+import weakref
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+from routing import MUTATING_METHODS
+
+logger = logging.getLogger(__name__)
+
+# Engines in SQLite mode. Connections opened before Gunicorn forks (create_all in
+# create_app) must not be shared with the workers, so children drop them.
+_engines = weakref.WeakSet()
+os.register_at_fork(after_in_child=lambda: [engine.dispose(close=False) for engine in list(_engines)])
+
+
+def is_sqlite(url):
+    return str(url).startswith('sqlite')
+
+
+def engine_options(url):
+    """Engine options for a database URL.
+
+    ``pool_recycle`` and ``pool_pre_ping`` guard against servers dropping idle
+    connections (MySQL's wait_timeout); a SQLite file cannot do that, so for SQLite
+    the ping would only add a round trip to every checkout.
+    """
+    if is_sqlite(url):
+        return {}
+    return {
+        'pool_recycle': 280,  # Prevent MySQL connection timeout
+        'pool_pre_ping': True,  # Verify connections before using
+    }
+
+
+class SQLiteMode:
+    """Tuning for running the POS on a local SQLite file (single-terminal outlets).
+
+    Every SQLite engine gets WAL journaling, so readers never block the writer, and
+    the ``SQLITE_*`` pragmas on each new connection. pysqlite's own transaction
+    handling is replaced so that mutating requests and background jobs start with
+    ``BEGIN IMMEDIATE``: they take the write lock up front and wait for it under
+    ``busy_timeout``, instead of failing with "database is locked" when two
+    Gunicorn workers try to upgrade a read lock at the same time. Reads use a plain
+    deferred ``BEGIN``.
+
+    Must be initialised after ``db.init_app``, which creates the engines.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLITE_BUSY_TIMEOUT_MS', 5000)
+        app.config.setdefault('SQLITE_SYNCHRONOUS', 'NORMAL')  # durable in WAL mode except on power loss
+        app.config.setdefault('SQLITE_CACHE_SIZE_KB', 65536)
+        app.config.setdefault('SQLITE_MMAP_SIZE_MB', 256)
+
+        with app.app_context():
+            engines = list(app.extensions['sqlalchemy'].engines.values())
+        for engine in engines:
+            if engine.dialect.name == 'sqlite':
+                self._configure(engine, app.config)
+
+    def _configure(self, engine, config):
+        if engine in _engines:
+            return  # an engine shared between apps (create_app(engine=...)) is set up once
+        _engines.add(engine)
+        in_memory = engine.url.database in (None, '', ':memory:')
+        pragmas = [
+            f"synchronous = {config['SQLITE_SYNCHRONOUS']}",
+            f"busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+            f"cache_size = -{int(config['SQLITE_CACHE_SIZE_KB'])}",
+            f"mmap_size = {int(config['SQLITE_MMAP_SIZE_MB']) * 1024 * 1024}",
+            'temp_store = MEMORY',
+            'foreign_keys = ON',
+        ]
+        if not in_memory:
+            pragmas.insert(0, 'journal_mode = WAL')
+
+        @event.listens_for(engine, 'connect')
+        def _on_connect(dbapi_connection, connection_record):
+            # Let SQLAlchemy issue BEGIN itself (see _on_begin)
+            dbapi_connection.isolation_level = None
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(f'PRAGMA {pragma}')
+            cursor.close()
+
+        @event.listens_for(engine, 'begin')
+        def _on_begin(conn):
+            if has_request_context() and request.method not in MUTATING_METHODS:
+                conn.exec_driver_sql('BEGIN')
+            else:
+                conn.exec_driver_sql('BEGIN IMMEDIATE')
+        logger.info(f"SQLite mode enabled for {engine.url.database or ':memory:'}")
+
+
+sqlite_mode = SQLiteMode()
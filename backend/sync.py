@@ -0,0 +1,114 @@
+import logging
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from models import (
+    db, Table, TableOrder, MenuItem, Category, Department, PriceRule, KOTConfig, BillConfig, RestaurantSettings,
+    Tombstone
+)
+from outlets import current_outlet_id
+
+logger = logging.getLogger(__name__)
+
+# Collections in the feed: response key -> model
+COLLECTIONS = {
+    'tables': Table,
+    'orders': TableOrder,
+    'menuItems': MenuItem,
+    'categories': Category,
+    'departments': Department,
+    'priceRules': PriceRule,
+}
+
+# One row per outlet, reported as a single object (or null if unchanged)
+SINGLETONS = {
+    'kotConfig': KOTConfig,
+    'billConfig': BillConfig,
+    'restaurantSettings': RestaurantSettings,
+}
+
+
+def format_watermark(value):
+    return value.isoformat() + 'Z'
+
+
+class ChangeFeed:
+    """Delta sync over the ``updated_at`` columns and tombstones of synced models.
+
+    A client passes the watermark from its previous sync and gets every row
+    changed (and every id deleted) since then, plus a new watermark. Rows are read
+    from ``SYNC_OVERLAP_SECONDS`` before the watermark, because a transaction that
+    started earlier can commit a row with an older ``updated_at`` after the previous
+    sync ran. Clients therefore see some rows twice and must apply changes as
+    upserts. Tombstones are kept for ``SYNC_TOMBSTONE_RETENTION_DAYS``; a client
+    whose watermark is older gets a full snapshot instead.
+    """
+
+    def __init__(self, app=None):
+        self._last_purge = {}  # outlet id -> monotonic time of the last purge
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SYNC_OVERLAP_SECONDS', 5)
+        app.config.setdefault('SYNC_TOMBSTONE_RETENTION_DAYS', 30)
+        app.config.setdefault('SYNC_PURGE_INTERVAL_SECONDS', 3600)
+
+    def changes_since(self, since=None):
+        """Rows changed after ``since`` (naive UTC), or everything if ``since`` is None"""
+        watermark = datetime.utcnow()
+        retention = timedelta(days=current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS'])
+        full = since is None or since < watermark - retention
+        after = None if full else since - timedelta(seconds=current_app.config['SYNC_OVERLAP_SECONDS'])
+
+        changes = {}
+        for key, model in COLLECTIONS.items():
+            changes[key] = [row.to_dict() for row in self._changed(model, after)]
+        for key, model in SINGLETONS.items():
+            row = self._changed(model, after).first()
+            changes[key] = row.to_dict() if row else None
+
+        deleted = {key: [] for key in COLLECTIONS}
+        if not full:
+            entities = {model.__tablename__: key for key, model in COLLECTIONS.items()}
+            tombstones = Tombstone.scoped().filter(Tombstone.deleted_at > after).order_by(Tombstone.deleted_at)
+            for tombstone in tombstones:
+                key = entities.get(tombstone.entity)
+                if key is not None:
+                    deleted[key].append(tombstone.entity_id)
+            # A row deleted and then recreated with the same id exists again
+            for key, ids in deleted.items():
+                present = {str(row['id']) for row in changes[key]}
+                deleted[key] = [entity_id for entity_id in dict.fromkeys(ids) if entity_id not in present]
+
+        self._purge_tombstones(watermark - retention)
+        return {
+            'watermark': format_watermark(watermark),
+            'full': full,
+            'changes': changes,
+            'deleted': deleted
+        }
+
+    def _changed(self, model, after):
+        query = model.scoped()
+        if after is not None:
+            query = query.filter(model.updated_at > after)
+        return query
+
+    def _purge_tombstones(self, cutoff):
+        now = time.monotonic()
+        outlet_id = current_outlet_id()
+        if now - self._last_purge.get(outlet_id, 0.0) < current_app.config['SYNC_PURGE_INTERVAL_SECONDS']:
+            return
+        self._last_purge[outlet_id] = now
+        try:
+            Tombstone.scoped().filter(Tombstone.deleted_at < cutoff).delete()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error purging sync tombstones: {e}")
+
+
+change_feed = ChangeFeed()
@@ -0,0 +1,138 @@
+import json
+from datetime import datetime
+
+from kitchen import kitchen_display
+from models import db, Table, TableOrder
+
+
+class TableOperationError(Exception):
+    """A transfer, merge or split that cannot be applied; ``status_code`` is the HTTP status"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def merge_order_items(existing_items, new_items):
+    """Add ``new_items`` to an order's item list in place.
+
+    A new item is folded into an existing line with the same id only if neither has
+    been sent to the kitchen; otherwise it becomes a line of its own, so items the
+    kitchen has already seen never change.
+    """
+    for new_item in new_items:
+        match = next((item for item in existing_items if item['id'] == new_item['id']), None)
+        if match is not None and not match.get('sentToKitchen', False) and not new_item.get('sentToKitchen', False):
+            match['quantity'] += new_item['quantity']
+        else:
+            existing_items.append(new_item)
+    return existing_items
+
+
+def _lock(source_id, target_id):
+    """Lock both tables and their orders, always in table id order so concurrent
+    moves between the same tables cannot deadlock"""
+    if source_id == target_id:
+        raise TableOperationError('Source and target table must differ')
+    table_ids = sorted((source_id, target_id))
+    tables = {table.id: table for table in Table.scoped().filter(Table.id.in_(table_ids))
+              .order_by(Table.id).with_for_update()}
+    for table_id in table_ids:
+        if table_id not in tables:
+            raise TableOperationError(f'Table {table_id} not found', 404)
+    orders = {order.table_id: order for order in TableOrder.scoped().filter(TableOrder.table_id.in_(table_ids))
+              .order_by(TableOrder.table_id).with_for_update()}
+    if source_id not in orders:
+        raise TableOperationError(f'Table {source_id} has no open order', 404)
+    return tables, orders
+
+
+def _items(order):
+    return json.loads(order.items) if order.items else []
+
+
+def _finish(tables, orders, source_id, target_id):
+    """Set both table statuses, commit, and return ``(source order, target order)``"""
+    for table_id in (source_id, target_id):
+        tables[table_id].status = 'occupied' if orders.get(table_id) is not None else 'available'
+    db.session.commit()
+    return orders.get(source_id), orders.get(target_id)
+
+
+def transfer_order(source_id, target_id):
+    """Move a table's whole order to an empty table"""
+    tables, orders = _lock(source_id, target_id)
+    if target_id in orders:
+        raise TableOperationError(f'Table {target_id} already has an order; merge instead', 409)
+
+    order = orders.pop(source_id)
+    order.table_id = target_id
+    order.table_name = tables[target_id].name
+    orders[target_id] = order
+    kitchen_display.move_table(source_id, target_id, tables[target_id].name)
+    return _finish(tables, orders, source_id, target_id)
+
+
+def merge_orders(source_id, target_id):
+    """Move every line of the source table's order onto the target table and close the source"""
+    tables, orders = _lock(source_id, target_id)
+    source = orders.pop(source_id)
+    target = orders.get(target_id)
+    if target is None:
+        # Merging into an empty table is a transfer
+        source.table_id = target_id
+        source.table_name = tables[target_id].name
+        orders[target_id] = source
+    else:
+        target.items = json.dumps(merge_order_items(_items(target), _items(source)))
+        target.start_time = min(target.start_time, source.start_time)
+        db.session.delete(source)
+    kitchen_display.move_table(source_id, target_id, tables[target_id].name)
+    return _finish(tables, orders, source_id, target_id)
+
+
+def split_order(source_id, target_id, lines):
+    """Move some lines (or part of their quantity) to another table.
+
+    ``lines`` is a list of ``{"index": <line index in the source order>, "quantity": n}``;
+    ``quantity`` defaults to the whole line.
+    """
+    tables, orders = _lock(source_id, target_id)
+    source = orders[source_id]
+    source_items = _items(source)
+
+    moved = []
+    remaining = {index: item['quantity'] for index, item in enumerate(source_items)}
+    for line in lines:
+        index = line.get('index')
+        if not isinstance(index, int) or index not in remaining:
+            raise TableOperationError(f'Invalid order line {index!r}')
+        quantity = line.get('quantity', source_items[index]['quantity'])
+        if not isinstance(quantity, int) or quantity <= 0 or quantity > remaining[index]:
+            raise TableOperationError(f'Invalid quantity for order line {index}')
+        remaining[index] -= quantity
+        moved.append(dict(source_items[index], quantity=quantity))
+    if not moved:
+        raise TableOperationError('No order lines to move')
+
+    kept = [dict(item, quantity=remaining[index]) for index, item in enumerate(source_items) if remaining[index] > 0]
+    if kept:
+        source.items = json.dumps(kept)
+    else:
+        db.session.delete(source)
+        orders.pop(source_id)
+
+    target = orders.get(target_id)
+    if target is None:
+        target = TableOrder(
+            table_id=target_id,
+            table_name=tables[target_id].name,
+            items=json.dumps(moved),
+            start_time=datetime.now()
+        )
+        db.session.add(target)
+        orders[target_id] = target
+    else:
+        target.items = json.dumps(merge_order_items(_items(target), moved))
+    kitchen_display.move_items(source_id, target_id, tables[target_id].name, moved)
+    return _finish(tables, orders, source_id, target_id)
@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+import routes
+from app import create_app
+from models import db
+
+
+@pytest.fixture
+def client(tmp_path):
+    # Requests run on threads here, so the app needs a database file
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "pos.db"}',
+                      'ADMISSION_CONTROL_ENABLED': True, 'ADMISSION_RETRY_AFTER_SECONDS': 3})
+    yield app.test_client()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_saturated_report_class_sheds_at_once(client, monkeypatch):
+    # Hold report requests inside the view, with their slots taken
+    started, release = threading.Semaphore(0), threading.Event()
+    parse_business_date = routes.parse_business_date
+
+    def slow_parse(value):
+        started.release()
+        release.wait(5)
+        return parse_business_date(value)
+
+    monkeypatch.setattr(routes, 'parse_business_date', slow_parse)
+    responses = []
+    reports = [threading.Thread(target=lambda: responses.append(client.get('/api/day-close?from=2026-01-01')))
+               for _ in range(2)]
+    for report in reports:
+        report.start()
+    for _ in reports:
+        assert started.acquire(timeout=5)
+
+    try:
+        began = time.monotonic()
+        shed = client.get('/api/day-close')
+        assert time.monotonic() - began < 0.2
+        assert shed.status_code == 503
+        assert shed.headers['Retry-After'] == '3'
+
+        # Other classes are unaffected
+        assert client.get('/api/tables').status_code == 200
+        stats = client.get('/api/admission/stats').json['classes']
+        assert (stats['report']['inFlight'], stats['report']['shed']) == (2, 1)
+    finally:
+        release.set()
+        for report in reports:
+            report.join()
+
+    assert [response.status_code for response in responses] == [200, 200]
+    assert client.get('/api/day-close').status_code == 200
+    assert client.get('/api/admission/stats').json['classes']['report']['inFlight'] == 0
@@ -0,0 +1,130 @@
+import json
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from analytics import AnalyticsStore
+
+ALWAYS_REFRESH = {'ANALYTICS_REFRESH_SECONDS': 0}
+
+
+def add_invoice(client, invoice_id, timestamp, order_type='dine-in', items=None):
+    items = items or [{'id': 'soup', 'name': 'Soup', 'price': 5, 'quantity': 2, 'category': 'Starters'}]
+    subtotal = sum(item['price'] * item['quantity'] for item in items)
+    response = client.post('/api/invoices', json={
+        'id': invoice_id, 'billNumber': invoice_id, 'orderType': order_type, 'timestamp': timestamp,
+        'items': items, 'subtotal': subtotal, 'tax': 0, 'total': subtotal
+    })
+    assert response.status_code == 201
+
+
+def invoice_rows(batch, count=50):
+    start = datetime(2026, 1, 1)
+    return [
+        (f'{batch}-{n}', start + timedelta(minutes=batch * count + n), 'takeaway' if n % 2 else 'dine-in', 10.0,
+         json.dumps([{'id': f'item-{n % 7}', 'name': f'Item {n % 7}', 'price': 5, 'quantity': 2,
+                      'category': f'Category {n % 3}'}]))
+        for n in range(count)
+    ]
+
+
+@pytest.mark.parametrize('app_config', [ALWAYS_REFRESH], indirect=True)
+def test_reports(client):
+    # 2026-01-05 is a Monday
+    add_invoice(client, 'a', '2026-01-05T12:30:00Z')
+    add_invoice(client, 'b', '2026-01-05T12:45:00Z', order_type='takeaway', items=[
+        {'id': 'tea', 'name': 'Tea', 'price': 2, 'quantity': 3, 'category': 'Drinks'}
+    ])
+    add_invoice(client, 'c', '2026-01-06T19:00:00Z')
+
+    heatmap = client.get('/api/analytics/heatmap').json
+    assert heatmap['invoices'][0][12] == 2
+    assert heatmap['revenue'][0][12] == 16.0
+    assert heatmap['invoices'][1][19] == 1
+
+    weekdays = client.get('/api/analytics/weekdays').json
+    assert weekdays[0] == {'weekday': 'Monday', 'invoices': 2, 'revenue': 16.0, 'averageTicket': 8.0}
+    assert weekdays[1]['invoices'] == 1
+
+    trend = client.get('/api/analytics/order-types?interval=day').json
+    assert trend == [
+        {'period': '2026-01-05', 'orderTypes': {'dine-in': {'invoices': 1, 'revenue': 10.0},
+                                                'takeaway': {'invoices': 1, 'revenue': 6.0}}},
+        {'period': '2026-01-06', 'orderTypes': {'dine-in': {'invoices': 1, 'revenue': 10.0}}},
+    ]
+
+    items = client.get('/api/analytics/items?sort=quantity').json
+    assert [(item['id'], item['quantity'], item['amount']) for item in items] == [('soup', 4.0, 20.0), ('tea', 3.0, 6.0)]
+
+    categories = client.get('/api/analytics/categories?from=2026-01-06T00:00:00Z').json
+    assert categories == [{'category': 'Starters', 'quantity': 2.0, 'amount': 10.0}]
+
+    assert client.get('/api/analytics/order-types?interval=year').status_code == 400
+    assert client.get('/api/analytics/weekdays?from=yesterday').status_code == 400
+
+
+@pytest.mark.parametrize('app_config', [ALWAYS_REFRESH], indirect=True)
+def test_late_invoices_are_added_once(client):
+    add_invoice(client, 'a', '2026-01-05T12:00:00Z')
+    assert client.get('/api/analytics/weekdays').json[0]['invoices'] == 1
+
+    # Arrives after 'a' with an earlier timestamp: the refresh re-reads the late
+    # window, which also returns 'a' again
+    add_invoice(client, 'b', '2026-01-05T11:00:00Z')
+    add_invoice(client, 'c', '2026-01-05T13:00:00Z')
+    assert client.get('/api/analytics/weekdays').json[0]['invoices'] == 3
+    assert client.get('/api/analytics/weekdays').json[0]['revenue'] == 30.0
+
+
+def test_snapshot_is_reloaded_memory_mapped(tmp_path, make_app):
+    config = dict(ALWAYS_REFRESH, ANALYTICS_SNAPSHOT_DIR=str(tmp_path), ANALYTICS_SNAPSHOT_MIN_NEW_INVOICES=2)
+    client = make_app(config).test_client()
+    add_invoice(client, 'a', '2026-01-05T12:00:00Z')
+    add_invoice(client, 'b', '2026-01-06T12:00:00Z')
+    assert client.get('/api/analytics/weekdays').status_code == 200
+
+    store = AnalyticsStore.load(str(tmp_path / 'default'), 'UTC')
+    assert isinstance(store.invoices.get('ts'), np.memmap)
+    assert len(store.invoices) == 2
+
+    # A new process (here: an app on an empty database) starts from the snapshot
+    other = make_app(config).test_client()
+    weekdays = other.get('/api/analytics/weekdays').json
+    assert [day['invoices'] for day in weekdays[:2]] == [1, 1]
+
+    # A snapshot taken in another time zone is not used
+    assert AnalyticsStore.load(str(tmp_path / 'default'), 'Asia/Kolkata') is None
+
+
+def test_queries_during_refresh():
+    store = AnalyticsStore('UTC')
+    errors = []
+    done = threading.Event()
+
+    def query():
+        while not done.is_set():
+            try:
+                store.heatmap()
+                store.weekdays()
+                store.order_type_trend('week')
+                store.top_items()
+                store.categories_summary()
+            except Exception as e:
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=query) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for batch in range(300):
+        with store.lock:
+            store.ingest(invoice_rows(batch))
+    done.set()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+    assert sum(day['invoices'] for day in store.weekdays()) == 300 * 50
+    assert sum(category['quantity'] for category in store.categories_summary()) == 300 * 50 * 2
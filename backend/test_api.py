@@ -0,0 +1,182 @@
+import threading
+import time
+
+import pytest
+from flask import url_for
+
+from app import create_app
+from models import BillConfig, KOTConfig, MenuItem, PrintJob, RestaurantSettings, db
+from print_spooler import print_spooler
+
+
+def add_table(client, table_id, name=None):
+    response = client.post('/api/tables', json={'id': table_id, 'name': name or table_id.upper(),
+                                                'seats': 4, 'category': 'Main'})
+    assert response.status_code == 201
+
+
+def add_menu_item(client, item_id, price, category='Main', department='Kitchen'):
+    response = client.post('/api/menu-items', json={'id': item_id, 'name': item_id.title(), 'productCode': item_id,
+                                                    'price': price, 'category': category, 'department': department})
+    assert response.status_code == 201
+
+
+def test_url_for_builds_api_urls(app):
+    with app.test_request_context():
+        assert url_for('api.get_tables') == '/api/tables'
+        assert url_for('api.split_table_order', table_id='t 1') == '/api/orders/table/t%201/split'
+        assert url_for('api.get_kitchen_queue', department='Bar') == '/api/kitchen/queue?department=Bar'
+        assert url_for('api.get_print_job', job_id=7, _external=True) == 'http://localhost/api/print-jobs/7'
+
+
+def test_apps_have_separate_databases(client, make_app):
+    add_table(client, 't1')
+    other = make_app().test_client()
+
+    assert [table['id'] for table in client.get('/api/tables').json] == ['t1']
+    assert other.get('/api/tables').json == []
+
+
+def test_order_occupies_table_until_completed(client):
+    add_table(client, 't1')
+
+    response = client.post('/api/orders/table/t1', json={'table_name': 'T1', 'items': [
+        {'id': 'soup', 'name': 'Soup', 'price': 4.5, 'quantity': 2}
+    ]})
+    assert response.status_code == 200
+    table = client.get('/api/tables').json[0]
+    assert table['status'] == 'occupied'
+    assert table['runningTotal'] == 9.0
+
+    assert client.post('/api/orders/table/t1/complete').status_code == 200
+    assert client.get('/api/tables').json[0]['status'] == 'available'
+
+
+def test_split_moves_kitchen_items(client):
+    add_table(client, 't1')
+    add_table(client, 't2')
+    client.post('/api/orders/table/t1', json={'table_name': 'T1', 'items': [
+        {'id': 'soup', 'name': 'Soup', 'price': 5, 'quantity': 3, 'department': 'Kitchen'}
+    ]})
+    client.post('/api/orders/table/t1/sent')
+
+    response = client.post('/api/orders/table/t1/split', json={'targetTableId': 't2', 'lines': [{'index': 0, 'quantity': 2}]})
+    assert response.status_code == 200
+    assert response.json['source']['items'][0]['quantity'] == 1
+    assert response.json['target']['items'][0]['quantity'] == 2
+
+    items = client.get('/api/kitchen/queue?department=Kitchen').json['items']
+    assert sorted((item['tableId'], item['quantity']) for item in items) == [('t1', 1), ('t2', 2)]
+
+
+@pytest.mark.parametrize('app_config', [{'SERVER_PRICING_ENABLED': True}], indirect=True)
+def test_server_prices_invoice(client):
+    add_menu_item(client, 'soup', 4.99)
+    client.put('/api/restaurant-settings', json={'restaurantName': 'Test', 'taxRate': 5})
+
+    quote = client.post('/api/pricing/quote', json={'items': [{'id': 'soup', 'quantity': 3, 'price': 1}]}).json
+    assert quote['subtotal'] == 14.97
+    assert quote['tax'] == 0.75
+
+    response = client.post('/api/invoices', json={
+        'id': 'inv-1', 'billNumber': 'B1', 'orderType': 'takeaway', 'timestamp': '2026-01-05T12:00:00Z',
+        'items': [{'id': 'soup', 'quantity': 3, 'price': 1}], 'subtotal': 3, 'tax': 0, 'total': 3
+    })
+    assert response.status_code == 201
+    assert response.json['total'] == quote['total']
+
+    response = client.post('/api/invoices', json={
+        'id': 'inv-2', 'billNumber': 'B2', 'orderType': 'takeaway', 'timestamp': '2026-01-05T12:00:00Z',
+        'items': [{'id': 'unknown', 'quantity': 1}], 'subtotal': 1, 'tax': 0, 'total': 1
+    })
+    assert response.status_code == 400
+
+
+def test_only_failed_print_jobs_are_retried(app, client, monkeypatch):
+    dispatched = []
+    monkeypatch.setattr(print_spooler, '_dispatch', lambda job: dispatched.append(job.id))
+    jobs = [PrintJob(kind='bill', printer_id='p1', payload='{}', status=status) for status in ('printing', 'failed')]
+    db.session.add_all(jobs)
+    db.session.commit()
+    printing_id, failed_id = (job.id for job in jobs)
+    db.session.remove()
+
+    assert client.post(f'/api/print-jobs/{printing_id}/retry').status_code == 400
+    response = client.post(f'/api/print-jobs/{failed_id}/retry')
+    assert response.status_code == 200
+    assert response.json['status'] == 'queued'
+    assert response.json['attempts'] == 0
+    assert dispatched == [failed_id]
+
+
+def test_idempotent_retry_replays_response(client):
+    headers = {'Idempotency-Key': 'create-t1'}
+    table = {'id': 't1', 'name': 'T1', 'seats': 4, 'category': 'Main'}
+
+    first = client.post('/api/tables', json=table, headers=headers)
+    retry = client.post('/api/tables', json=table, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.json == first.json
+    assert len(client.get('/api/tables').json) == 1
+
+    # Same key, different query string: not the same request
+    response = client.post('/api/tables?async=true', json=table, headers=headers)
+    assert response.status_code == 422
+
+
+def test_concurrent_identical_gets_share_one_query(tmp_path, monkeypatch):
+    # Threads need connections of their own: a database file, not the shared in-memory one
+    client = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "pos.db"}'}).test_client()
+    add_menu_item(client, 'soup', 5)
+
+    # Hold the leading request inside the view until the others are waiting on it
+    entered, release = threading.Event(), threading.Event()
+    to_dict = MenuItem.to_dict
+
+    def slow_to_dict(item):
+        entered.set()
+        release.wait(5)
+        return to_dict(item)
+
+    monkeypatch.setattr(MenuItem, 'to_dict', slow_to_dict)
+    responses = []
+
+    def get():
+        responses.append(client.get('/api/menu-items'))
+
+    leader = threading.Thread(target=get)
+    leader.start()
+    assert entered.wait(5)
+    followers = [threading.Thread(target=get) for _ in range(7)]
+    for follower in followers:
+        follower.start()
+    deadline = time.monotonic() + 5
+    while client.get('/api/single-flight/stats').json['coalesced'] < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert [(response.status_code, response.json[0]['id']) for response in responses] == [(200, 'soup')] * 8
+    assert client.get('/api/single-flight/stats').json == {'leaders': 1, 'coalesced': 7, 'fallbacks': 0, 'inFlight': 0}
+
+
+def test_restaurant_settings_are_not_written_by_reads(client):
+    assert client.get('/api/restaurant-settings').json['restaurantName'] == 'My Restaurant'
+    assert db.session.query(RestaurantSettings).count() == 0
+
+    assert client.put('/api/restaurant-settings', json={'taxRate': 12}).status_code == 200
+    settings = client.get('/api/restaurant-settings').json
+    assert (settings['restaurantName'], settings['taxRate']) == ('My Restaurant', 12)
+
+
+def test_print_configs_are_not_written_by_reads(client):
+    assert client.get('/api/config/kot').json == {'printByDepartment': False, 'numberOfCopies': 1, 'selectedPrinter': None}
+    assert client.get('/api/config/bill').json == {'autoPrintDineIn': False, 'autoPrintTakeaway': False, 'selectedPrinter': None}
+    assert db.session.query(KOTConfig).count() == db.session.query(BillConfig).count() == 0
+
+    assert client.put('/api/config/kot', json={'numberOfCopies': 2}).status_code == 200
+    assert client.put('/api/config/bill', json={'autoPrintTakeaway': True}).status_code == 200
+    assert client.get('/api/config/kot').json['numberOfCopies'] == 2
+    assert client.get('/api/config/bill').json['autoPrintTakeaway'] is True
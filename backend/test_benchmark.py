@@ -0,0 +1,13 @@
+import sys
+
+import benchmark
+
+
+def test_benchmark_runs(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'argv', ['benchmark.py', '--terminals', '2', '--rounds', '2',
+                                      '--database', f'sqlite:///{tmp_path / "bench.db"}'])
+
+    assert benchmark.main() == 0
+    output = capsys.readouterr().out
+    assert '2 terminals x 2 orders' in output
+    assert 'add invoice' in output
@@ -0,0 +1,61 @@
+from datetime import date, datetime
+
+import pytest
+
+from day_close import business_day_bounds
+
+KOLKATA_4AM = {'BUSINESS_TIMEZONE': 'Asia/Kolkata', 'BUSINESS_DAY_START_HOUR': 4}
+LONDON_4AM = {'BUSINESS_TIMEZONE': 'Europe/London', 'BUSINESS_DAY_START_HOUR': 4}
+
+
+def add_invoice(client, invoice_id, timestamp, total):
+    response = client.post('/api/invoices', json={
+        'id': invoice_id, 'billNumber': invoice_id, 'orderType': 'dine-in', 'timestamp': timestamp,
+        'items': [{'id': 'soup', 'price': total, 'quantity': 1, 'category': 'Starters', 'department': 'Kitchen'}],
+        'subtotal': total, 'tax': 0, 'total': total
+    })
+    assert response.status_code == 201
+
+
+@pytest.mark.parametrize('app_config', [KOLKATA_4AM], indirect=True)
+def test_day_starts_at_the_local_start_hour(app):
+    # 04:00 IST is 22:30 UTC the day before
+    assert business_day_bounds(date(2026, 1, 5)) == (datetime(2026, 1, 4, 22, 30), datetime(2026, 1, 5, 22, 30))
+
+
+@pytest.mark.parametrize('app_config', [LONDON_4AM], indirect=True)
+def test_days_with_clock_changes(app):
+    # Clocks go forward on 29 March 2026 and back on 25 October 2026
+    assert business_day_bounds(date(2026, 3, 28)) == (datetime(2026, 3, 28, 4), datetime(2026, 3, 29, 3))
+    assert business_day_bounds(date(2026, 3, 29)) == (datetime(2026, 3, 29, 3), datetime(2026, 3, 30, 3))
+    assert business_day_bounds(date(2026, 10, 24)) == (datetime(2026, 10, 24, 3), datetime(2026, 10, 25, 4))
+    assert business_day_bounds(date(2026, 10, 25)) == (datetime(2026, 10, 25, 4), datetime(2026, 10, 26, 4))
+
+
+@pytest.mark.parametrize('app_config', [KOLKATA_4AM], indirect=True)
+def test_close_and_rebuild(client):
+    add_invoice(client, 'B1', '2026-01-04T22:00:00Z', 10)  # 03:30 on the 5th: the 4th's business day
+    add_invoice(client, 'B2', '2026-01-04T23:00:00Z', 20)
+    add_invoice(client, 'B3', '2026-01-05T22:00:00Z', 30)  # 03:30 on the 6th, still the 5th
+    add_invoice(client, 'B4', '2026-01-05T23:00:00Z', 40)
+
+    response = client.post('/api/day-close', json={'date': '2026-01-05'})
+    assert response.status_code == 201
+    snapshot = response.json
+    assert (snapshot['revision'], snapshot['invoiceCount'], snapshot['total']) == (1, 2, 50.0)
+    assert (snapshot['firstBillNumber'], snapshot['lastBillNumber']) == ('B2', 'B3')
+    assert snapshot['departments'] == {'Kitchen': {'quantity': 2, 'amount': 50.0}}
+    assert client.post('/api/day-close', json={'date': '2026-01-05'}).status_code == 409
+
+    # A late invoice is only counted once the day is rebuilt
+    add_invoice(client, 'B5', '2026-01-05T12:00:00Z', 5)
+    assert client.get('/api/day-close/2026-01-05').json['invoiceCount'] == 2
+    response = client.post('/api/day-close/2026-01-05/rebuild')
+    assert response.status_code == 200
+    assert (response.json['revision'], response.json['invoiceCount'], response.json['total']) == (2, 3, 55.0)
+    assert client.post('/api/day-close/2026-01-05/rebuild').json['revision'] == 3
+
+    assert client.post('/api/day-close/2026-01-06/rebuild').status_code == 404
+    assert client.post('/api/day-close', json={'date': '2026-01-04'}).json['invoiceCount'] == 1
+    assert [day['businessDate'] for day in client.get('/api/day-close?from=2026-01-05').json] == ['2026-01-05']
+    assert client.get('/api/day-close/5-1-2026').status_code == 400
@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from app import create_app
+from group_commit import GroupCommitter, group_committer
+from models import Table, db
+from routing import RoutingSession
+
+BATCH = 4
+
+
+@pytest.fixture
+def app(tmp_path):
+    # Batches close when full: the delay is long enough for every test thread to join
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "pos.db"}', 'GROUP_COMMIT_ENABLED': True,
+                      'GROUP_COMMIT_MAX_BATCH': BATCH, 'GROUP_COMMIT_MAX_DELAY_MS': 5000})
+    with app.app_context():
+        db.session.add(Table(id='t0', name='T0', seats=4, category='Main'))
+        db.session.commit()
+        db.session.remove()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Sizes of the transactions the committer ran"""
+    sizes = []
+    commit_batch = GroupCommitter._commit_batch
+
+    def record(self, ops):
+        sizes.append(len(ops))
+        return commit_batch(self, ops)
+
+    monkeypatch.setattr(GroupCommitter, '_commit_batch', record)
+    return sizes
+
+
+def add_table(table_id):
+    def add():
+        table = Table(id=table_id, name=table_id.upper(), seats=4, category='Main')
+        db.session.add(table)
+        return table
+    return add
+
+
+def fail():
+    raise ValueError('bad order')
+
+
+def run_concurrently(app, fns):
+    """``group_committer.run(fn)`` for each function on a thread of its own: results or errors"""
+    outcomes = [None] * len(fns)
+
+    def call(index, fn):
+        with app.app_context():
+            try:
+                outcomes[index] = group_committer.run(fn)
+            except Exception as e:
+                outcomes[index] = e
+
+    threads = [threading.Thread(target=call, args=(index, fn)) for index, fn in enumerate(fns)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return outcomes
+
+
+def table_ids(app):
+    with app.app_context():
+        ids = sorted(table.id for table in Table.query)
+        db.session.remove()
+    return ids
+
+
+def describe(outcome):
+    return type(outcome).__name__ if isinstance(outcome, Exception) else outcome.name
+
+
+def test_batch_shares_one_transaction(app, batches):
+    # 't0' exists already, so its insert fails inside its savepoint
+    outcomes = run_concurrently(app, [add_table('t1'), add_table('t2'), fail, add_table('t0')])
+
+    assert batches == [BATCH]
+    assert [describe(outcome) for outcome in outcomes] == ['T1', 'T2', 'ValueError', 'IntegrityError']
+    assert str(outcomes[2]) == 'bad order'
+    assert table_ids(app) == ['t0', 't1', 't2']
+
+
+def test_failed_batch_commit_is_retried_one_by_one(app, batches):
+    failures = [IntegrityError('COMMIT', {}, Exception('simulated commit failure'))]
+
+    def fail_first_commit(session):
+        # Also called when a savepoint is released
+        if failures and not session.in_nested_transaction():
+            raise failures.pop()
+
+    event.listen(RoutingSession, 'before_commit', fail_first_commit)
+    try:
+        outcomes = run_concurrently(app, [add_table('t1'), add_table('t2'), fail, add_table('t3')])
+    finally:
+        event.remove(RoutingSession, 'before_commit', fail_first_commit)
+
+    assert batches == [BATCH, 1, 1, 1, 1]
+    assert [describe(outcome) for outcome in outcomes] == ['T1', 'T2', 'ValueError', 'T3']
+    assert table_ids(app) == ['t0', 't1', 't2', 't3']
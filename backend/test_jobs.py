@@ -0,0 +1,117 @@
+import functools
+import threading
+import time
+from io import BytesIO
+
+import pytest
+from openpyxl import Workbook
+
+import menu_import
+from app import create_app
+from jobs import background_jobs
+from models import Job, db
+
+FINISHED = ('cancelled', 'completed', 'failed')
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # Jobs run on a pool thread, so the app needs a database file; import in batches of 10
+    monkeypatch.setattr(menu_import, 'import_workbook', functools.partial(menu_import.import_workbook, batch_size=10))
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "pos.db"}'})
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def workbook(items):
+    wb = Workbook()
+    wb.active.title = 'Categories'
+    wb['Categories'].append(['Name'])
+    wb['Categories'].append(['Mains'])
+    wb.create_sheet('Departments').append(['Name'])
+    wb['Departments'].append(['Kitchen'])
+    sheet = wb.create_sheet('Menu Items')
+    sheet.append(['Product Code', 'Name', 'Price', 'Category', 'Department', 'Description'])
+    for n in range(items):
+        sheet.append([f'P{n:03d}', f'Item {n}', 10 + n, 'Mains', 'Kitchen', ''])
+    data = BytesIO()
+    wb.save(data)
+    data.seek(0)
+    return data
+
+
+def start_import(client, items):
+    response = client.post('/api/menu/import?async=true', data={'file': (workbook(items), 'menu.xlsx')})
+    assert response.status_code == 202
+    return response.json['jobId']
+
+
+def wait_for(client, job_id):
+    deadline = time.monotonic() + 5
+    while True:
+        job = client.get(f'/api/jobs/{job_id}').json
+        if job['status'] in FINISHED or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_import_reports_progress(app, monkeypatch):
+    reported = []
+    report_progress = menu_import.report_progress
+
+    def record(job, rows_processed, errors):
+        reported.append(rows_processed)
+        return report_progress(job, rows_processed, errors)
+
+    monkeypatch.setattr(menu_import, 'report_progress', record)
+    client = app.test_client()
+
+    job = wait_for(client, start_import(client, 25))
+
+    assert reported == [10, 20, 25]
+    assert (job['status'], job['rowsProcessed'], job['stats']['items_added']) == ('completed', 25, 25)
+    assert job['finishedAt'] is not None
+    assert len(client.get('/api/menu-items').json) == 25
+
+
+def test_cancelled_import_keeps_committed_batches(app, monkeypatch):
+    first_batch, resume = threading.Event(), threading.Event()
+    report_progress = menu_import.report_progress
+
+    def pause_after_first_batch(job, rows_processed, errors):
+        if rows_processed == 10:
+            first_batch.set()
+            resume.wait(5)
+        return report_progress(job, rows_processed, errors)
+
+    monkeypatch.setattr(menu_import, 'report_progress', pause_after_first_batch)
+    client = app.test_client()
+    job_id = start_import(client, 25)
+    assert first_batch.wait(5)
+
+    assert client.get(f'/api/jobs/{job_id}').json['status'] == 'running'
+    assert client.post(f'/api/jobs/{job_id}/cancel').json['status'] == 'cancelling'
+    resume.set()
+    job = wait_for(client, job_id)
+
+    assert (job['status'], job['rowsProcessed']) == ('cancelled', 10)
+    assert len(client.get('/api/menu-items').json) == 10
+    assert client.post(f'/api/jobs/{job_id}/cancel').status_code == 409
+
+
+def test_job_cancelled_before_it_starts_never_runs(app):
+    ran = []
+    with app.app_context():
+        db.session.add(Job(id='job-1', kind='test'))
+        db.session.commit()
+        # Cancelled after the job was queued, before a pool thread picked it up
+        background_jobs.cancel(Job.get_scoped('job-1'))
+        db.session.remove()
+
+        background_jobs._run(app, 'default', 'job-1', lambda job: ran.append(job), ())
+
+        job = Job.get_scoped('job-1')
+        assert (job.status, ran) == ('cancelled', [])
+        assert job.finished_at is not None
+        db.session.remove()
@@ -0,0 +1,101 @@
+import pytest
+
+from menu_index import MenuIndex
+from models import MenuItem, db
+
+
+def menu_item(item_id, name, code, category='Mains'):
+    return MenuItem(id=item_id, name=name, product_code=code, price=10, category=category, department='Kitchen')
+
+
+@pytest.fixture
+def index():
+    return MenuIndex([
+        menu_item('1', 'Classic Burger', 'CB001'),
+        menu_item('2', 'Cheese Burger', 'CB002'),
+        menu_item('3', 'Caesar Salad', 'CS002', category='Salads'),
+        menu_item('4', 'Chicken Burrito', 'BR001'),
+    ])
+
+
+def names(items):
+    return [item['name'] for item in items]
+
+
+def test_substring_search(index):
+    assert names(index.search('burg')) == ['Cheese Burger', 'Classic Burger']
+    assert names(index.search('URGE')) == ['Cheese Burger', 'Classic Burger']
+    # Equally good matches are ordered by name
+    assert names(index.search('bur')) == ['Cheese Burger', 'Chicken Burrito', 'Classic Burger']
+    assert names(index.search('ala')) == ['Caesar Salad']
+    assert index.search('pizza') == []
+
+
+def test_ranking(index):
+    for item in (menu_item('5', 'Hamburger', 'HB1'), menu_item('6', 'Burger Deluxe', 'BD1'),
+                 menu_item('7', 'Brownie', 'BUR2'), menu_item('8', 'Burnt Cheesecake', 'BUR')):
+        index.upsert(item)
+
+    # Exact code, code prefix, name prefix, word prefix, then any substring
+    assert names(index.search('bur')) == [
+        'Burnt Cheesecake', 'Brownie', 'Burger Deluxe', 'Cheese Burger', 'Chicken Burrito', 'Classic Burger',
+        'Hamburger'
+    ]
+    assert names(index.search('cs002')) == ['Caesar Salad']
+    assert names(index.search('002')) == ['Caesar Salad', 'Cheese Burger']
+
+
+def test_short_queries_match_word_prefixes(index):
+    # Code prefixes first, then name prefixes
+    assert names(index.search('c')) == ['Caesar Salad', 'Cheese Burger', 'Classic Burger', 'Chicken Burrito']
+    assert names(index.search('sa')) == ['Caesar Salad']
+    assert index.search('ur') == []
+
+
+def test_category_and_limit(index):
+    assert names(index.search('c', category='Salads')) == ['Caesar Salad']
+    assert len(index.search('', limit=3)) == 3
+    assert len(index.search('')) == 4
+
+
+def test_by_code(index):
+    assert index.by_code('cb001')['name'] == 'Classic Burger'
+    assert index.by_code(' CB001 ')['id'] == '1'
+    assert index.by_code('CB003') is None
+
+
+def test_upsert_and_remove(index):
+    index.upsert(menu_item('1', 'Smash Burger', 'SB001'))
+    assert index.by_code('CB001') is None
+    assert index.by_code('SB001')['name'] == 'Smash Burger'
+    assert names(index.search('classic')) == []
+    assert names(index.search('smash')) == ['Smash Burger']
+
+    index.remove('1')
+    assert index.by_code('SB001') is None
+    assert names(index.search('burger')) == ['Cheese Burger']
+
+
+def test_routes_keep_the_index_fresh(client):
+    client.post('/api/menu-items', json={'id': '1', 'name': 'Classic Burger', 'productCode': 'CB001',
+                                         'price': 10, 'category': 'Mains', 'department': 'Kitchen'})
+    assert names(client.get('/api/menu-items/search?q=burg').json) == ['Classic Burger']
+
+    client.put('/api/menu-items/1', json={'name': 'Smash Burger', 'productCode': 'SB001'})
+    assert names(client.get('/api/menu-items/search?q=smash').json) == ['Smash Burger']
+    assert client.get('/api/menu-items/search?q=classic').json == []
+    assert client.get('/api/menu-items/by-code/sb001').json['name'] == 'Smash Burger'
+    assert client.get('/api/menu-items/by-code/CB001').status_code == 404
+
+    client.delete('/api/menu-items/1')
+    assert client.get('/api/menu-items/search?q=burg').json == []
+    assert client.get('/api/menu-items/by-code/SB001').status_code == 404
+
+
+@pytest.mark.parametrize('app_config', [{'MENU_INDEX_MAX_AGE_SECONDS': 0}], indirect=True)
+def test_index_is_rebuilt_after_max_age(client):
+    assert client.get('/api/menu-items/search?q=burg').json == []
+    # Written by another worker process: only seen once the index is rebuilt
+    db.session.add(menu_item('1', 'Classic Burger', 'CB001'))
+    db.session.commit()
+    assert names(client.get('/api/menu-items/search?q=burg').json) == ['Classic Burger']
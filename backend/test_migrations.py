@@ -0,0 +1,109 @@
+import os
+import sqlite3
+from contextlib import closing
+
+import pytest
+from flask_migrate import downgrade, upgrade
+
+from app import create_app
+from models import db
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), 'migrations')
+
+# The schema create_all made before multi-outlet mode, with some data
+BASELINE = """
+CREATE TABLE tables (id VARCHAR NOT NULL, name VARCHAR NOT NULL, seats INTEGER NOT NULL,
+    category VARCHAR NOT NULL, status VARCHAR NOT NULL, PRIMARY KEY (id));
+CREATE TABLE table_orders (id INTEGER NOT NULL, table_id VARCHAR NOT NULL, table_name VARCHAR NOT NULL,
+    items TEXT, start_time DATETIME NOT NULL, PRIMARY KEY (id), FOREIGN KEY(table_id) REFERENCES tables (id));
+CREATE TABLE invoices (id VARCHAR NOT NULL, bill_number VARCHAR NOT NULL, order_type VARCHAR NOT NULL,
+    table_name VARCHAR, items TEXT NOT NULL, subtotal FLOAT NOT NULL, tax FLOAT NOT NULL, total FLOAT NOT NULL,
+    timestamp DATETIME NOT NULL, PRIMARY KEY (id));
+CREATE TABLE kot_config (id INTEGER NOT NULL, print_by_department BOOLEAN NOT NULL,
+    number_of_copies INTEGER NOT NULL, selected_printer VARCHAR, PRIMARY KEY (id));
+CREATE TABLE bill_config (id INTEGER NOT NULL, auto_print_dine_in BOOLEAN NOT NULL,
+    auto_print_takeaway BOOLEAN NOT NULL, selected_printer VARCHAR, PRIMARY KEY (id));
+CREATE TABLE menu_items (id VARCHAR NOT NULL, name VARCHAR NOT NULL, product_code VARCHAR NOT NULL,
+    price FLOAT NOT NULL, category VARCHAR NOT NULL, department VARCHAR NOT NULL, description TEXT,
+    PRIMARY KEY (id), UNIQUE (product_code));
+CREATE TABLE categories (id VARCHAR NOT NULL, name VARCHAR NOT NULL, PRIMARY KEY (id), UNIQUE (name));
+CREATE TABLE departments (id VARCHAR NOT NULL, name VARCHAR NOT NULL, PRIMARY KEY (id), UNIQUE (name));
+CREATE TABLE restaurant_settings (id INTEGER NOT NULL, restaurant_name VARCHAR NOT NULL, address VARCHAR,
+    phone VARCHAR, email VARCHAR, currency VARCHAR NOT NULL, tax_rate FLOAT NOT NULL, PRIMARY KEY (id));
+
+INSERT INTO tables VALUES ('1', 'A1', 2, 'General', 'occupied'), ('2', 'A2', 4, 'General', 'available');
+INSERT INTO table_orders VALUES (7, '1', 'A1', '[{"id": "1", "name": "Burger", "price": 259, "quantity": 2}]',
+    '2026-09-01 12:00:00.000000');
+INSERT INTO invoices VALUES
+    ('i1', 'B1', 'dine-in', 'A1', '[]', 100, 5, 105, '2026-07-03 12:00:00.000000'),
+    ('i2', 'B2', 'takeaway', NULL, '[]', 50, 2.5, 52.5, '2026-08-04 13:00:00.000000');
+INSERT INTO kot_config VALUES (1, 0, 2, 'Kitchen printer');
+INSERT INTO bill_config VALUES (1, 1, 0, NULL);
+INSERT INTO menu_items VALUES ('1', 'Burger', 'CB001', 259, 'Mains', 'Kitchen', NULL);
+INSERT INTO categories VALUES ('c1', 'Mains');
+INSERT INTO departments VALUES ('d1', 'Kitchen');
+INSERT INTO restaurant_settings VALUES (1, 'Old Restaurant', NULL, NULL, NULL, 'INR', 5);
+"""
+TABLES = ['tables', 'table_orders', 'invoices', 'kot_config', 'bill_config', 'menu_items', 'categories',
+          'departments', 'restaurant_settings']
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    path = tmp_path / 'pos.db'
+    with closing(sqlite3.connect(path)) as connection:
+        connection.executescript(BASELINE)
+    return path
+
+
+def rows(path):
+    with closing(sqlite3.connect(path)) as connection:
+        return {table: connection.execute(f'SELECT * FROM {table} ORDER BY 1').fetchall() for table in TABLES}
+
+
+def migrate(path, command, **kwargs):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'CREATE_SCHEMA': False})
+    with app.app_context():
+        try:
+            command(directory=MIGRATIONS, **kwargs)
+        finally:
+            db.engine.dispose()
+
+
+def test_upgrade_keeps_the_data_and_downgrade_restores_it(baseline):
+    before = rows(baseline)
+
+    migrate(baseline, upgrade)
+
+    client = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{baseline}'}).test_client()
+    assert [(table['id'], table['status']) for table in client.get('/api/tables').json] == [
+        ('1', 'occupied'), ('2', 'available')
+    ]
+    assert client.get('/api/orders/table/1').json['items'][0]['quantity'] == 2
+    assert sorted(invoice['total'] for invoice in client.get('/api/invoices').json) == [52.5, 105]
+    assert client.get('/api/config/kot').json == {'printByDepartment': False, 'numberOfCopies': 2,
+                                                  'selectedPrinter': 'Kitchen printer'}
+    assert client.get('/api/config/bill').json['autoPrintDineIn'] is True
+    assert client.get('/api/menu-items').json[0]['productCode'] == 'CB001'
+    assert client.get('/api/restaurant-settings').json['restaurantName'] == 'Old Restaurant'
+    # Serial ids continue after the copied ones
+    assert client.post('/api/orders/table/2', json={'table_name': 'A2', 'items': []}).json['id'] == 8
+    assert client.post('/api/orders/table/2/complete').status_code == 200
+
+    migrate(baseline, downgrade, revision='base')
+
+    assert rows(baseline) == before
+
+
+def test_downgrade_refuses_several_outlets(baseline):
+    migrate(baseline, upgrade)
+    with closing(sqlite3.connect(baseline)) as connection, connection:
+        connection.execute("INSERT INTO departments VALUES ('other', 'd1', 'Kitchen', '2026-10-01 00:00:00')")
+
+    with pytest.raises(SystemExit):
+        migrate(baseline, downgrade, revision='base')
+
+    with closing(sqlite3.connect(baseline)) as connection:
+        assert connection.execute('SELECT outlet_id, id FROM departments ORDER BY 1').fetchall() == [
+            ('default', 'd1'), ('other', 'd1')
+        ]
@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import pytest
+import sqlalchemy as sa
+from flask import g
+
+from models import db
+from partitions import ARCHIVE_TABLE, archive_invoices, find_invoice, invoices_between
+
+MULTI_OUTLET = {'MULTI_OUTLET_ENABLED': True}
+
+
+def add_invoice(client, invoice_id, timestamp, outlet_id='default'):
+    response = client.post('/api/invoices', headers={'X-Outlet-Id': outlet_id}, json={
+        'id': invoice_id, 'billNumber': invoice_id, 'orderType': 'takeaway', 'timestamp': timestamp,
+        'items': [{'id': 'soup', 'name': 'Soup', 'price': 5, 'quantity': 1}], 'subtotal': 5, 'tax': 0, 'total': 5
+    })
+    assert response.status_code == 201
+
+
+@pytest.fixture
+def archived(app, client):
+    """Invoices from December to March, with everything before February archived"""
+    add_invoice(client, 'dec', '2025-12-20T10:00:00Z')
+    add_invoice(client, 'jan-1', '2026-01-02T10:00:00Z')
+    add_invoice(client, 'jan-2', '2026-01-30T22:00:00Z')
+    add_invoice(client, 'other-jan', '2026-01-15T10:00:00Z', outlet_id='other')
+    add_invoice(client, 'feb', '2026-02-10T10:00:00Z')
+    add_invoice(client, 'mar', '2026-03-05T10:00:00Z')
+
+    # Retention of 3 months in May: January and older go. The test app has one
+    # connection, so the session gives it up first
+    db.session.remove()
+    assert archive_invoices(db.engine, 3, now=datetime(2026, 5, 15)) == {'moved': 4}
+    return client
+
+
+def invoice_ids(client, query_string='', outlet_id='default'):
+    response = client.get(f'/api/invoices{query_string}', headers={'X-Outlet-Id': outlet_id})
+    assert response.status_code == 200
+    return [invoice['id'] for invoice in response.json]
+
+
+@pytest.mark.parametrize('app_config', [MULTI_OUTLET], indirect=True)
+def test_archived_months_leave_the_live_table(archived):
+    with db.engine.connect() as conn:
+        archive = conn.execute(sa.text(f'SELECT id FROM {ARCHIVE_TABLE} ORDER BY timestamp')).scalars().all()
+    assert archive == ['dec', 'jan-1', 'other-jan', 'jan-2']
+    # Without a range only live invoices are listed
+    assert invoice_ids(archived) == ['feb', 'mar']
+
+
+@pytest.mark.parametrize('app_config', [MULTI_OUTLET], indirect=True)
+def test_ranges_include_archived_invoices(archived):
+    assert invoice_ids(archived, '?from=2026-01-01T00:00:00Z&to=2026-03-01T00:00:00Z') == ['jan-1', 'jan-2', 'feb']
+    assert invoice_ids(archived, '?from=2025-01-01T00:00:00Z') == ['dec', 'jan-1', 'jan-2', 'feb', 'mar']
+    assert invoice_ids(archived, '?from=2026-01-01T00:00:00Z&to=2026-02-01T00:00:00Z', 'other') == ['other-jan']
+
+    # Requests share the test's app context, so g holds the last request's outlet
+    g.outlet_id = 'default'
+    invoices = invoices_between(datetime(2026, 1, 30), datetime(2026, 2, 11))
+    assert [(invoice.id, invoice.total) for invoice in invoices] == [('jan-2', 5), ('feb', 5)]
+
+
+@pytest.mark.parametrize('app_config', [MULTI_OUTLET], indirect=True)
+def test_archived_invoices_are_found_by_id(archived):
+    g.outlet_id = 'default'  # see test_ranges_include_archived_invoices
+    invoice = find_invoice('jan-1')
+    assert (invoice.bill_number, invoice.timestamp) == ('jan-1', datetime(2026, 1, 2, 10))
+    assert find_invoice('feb').id == 'feb'
+    # Another outlet's archived invoice
+    assert find_invoice('other-jan') is None
+
+    receipt = archived.get('/api/invoices/jan-2/receipt?format=escpos', headers={'X-Outlet-Id': 'default'})
+    assert receipt.status_code == 200
+    assert archived.get('/api/invoices/missing/receipt', headers={'X-Outlet-Id': 'default'}).status_code == 404
+
+
+def test_archiving_again_moves_nothing(app, client):
+    add_invoice(client, 'jan', '2026-01-02T10:00:00Z')
+    db.session.remove()
+    assert archive_invoices(db.engine, 3, now=datetime(2026, 5, 15)) == {'moved': 1}
+    assert archive_invoices(db.engine, 3, now=datetime(2026, 5, 15)) == {'moved': 0}
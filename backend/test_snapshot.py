@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from snapshot import restore, snapshot
+from sync import format_watermark
+
+
+def sqlite_url(tmp_path, name):
+    return f'sqlite:///{tmp_path / name}'
+
+
+def server_client(url, outlet_id='default'):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': url, 'MULTI_OUTLET_ENABLED': True})
+    client = app.test_client()
+    client.environ_base['HTTP_X_OUTLET_ID'] = outlet_id
+    return client
+
+
+def populate(client, name):
+    """Tables, an order sent to the kitchen, configs, an invoice and a deletion"""
+    for table_id in ('t1', 't2'):
+        assert client.post('/api/tables', json={'id': table_id, 'name': f'{name} {table_id}',
+                                                'seats': 4, 'category': 'Main'}).status_code == 201
+    client.post('/api/orders/table/t1', json={'table_name': f'{name} t1', 'items': [
+        {'id': 'soup', 'name': f'{name} soup', 'price': 5, 'quantity': 2, 'department': 'Kitchen'}
+    ]})
+    client.post('/api/orders/table/t1/sent')
+    client.put('/api/config/kot', json={'printByDepartment': True, 'numberOfCopies': 2})
+    client.put('/api/restaurant-settings', json={'restaurantName': name, 'taxRate': 5})
+    assert client.post('/api/invoices', json={
+        'id': f'{name}-1', 'billNumber': '1', 'orderType': 'takeaway', 'timestamp': '2026-01-05T12:00:00Z',
+        'items': [{'id': 'soup', 'quantity': 1, 'price': 5}], 'subtotal': 5, 'tax': 0, 'total': 5
+    }).status_code == 201
+    assert client.delete('/api/tables/t2').status_code == 200
+
+
+def outlet_state(client):
+    recent = format_watermark(datetime.utcnow() - timedelta(hours=1))
+    return {
+        'tables': [(table['id'], table['name'], table['status']) for table in client.get('/api/tables').json],
+        'orders': [(order['tableId'], order['items']) for order in client.get('/api/orders').json],
+        'kitchen': [(item['tableId'], item['name'], item['quantity'])
+                    for item in client.get('/api/kitchen/queue?department=Kitchen').json['items']],
+        'kot': client.get('/api/config/kot').json['numberOfCopies'],
+        'settings': client.get('/api/restaurant-settings').json['restaurantName'],
+        'invoices': [invoice['id'] for invoice in client.get('/api/invoices').json],
+        'deleted': client.get(f'/api/sync?since={recent}').json['deleted']['tables'],
+    }
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    url = sqlite_url(tmp_path, 'source.db')
+    client = server_client(url)
+    populate(client, 'Source')
+    monkeypatch.setenv('DATABASE_URL', url)
+    path = tmp_path / 'default.zip'
+    snapshot(str(path), 'default')
+    return client, path
+
+
+def test_restore_on_the_same_server(source):
+    client, path = source
+    before = outlet_state(client)
+    assert before['kitchen'] and before['orders'] and before['deleted'] == ['t2']
+    client.post('/api/tables', json={'id': 't9', 'name': 'After snapshot', 'seats': 2, 'category': 'Main'})
+
+    manifest = restore(str(path))
+
+    assert manifest['outlet'] == 'default'
+    assert outlet_state(server_client(client.application.config['SQLALCHEMY_DATABASE_URI'])) == before
+
+
+def test_restore_on_a_server_holding_another_outlet(source, tmp_path, monkeypatch):
+    client, path = source
+    before = outlet_state(client)
+
+    # The other server's outlet has rows with the same serial ids (orders, configs, ...)
+    target_url = sqlite_url(tmp_path, 'target.db')
+    other = server_client(target_url, 'other')
+    populate(other, 'Other')
+    other_before = outlet_state(other)
+
+    monkeypatch.setenv('DATABASE_URL', target_url)
+    restore(str(path))
+
+    assert outlet_state(server_client(target_url, 'default')) == before
+    assert outlet_state(server_client(target_url, 'other')) == other_before
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import event, text
+
+from app import create_app
+from models import db
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "pos.db"}', 'SQLITE_BUSY_TIMEOUT_MS': 1234})
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_connections_get_the_pragmas(file_app):
+    with file_app.app_context():
+        pragmas = {name: db.session.execute(text(f'PRAGMA {name}')).scalar()
+                   for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size',
+                                'temp_store', 'foreign_keys')}
+        db.session.remove()
+
+    assert pragmas == {
+        'journal_mode': 'wal',
+        'synchronous': 1,  # NORMAL
+        'busy_timeout': 1234,
+        'cache_size': -65536,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 2,  # MEMORY
+        'foreign_keys': 1,
+    }
+
+
+def test_reads_begin_deferred_and_writes_immediate(file_app):
+    begins = []
+    with file_app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('BEGIN'):
+            begins.append(statement)
+
+    client = file_app.test_client()
+    assert client.get('/api/menu-items').status_code == 200
+    assert set(begins) == {'BEGIN'}
+
+    begins.clear()
+    assert client.post('/api/tables', json={'id': 't1', 'name': 'T1', 'seats': 4, 'category': 'Main'}).status_code == 201
+    assert set(begins) == {'BEGIN IMMEDIATE'}
+
+    # Background work (no request) writes too
+    begins.clear()
+    with file_app.app_context():
+        db.session.execute(text('SELECT 1'))
+        db.session.remove()
+    assert begins == ['BEGIN IMMEDIATE']
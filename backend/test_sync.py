@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from models import Table, Tombstone, db
+from sync import format_watermark
+
+
+def add_table(client, table_id):
+    response = client.post('/api/tables', json={'id': table_id, 'name': table_id.upper(), 'seats': 4, 'category': 'Main'})
+    assert response.status_code == 201
+
+
+def set_updated_at(table_id, value):
+    db.session.execute(update(Table).where(Table.id == table_id).values(updated_at=value))
+    db.session.commit()
+
+
+def sync(client, since=None):
+    response = client.get('/api/sync', query_string={'since': format_watermark(since)} if since else None)
+    assert response.status_code == 200
+    return response.json
+
+
+def test_rows_are_read_from_before_the_watermark(client):
+    since = datetime.utcnow() - timedelta(minutes=1)
+    for table_id in ('late', 'old', 'new'):
+        add_table(client, table_id)
+    # Committed after the previous sync, but stamped before it: inside the 5 s overlap
+    set_updated_at('late', since - timedelta(seconds=3))
+    set_updated_at('old', since - timedelta(seconds=10))
+
+    feed = sync(client, since)
+
+    assert feed['full'] is False
+    assert sorted(table['id'] for table in feed['changes']['tables']) == ['late', 'new']
+    assert datetime.fromisoformat(feed['watermark'].rstrip('Z')) > since
+    # Unchanged singletons are reported as null
+    assert feed['changes']['kotConfig'] is None
+
+    # The next sync repeats only the rows still inside the overlap
+    watermark = datetime.fromisoformat(feed['watermark'].rstrip('Z'))
+    assert [table['id'] for table in sync(client, watermark)['changes']['tables']] == ['new']
+
+
+def test_deletes_leave_tombstones(client):
+    since = datetime.utcnow() - timedelta(minutes=1)
+    for table_id in ('t1', 't2', 't3'):
+        add_table(client, table_id)
+    assert client.delete('/api/tables/t1').status_code == 200
+    # Deletes outside the API are recorded too (before_flush listener)
+    db.session.delete(db.session.get(Table, ('default', 't2')))
+    db.session.commit()
+
+    assert sorted((tombstone.entity, tombstone.entity_id) for tombstone in Tombstone.query) == [
+        ('tables', 't1'), ('tables', 't2')
+    ]
+    feed = sync(client, since)
+    assert feed['deleted']['tables'] == ['t1', 't2']
+    assert [table['id'] for table in feed['changes']['tables']] == ['t3']
+
+    # Deleted and created again: reported as a change, not a delete
+    add_table(client, 't1')
+    feed = sync(client, since)
+    assert feed['deleted']['tables'] == ['t2']
+    assert sorted(table['id'] for table in feed['changes']['tables']) == ['t1', 't3']
+
+
+@pytest.mark.parametrize('app_config', [{'SYNC_PURGE_INTERVAL_SECONDS': 0}], indirect=True)
+def test_watermark_past_retention_gets_a_full_snapshot(client):
+    add_table(client, 't1')
+    add_table(client, 't2')
+    set_updated_at('t1', datetime.utcnow() - timedelta(days=90))
+    assert client.delete('/api/tables/t2').status_code == 200
+    db.session.add(Tombstone(entity='tables', entity_id='gone', deleted_at=datetime.utcnow() - timedelta(days=31)))
+    db.session.commit()
+
+    feed = sync(client, datetime.utcnow() - timedelta(days=31))
+
+    assert feed['full'] is True
+    assert [table['id'] for table in feed['changes']['tables']] == ['t1']
+    assert feed['deleted']['tables'] == []
+    assert sync(client)['full'] is True
+    # Tombstones past retention are purged, newer ones kept
+    assert [tombstone.entity_id for tombstone in Tombstone.query] == ['t2']
+
+
+def test_invalid_watermark(client):
+    assert client.get('/api/sync?since=yesterday').status_code == 400
@@ -0,0 +1,81 @@
+"""Throwaway app instances for tests, tooling and benchmarks.
+
+Each app gets its own in-memory SQLite database, copied from a schema built once
+per process, so creating one needs no server and no schema setup::
+
+    from testing import app_client
+
+    with app_client() as client:
+        client.post('/api/tables', json={'id': '1', 'name': 'T1', 'seats': 4, 'category': 'Main'})
+        assert client.get('/api/tables').json[0]['status'] == 'available'
+
+With pytest, the same helpers make per-test fixtures::
+
+    @pytest.fixture
+    def client():
+        with app_client() as client:
+            yield client
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from sqlalchemy.pool import StaticPool
+
+from app import create_app
+from floor_state import floor_state
+from models import db
+
+TEST_CONFIG = {
+    'TESTING': True,
+    'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+    'DATABASE_CONNECT_RETRIES': 1,
+}
+
+_schema_lock = threading.Lock()
+_schema = None  # in-memory database holding the empty schema
+
+
+def memory_engine():
+    """Engine on a new in-memory SQLite database with the schema already created.
+
+    The schema is created once and copied with SQLite's backup API, which is much
+    cheaper than running ``create_all`` for every database.
+    """
+    global _schema
+    with _schema_lock:
+        if _schema is None:
+            _schema = sqlite3.connect(':memory:', check_same_thread=False)
+            db.metadata.create_all(sa.create_engine('sqlite://', creator=lambda: _schema, poolclass=StaticPool))
+        connection = sqlite3.connect(':memory:', check_same_thread=False)
+        _schema.backup(connection)
+    return sa.create_engine('sqlite://', creator=lambda: connection, poolclass=StaticPool)
+
+
+def create_test_app(config=None, engine=None):
+    """App on a fresh in-memory SQLite database, or on ``engine`` (schema created)"""
+    if engine is None:
+        return create_app(dict(TEST_CONFIG, CREATE_SCHEMA=False, **(config or {})), engine=memory_engine())
+    return create_app(dict(TEST_CONFIG, **(config or {})), engine=engine)
+
+
+@contextmanager
+def app_context(config=None, engine=None):
+    """Push an app context on a test app, disposing its engines afterwards"""
+    app = create_test_app(config, engine)
+    with app.app_context():
+        try:
+            yield app
+        finally:
+            floor_state.flush(app)
+            db.session.remove()
+            if engine is None:
+                db.engine.dispose()
+
+
+@contextmanager
+def app_client(config=None, engine=None):
+    """Test client of a fresh test app"""
+    with app_context(config, engine) as app:
+        yield app.test_client()
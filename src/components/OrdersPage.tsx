@@ -7,22 +7,27 @@ import { Dialog, DialogContent, DialogDescription, DialogHeader, DialogTitle } f
 import { Plus, Minus, ShoppingCart, Trash2, Printer, Clock } from "lucide-react";
 import { ScrollArea } from "./ui/scroll-area";
 import { useRestaurant, type OrderItem } from "../contexts/RestaurantContext";
-
-// Mock data - In real app, this would come from a shared state/database
-const menuItems = [
-  { id: "1", name: "Classic Burger", price: 259, category: "Mains", department: "Kitchen", description: "Beef patty with lettuce, tomato, cheese" },
-  { id: "2", name: "Caesar Salad", price: 199, category: "Salads", department: "Kitchen", description: "Romaine lettuce, croutons, parmesan" },
-  { id: "3", name: "Margherita Pizza", price: 299, category: "Mains", department: "Kitchen", description: "Fresh mozzarella, basil, tomato sauce" },
-  { id: "4", name: "Fish & Chips", price: 319, category: "Mains", department: "Kitchen", description: "Beer-battered fish with crispy fries" },
-  { id: "5", name: "Greek Salad", price: 219, category: "Salads", department: "Kitchen", description: "Feta, olives, cucumber, tomatoes" },
-  { id: "6", name: "Pasta Carbonara", price: 279, category: "Mains", department: "Kitchen", description: "Creamy sauce with bacon and parmesan" },
-  { id: "7", name: "Coca Cola", price: 59, category: "Beverages", department: "Bar", description: "330ml can" },
-  { id: "8", name: "Fresh Orange Juice", price: 99, category: "Beverages", department: "Bar", description: "Freshly squeezed" },
-  { id: "9", name: "Chocolate Cake", price: 139, category: "Desserts", department: "Kitchen", description: "Rich chocolate layer cake" },
-  { id: "10", name: "Ice Cream Sundae", price: 119, category: "Desserts", department: "Kitchen", description: "Vanilla ice cream with toppings" },
-];
-
-const categories = ["All", "Mains", "Salads", "Beverages", "Desserts"];
+import * as api from "../services/api";
+
+type TaxLine = { rate: number; taxable: number; tax: number };
+
+interface Bill {
+  billNumber: string;
+  timestamp: Date;
+  tableName?: string;
+  items: { name: string; quantity: number; price: number; amount?: number }[];
+  subtotal: number;
+  tax: number;
+  total: number;
+  taxes?: TaxLine[];
+}
+
+// One line per tax rate when the order spans several (per-category rates)
+const taxLabels = (taxes: TaxLine[] | undefined, tax: number) => {
+  if (!taxes || taxes.length === 0) return [{ label: "GST", tax }];
+  if (taxes.length === 1) return [{ label: `GST (${taxes[0].rate}%)`, tax: taxes[0].tax }];
+  return taxes.map(entry => ({ label: `GST ${entry.rate}% on ₹${entry.taxable.toFixed(2)}`, tax: entry.tax }));
+};
 
 export function OrdersPage() {
   const { tables, addItemsToTable, getTableOrder, completeTableOrder, markItemsAsSent, addInvoice, kotConfig, billConfig } = useRestaurant();
@@ -32,6 +37,22 @@ export function OrdersPage() {
   const [selectedTable, setSelectedTable] = useState<string>("");
   const [currentOrder, setCurrentOrder] = useState<OrderItem[]>([]);
   const [showBillDialog, setShowBillDialog] = useState(false);
+  const [billError, setBillError] = useState<string | null>(null);
+  const [menuItems, setMenuItems] = useState<api.MenuItem[]>([]);
+  const [fallbackTaxRate, setFallbackTaxRate] = useState(5);
+  const [quote, setQuote] = useState<{ key: string; result: api.PriceQuote } | null>(null);
+
+  // Menu from the server; the restaurant tax rate is only used while the server cannot quote
+  useEffect(() => {
+    api.getMenuItems()
+      .then(setMenuItems)
+      .catch(error => console.error("Error loading menu:", error));
+    api.getRestaurantSettings()
+      .then(settings => setFallbackTaxRate(settings.taxRate))
+      .catch(error => console.error("Error loading restaurant settings:", error));
+  }, []);
+
+  const categories = ["All", ...Array.from(new Set(menuItems.map(item => item.category)))];
 
   const filteredItems = selectedCategory === "All" 
     ? menuItems 
@@ -63,7 +84,7 @@ export function OrdersPage() {
     setSelectedTable(tableId);
   };
 
-  const addToOrder = (item: typeof menuItems[0]) => {
+  const addToOrder = (item: api.MenuItem) => {
     setCurrentOrder(prev => {
       const existingItem = prev.find(orderItem => orderItem.id === item.id && !orderItem.sentToKitchen);
       if (existingItem) {
@@ -110,9 +131,35 @@ export function OrdersPage() {
     return Array.from(itemMap.values());
   };
 
-  const subtotal = getAllItems().reduce((sum, item) => sum + item.price * item.quantity, 0);
-  const tax = subtotal * 0.05; // 5% GST
-  const total = subtotal + tax;
+  // Prices, taxes and totals come from the server, as the invoice is billed
+  const quoteLines = getAllItems().map(item => ({ id: item.id, quantity: item.quantity }));
+  const quoteKey = JSON.stringify(quoteLines);
+  useEffect(() => {
+    if (quoteLines.length === 0) {
+      setQuote(null);
+      return;
+    }
+    let cancelled = false;
+    api.getPriceQuote(quoteLines)
+      .then(result => {
+        if (!cancelled) setQuote({ key: quoteKey, result });
+      })
+      .catch(error => {
+        console.error("Error pricing order:", error);
+        if (!cancelled) setQuote(null);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [quoteKey]);
+
+  const currentQuote = quote && quote.key === quoteKey ? quote.result : null;
+  const localSubtotal = getAllItems().reduce((sum, item) => sum + item.price * item.quantity, 0);
+  const subtotal = currentQuote ? currentQuote.subtotal : localSubtotal;
+  const tax = currentQuote ? currentQuote.tax : localSubtotal * fallbackTaxRate / 100;
+  const total = currentQuote ? currentQuote.total : subtotal + tax;
+  const taxes = currentQuote ? currentQuote.taxes : [{ rate: fallbackTaxRate, taxable: localSubtotal, tax }];
+  const billItems = currentQuote ? currentQuote.items : getAllItems();
 
   const clearOrder = () => {
     setCurrentOrder([]);
@@ -254,10 +301,20 @@ export function OrdersPage() {
     `;
   };
 
-  const generateBillContent = () => {
-    const now = new Date();
-    const billNumber = `BILL-${Date.now()}`;
-    const allItems = getAllItems();
+  // The bill for the current order, as quoted; invoices are printed from the saved copy instead
+  const currentBill = (): Bill => ({
+    billNumber: `BILL-${Date.now()}`,
+    timestamp: new Date(),
+    tableName: orderType === "dine-in" ? selectedTableData?.name : undefined,
+    items: billItems,
+    subtotal,
+    tax,
+    total,
+    taxes,
+  });
+
+  const generateBillContent = (bill: Bill) => {
+    const billNumber = bill.billNumber;
     
     return `
       <!DOCTYPE html>
@@ -294,25 +351,25 @@ export function OrdersPage() {
         </div>
         <div class="info">
           <div class="info-row"><span>Bill No:</span><span>${billNumber}</span></div>
-          <div class="info-row"><span>Date:</span><span>${now.toLocaleDateString()} ${now.toLocaleTimeString()}</span></div>
+          <div class="info-row"><span>Date:</span><span>${bill.timestamp.toLocaleDateString()} ${bill.timestamp.toLocaleTimeString()}</span></div>
           <div class="info-row"><span>Type:</span><span>${orderType?.toUpperCase()}</span></div>
-          ${orderType === 'dine-in' && selectedTableData ? `<div class="info-row"><span>Table:</span><span>${selectedTableData.name}</span></div>` : ''}
+          ${bill.tableName ? `<div class="info-row"><span>Table:</span><span>${bill.tableName}</span></div>` : ''}
         </div>
         <div class="items">
-          ${allItems.map(item => `
+          ${bill.items.map(item => `
             <div class="item-row">
               <div style="flex: 2;">
                 <div>${item.name}</div>
                 <div style="font-size: 10px;">${item.quantity} x ₹${item.price.toFixed(2)}</div>
               </div>
-              <div style="text-align: right;">₹${(item.quantity * item.price).toFixed(2)}</div>
+              <div style="text-align: right;">₹${(item.amount ?? item.quantity * item.price).toFixed(2)}</div>
             </div>
           `).join('')}
         </div>
         <div class="totals">
-          <div class="total-row"><span>Subtotal:</span><span>₹${subtotal.toFixed(2)}</span></div>
-          <div class="total-row"><span>GST (5%):</span><span>₹${tax.toFixed(2)}</span></div>
-          <div class="total-row grand-total"><span>TOTAL:</span><span>₹${total.toFixed(2)}</span></div>
+          <div class="total-row"><span>Subtotal:</span><span>₹${bill.subtotal.toFixed(2)}</span></div>
+          ${taxLabels(bill.taxes, bill.tax).map(line => `<div class="total-row"><span>${line.label}:</span><span>₹${line.tax.toFixed(2)}</span></div>`).join('')}
+          <div class="total-row grand-total"><span>TOTAL:</span><span>₹${bill.total.toFixed(2)}</span></div>
         </div>
         <div class="footer">
           <div>Thank you for dining with us!</div>
@@ -323,11 +380,12 @@ export function OrdersPage() {
     `;
   };
 
-  const printBill = () => {
-    const billWindow = window.open('', '', 'width=300,height=600');
+  const openBillWindow = () => window.open('', '', 'width=300,height=600');
+
+  const printBill = (bill: Bill, billWindow = openBillWindow()) => {
     if (!billWindow) return;
 
-    const billContent = generateBillContent();
+    const billContent = generateBillContent(bill);
     billWindow.document.write(billContent);
     billWindow.document.close();
     billWindow.print();
@@ -353,8 +411,9 @@ export function OrdersPage() {
 
       // Auto-print bill if enabled
       if (billConfig.autoPrintDineIn) {
+        const bill = currentBill();
         setTimeout(() => {
-          printBill();
+          printBill(bill);
         }, 1000);
       }
     } else if (orderType === "takeaway") {
@@ -364,20 +423,7 @@ export function OrdersPage() {
       // Auto-print bill or show dialog
       if (billConfig.autoPrintTakeaway) {
         setTimeout(() => {
-          printBill();
-          // Create invoice
-          const invoice = {
-            id: Date.now().toString(),
-            billNumber: `BILL-${Date.now()}`,
-            orderType: "takeaway" as const,
-            items: getAllItems(),
-            subtotal,
-            tax,
-            total,
-            timestamp: new Date(),
-          };
-          addInvoice(invoice);
-          clearOrder();
+          completeBill(true);
         }, 1000);
       } else {
         setTimeout(() => {
@@ -387,21 +433,37 @@ export function OrdersPage() {
     }
   };
 
-  const completeBill = async () => {
-    // Create invoice
+  const completeBill = async (print = false) => {
+    // Opened before saving, while still handling the click, so it is not blocked as a pop-up
+    const billWindow = print ? openBillWindow() : null;
+    setBillError(null);
+
+    // Create invoice; with server pricing on, the saved invoice carries the billed prices and totals
     const invoice = {
       id: Date.now().toString(),
       billNumber: `BILL-${Date.now()}`,
       orderType: orderType!,
       tableName: orderType === "dine-in" ? selectedTableData?.name : undefined,
-      items: getAllItems(),
+      items: billItems,
       subtotal,
       tax,
       total,
       timestamp: new Date(),
     };
-    await addInvoice(invoice);
+    let saved;
+    try {
+      saved = await addInvoice(invoice);
+    } catch (error) {
+      // Keep the order so the bill can be retried; nothing was stored
+      billWindow?.close();
+      setBillError(error instanceof Error ? error.message : "Failed to save the bill");
+      setShowBillDialog(true);
+      return;
+    }
 
+    if (billWindow) {
+      printBill({ ...saved, taxes: saved.taxes ?? taxes }, billWindow);
+    }
     if (orderType === "dine-in" && selectedTable) {
       await completeTableOrder(selectedTable);
     }
@@ -649,15 +711,20 @@ export function OrdersPage() {
               <span>Subtotal</span>
               <span>₹{subtotal.toFixed(2)}</span>
             </div>
-            <div className="flex justify-between text-muted-foreground">
-              <span>GST (5%)</span>
-              <span>₹{tax.toFixed(2)}</span>
-            </div>
+            {taxLabels(taxes, tax).map(line => (
+              <div key={line.label} className="flex justify-between text-muted-foreground">
+                <span>{line.label}</span>
+                <span>₹{line.tax.toFixed(2)}</span>
+              </div>
+            ))}
             <Separator />
             <div className="flex justify-between">
               <span>Total</span>
               <span className="text-purple-600">₹{total.toFixed(2)}</span>
             </div>
+            {currentOrder.length > 0 && !currentQuote && (
+              <p className="text-sm text-muted-foreground">Estimated: waiting for server prices</p>
+            )}
           </div>
 
           <div className="space-y-2">
@@ -699,19 +766,19 @@ export function OrdersPage() {
                 <span className="text-purple-600">₹{total.toFixed(2)}</span>
               </div>
             </div>
+            {billError && (
+              <p className="text-sm text-red-600 mb-4">The bill was not saved: {billError}</p>
+            )}
             <div className="flex gap-2">
               <Button
-                onClick={() => {
-                  printBill();
-                  completeBill();
-                }}
+                onClick={() => completeBill(true)}
                 className="flex-1 bg-gradient-to-r from-purple-600 to-pink-600 hover:from-purple-700 hover:to-pink-700"
               >
                 <Printer className="size-4 mr-2" />
                 Print Bill
               </Button>
               <Button
-                onClick={completeBill}
+                onClick={() => completeBill()}
                 variant="outline"
                 className="flex-1"
               >
@@ -36,6 +36,7 @@ export interface Invoice {
   tax: number;
   total: number;
   timestamp: Date;
+  taxes?: { rate: number; taxable: number; tax: number }[];
 }
 
 export interface KOTConfig {
@@ -59,7 +60,7 @@ interface RestaurantContextType {
   completeTableOrder: (tableId: string) => Promise<void>;
   markItemsAsSent: (tableId: string) => Promise<void>;
   invoices: Invoice[];
-  addInvoice: (invoice: Invoice) => Promise<void>;
+  addInvoice: (invoice: Invoice) => Promise<Invoice>;
   kotConfig: KOTConfig;
   updateKotConfig: (config: KOTConfig) => Promise<void>;
   billConfig: BillConfig;
@@ -205,9 +206,13 @@ export function RestaurantProvider({ children }: { children: ReactNode }) {
         timestamp: invoice.timestamp.toISOString()
       });
       
-      setInvoices(prev => [newInvoice, ...prev]);
+      const savedInvoice = { ...newInvoice, timestamp: new Date(newInvoice.timestamp) };
+      setInvoices(prev => [savedInvoice, ...prev]);
+      return savedInvoice;
     } catch (error) {
       console.error("Error adding invoice:", error);
+      // The sale was not stored: let the caller keep the order and show the error
+      throw error;
     }
   };
 
@@ -1,6 +1,43 @@
 // Use dynamic API URL - works in both Docker and local development
 const API_BASE_URL = `http://${window.location.hostname}:5000/api`;
 
+// After a write the backend returns X-Primary-Until; echoing it back until then makes reads
+// go to the primary database, so they see the write even while read replicas lag behind
+const PRIMARY_UNTIL_HEADER = 'X-Primary-Until';
+let primaryUntil = 0;
+
+const apiFetch = async (url: string, init: RequestInit = {}): Promise<Response> => {
+  const headers = new Headers(init.headers);
+  if (primaryUntil > Date.now() / 1000) {
+    headers.set(PRIMARY_UNTIL_HEADER, String(primaryUntil));
+  }
+  const response = await fetch(url, { ...init, headers });
+  const pinned = Number(response.headers.get(PRIMARY_UNTIL_HEADER));
+  if (pinned > primaryUntil) {
+    primaryUntil = pinned;
+  }
+  return response;
+};
+
+// Send a mutating request with an Idempotency-Key, retrying on network failure.
+// The backend replays the stored response for a repeated key, so retries never apply twice.
+const idempotentFetch = async (url: string, init: RequestInit, retries = 3): Promise<Response> => {
+  const headers = { ...(init.headers as Record<string, string>), 'Idempotency-Key': crypto.randomUUID() };
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const response = await apiFetch(url, { ...init, headers });
+      if (response.status !== 409 || attempt >= retries) {
+        return response;
+      }
+    } catch (error) {
+      if (attempt >= retries) {
+        throw error;
+      }
+    }
+    await new Promise((resolve) => setTimeout(resolve, 250 * 2 ** attempt));
+  }
+};
+
 export interface Table {
   id: string;
   name: string;
@@ -36,6 +73,7 @@ export interface Invoice {
   tax: number;
   total: number;
   timestamp: string;
+  taxes?: { rate: number; taxable: number; tax: number }[]; // returned when the server priced the invoice
 }
 
 export interface KOTConfig {
@@ -52,12 +90,12 @@ export interface BillConfig {
 
 // Table API
 export const getTables = async (): Promise<Table[]> => {
-  const response = await fetch(`${API_BASE_URL}/tables`);
+  const response = await apiFetch(`${API_BASE_URL}/tables`);
   return response.json();
 };
 
 export const createTable = async (table: Omit<Table, 'id'>): Promise<Table> => {
-  const response = await fetch(`${API_BASE_URL}/tables`, {
+  const response = await apiFetch(`${API_BASE_URL}/tables`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -73,7 +111,7 @@ export const createTable = async (table: Omit<Table, 'id'>): Promise<Table> => {
 };
 
 export const updateTable = async (tableId: string, table: Partial<Table>): Promise<Table> => {
-  const response = await fetch(`${API_BASE_URL}/tables/${tableId}`, {
+  const response = await apiFetch(`${API_BASE_URL}/tables/${tableId}`, {
     method: 'PUT',
     headers: {
       'Content-Type': 'application/json',
@@ -83,20 +121,32 @@ export const updateTable = async (tableId: string, table: Partial<Table>): Promi
   return response.json();
 };
 
+// Create or update many tables at once (tables with an existing id are updated)
+export const saveTables = async (tables: Partial<Table>[]): Promise<Table[]> => {
+  const response = await apiFetch(`${API_BASE_URL}/tables/bulk`, {
+    method: 'PUT',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(tables),
+  });
+  return response.json();
+};
+
 export const deleteTable = async (tableId: string): Promise<void> => {
-  await fetch(`${API_BASE_URL}/tables/${tableId}`, {
+  await apiFetch(`${API_BASE_URL}/tables/${tableId}`, {
     method: 'DELETE',
   });
 };
 
 // Order API
 export const getTableOrder = async (tableId: string): Promise<TableOrder | null> => {
-  const response = await fetch(`${API_BASE_URL}/orders/table/${tableId}`);
+  const response = await apiFetch(`${API_BASE_URL}/orders/table/${tableId}`);
   return response.json();
 };
 
 export const addItemsToTable = async (tableId: string, tableName: string, items: OrderItem[]): Promise<TableOrder> => {
-  const response = await fetch(`${API_BASE_URL}/orders/table/${tableId}`, {
+  const response = await idempotentFetch(`${API_BASE_URL}/orders/table/${tableId}`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -110,26 +160,54 @@ export const addItemsToTable = async (tableId: string, tableName: string, items:
 };
 
 export const markItemsAsSent = async (tableId: string): Promise<TableOrder> => {
-  const response = await fetch(`${API_BASE_URL}/orders/table/${tableId}/sent`, {
+  const response = await apiFetch(`${API_BASE_URL}/orders/table/${tableId}/sent`, {
     method: 'POST',
   });
   return response.json();
 };
 
 export const completeTableOrder = async (tableId: string): Promise<void> => {
-  await fetch(`${API_BASE_URL}/orders/table/${tableId}/complete`, {
+  await apiFetch(`${API_BASE_URL}/orders/table/${tableId}/complete`, {
     method: 'POST',
   });
 };
 
+export interface OrderMoveResult {
+  source: TableOrder | null;
+  target: TableOrder | null;
+}
+
+const moveTableOrder = async (tableId: string, operation: string, body: object): Promise<OrderMoveResult> => {
+  const response = await idempotentFetch(`${API_BASE_URL}/orders/table/${tableId}/${operation}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(body),
+  });
+  return response.json();
+};
+
+// Move the whole order to an empty table
+export const transferTableOrder = (tableId: string, targetTableId: string) =>
+  moveTableOrder(tableId, 'transfer', { targetTableId });
+
+// Merge the order into the target table's order
+export const mergeTableOrders = (tableId: string, targetTableId: string) =>
+  moveTableOrder(tableId, 'merge', { targetTableId });
+
+// Move order lines (by index, optionally part of their quantity) to another table
+export const splitTableOrder = (tableId: string, targetTableId: string, lines: { index: number; quantity?: number }[]) =>
+  moveTableOrder(tableId, 'split', { targetTableId, lines });
+
 // Invoice API
 export const getInvoices = async (): Promise<Invoice[]> => {
-  const response = await fetch(`${API_BASE_URL}/invoices`);
+  const response = await apiFetch(`${API_BASE_URL}/invoices`);
   return response.json();
 };
 
 export const addInvoice = async (invoice: Omit<Invoice, 'id'>): Promise<Invoice> => {
-  const response = await fetch(`${API_BASE_URL}/invoices`, {
+  const response = await idempotentFetch(`${API_BASE_URL}/invoices`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -145,17 +223,21 @@ export const addInvoice = async (invoice: Omit<Invoice, 'id'>): Promise<Invoice>
       timestamp: invoice.timestamp,
     }),
   });
+  if (!response.ok) {
+    // e.g. 400 for items the server cannot price; the invoice was not saved
+    throw new Error((await response.json()).error || `Failed to save invoice (${response.status})`);
+  }
   return response.json();
 };
 
 // Config API
 export const getKOTConfig = async (): Promise<KOTConfig> => {
-  const response = await fetch(`${API_BASE_URL}/config/kot`);
+  const response = await apiFetch(`${API_BASE_URL}/config/kot`);
   return response.json();
 };
 
 export const updateKOTConfig = async (config: KOTConfig): Promise<KOTConfig> => {
-  const response = await fetch(`${API_BASE_URL}/config/kot`, {
+  const response = await apiFetch(`${API_BASE_URL}/config/kot`, {
     method: 'PUT',
     headers: {
       'Content-Type': 'application/json',
@@ -170,12 +252,12 @@ export const updateKOTConfig = async (config: KOTConfig): Promise<KOTConfig> =>
 };
 
 export const getBillConfig = async (): Promise<BillConfig> => {
-  const response = await fetch(`${API_BASE_URL}/config/bill`);
+  const response = await apiFetch(`${API_BASE_URL}/config/bill`);
   return response.json();
 };
 
 export const updateBillConfig = async (config: BillConfig): Promise<BillConfig> => {
-  const response = await fetch(`${API_BASE_URL}/config/bill`, {
+  const response = await apiFetch(`${API_BASE_URL}/config/bill`, {
     method: 'PUT',
     headers: {
       'Content-Type': 'application/json',
@@ -191,7 +273,7 @@ export const updateBillConfig = async (config: BillConfig): Promise<BillConfig>
 
 // Auth API
 export const login = async (email: string, password: string): Promise<boolean> => {
-  const response = await fetch(`${API_BASE_URL}/login`, {
+  const response = await apiFetch(`${API_BASE_URL}/login`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -214,12 +296,12 @@ export interface MenuItem {
 }
 
 export const getMenuItems = async (): Promise<MenuItem[]> => {
-  const response = await fetch(`${API_BASE_URL}/menu-items`);
+  const response = await apiFetch(`${API_BASE_URL}/menu-items`);
   return response.json();
 };
 
 export const createMenuItem = async (item: Omit<MenuItem, 'id'>): Promise<MenuItem> => {
-  const response = await fetch(`${API_BASE_URL}/menu-items`, {
+  const response = await apiFetch(`${API_BASE_URL}/menu-items`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -230,7 +312,7 @@ export const createMenuItem = async (item: Omit<MenuItem, 'id'>): Promise<MenuIt
 };
 
 export const updateMenuItem = async (itemId: string, item: Partial<MenuItem>): Promise<MenuItem> => {
-  const response = await fetch(`${API_BASE_URL}/menu-items/${itemId}`, {
+  const response = await apiFetch(`${API_BASE_URL}/menu-items/${itemId}`, {
     method: 'PUT',
     headers: {
       'Content-Type': 'application/json',
@@ -241,7 +323,7 @@ export const updateMenuItem = async (itemId: string, item: Partial<MenuItem>): P
 };
 
 export const deleteMenuItem = async (itemId: string): Promise<void> => {
-  await fetch(`${API_BASE_URL}/menu-items/${itemId}`, {
+  await apiFetch(`${API_BASE_URL}/menu-items/${itemId}`, {
     method: 'DELETE',
   });
 };
@@ -250,15 +332,16 @@ export const deleteMenuItem = async (itemId: string): Promise<void> => {
 export interface Category {
   id: string;
   name: string;
+  taxRate?: number | null; // overrides the restaurant tax rate for items in the category
 }
 
 export const getCategories = async (): Promise<Category[]> => {
-  const response = await fetch(`${API_BASE_URL}/categories`);
+  const response = await apiFetch(`${API_BASE_URL}/categories`);
   return response.json();
 };
 
 export const createCategory = async (category: Omit<Category, 'id'>): Promise<Category> => {
-  const response = await fetch(`${API_BASE_URL}/categories`, {
+  const response = await apiFetch(`${API_BASE_URL}/categories`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -268,8 +351,19 @@ export const createCategory = async (category: Omit<Category, 'id'>): Promise<Ca
   return response.json();
 };
 
+export const updateCategory = async (categoryId: string, category: Partial<Category>): Promise<Category> => {
+  const response = await apiFetch(`${API_BASE_URL}/categories/${categoryId}`, {
+    method: 'PUT',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(category),
+  });
+  return response.json();
+};
+
 export const deleteCategory = async (categoryId: string): Promise<void> => {
-  await fetch(`${API_BASE_URL}/categories/${categoryId}`, {
+  await apiFetch(`${API_BASE_URL}/categories/${categoryId}`, {
     method: 'DELETE',
   });
 };
@@ -281,12 +375,12 @@ export interface Department {
 }
 
 export const getDepartments = async (): Promise<Department[]> => {
-  const response = await fetch(`${API_BASE_URL}/departments`);
+  const response = await apiFetch(`${API_BASE_URL}/departments`);
   return response.json();
 };
 
 export const createDepartment = async (department: Omit<Department, 'id'>): Promise<Department> => {
-  const response = await fetch(`${API_BASE_URL}/departments`, {
+  const response = await apiFetch(`${API_BASE_URL}/departments`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -297,7 +391,91 @@ export const createDepartment = async (department: Omit<Department, 'id'>): Prom
 };
 
 export const deleteDepartment = async (departmentId: string): Promise<void> => {
-  await fetch(`${API_BASE_URL}/departments/${departmentId}`, {
+  await apiFetch(`${API_BASE_URL}/departments/${departmentId}`, {
+    method: 'DELETE',
+  });
+};
+
+// Pricing API
+export interface PriceRule {
+  id: string;
+  name: string;
+  itemId?: string | null; // one item, or
+  category?: string | null; // every item in a category, or neither for the whole menu
+  kind: 'percent' | 'price'; // percentage off, or a fixed price
+  value: number;
+  days?: number[] | null; // 0 = Monday; null for every day
+  startTime: string; // HH:MM, may be after endTime for windows past midnight
+  endTime: string;
+  active: boolean;
+}
+
+export interface PriceQuoteLine {
+  id: string;
+  name: string;
+  category: string;
+  department: string;
+  quantity: number;
+  price: number;
+  basePrice: number;
+  amount: number;
+  taxRate: number;
+  priceRule: string | null;
+}
+
+export interface PriceQuote {
+  priceListVersion: string;
+  items: PriceQuoteLine[];
+  subtotal: number;
+  tax: number;
+  total: number;
+  taxes: { rate: number; taxable: number; tax: number }[];
+}
+
+// Server-side prices and taxes for order lines; invoices are billed at the same prices
+export const getPriceQuote = async (items: { id: string; quantity: number }[], at?: string): Promise<PriceQuote> => {
+  const response = await apiFetch(`${API_BASE_URL}/pricing/quote`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ items, at }),
+  });
+  if (!response.ok) {
+    throw new Error((await response.json()).error);
+  }
+  return response.json();
+};
+
+export const getPriceRules = async (): Promise<PriceRule[]> => {
+  const response = await apiFetch(`${API_BASE_URL}/price-rules`);
+  return response.json();
+};
+
+export const createPriceRule = async (rule: Omit<PriceRule, 'id'>): Promise<PriceRule> => {
+  const response = await apiFetch(`${API_BASE_URL}/price-rules`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(rule),
+  });
+  return response.json();
+};
+
+export const updatePriceRule = async (ruleId: string, rule: Partial<PriceRule>): Promise<PriceRule> => {
+  const response = await apiFetch(`${API_BASE_URL}/price-rules/${ruleId}`, {
+    method: 'PUT',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(rule),
+  });
+  return response.json();
+};
+
+export const deletePriceRule = async (ruleId: string): Promise<void> => {
+  await apiFetch(`${API_BASE_URL}/price-rules/${ruleId}`, {
     method: 'DELETE',
   });
 };
@@ -314,12 +492,12 @@ export interface RestaurantSettings {
 }
 
 export const getRestaurantSettings = async (): Promise<RestaurantSettings> => {
-  const response = await fetch(`${API_BASE_URL}/restaurant-settings`);
+  const response = await apiFetch(`${API_BASE_URL}/restaurant-settings`);
   return response.json();
 };
 
 export const updateRestaurantSettings = async (settings: Partial<RestaurantSettings>): Promise<RestaurantSettings> => {
-  const response = await fetch(`${API_BASE_URL}/restaurant-settings`, {
+  const response = await apiFetch(`${API_BASE_URL}/restaurant-settings`, {
     method: 'PUT',
     headers: {
       'Content-Type': 'application/json',
@@ -331,12 +509,12 @@ export const updateRestaurantSettings = async (settings: Partial<RestaurantSetti
 
 // Excel Import/Export API
 export const downloadMenuTemplate = async (): Promise<Blob> => {
-  const response = await fetch(`${API_BASE_URL}/menu/export-template`);
+  const response = await apiFetch(`${API_BASE_URL}/menu/export-template`);
   return response.blob();
 };
 
 export const exportMenuData = async (): Promise<Blob> => {
-  const response = await fetch(`${API_BASE_URL}/menu/export`);
+  const response = await apiFetch(`${API_BASE_URL}/menu/export`);
   return response.blob();
 };
 
@@ -344,9 +522,86 @@ export const importMenuData = async (file: File): Promise<{ success: boolean; me
   const formData = new FormData();
   formData.append('file', file);
   
-  const response = await fetch(`${API_BASE_URL}/menu/import`, {
+  const response = await apiFetch(`${API_BASE_URL}/menu/import`, {
     method: 'POST',
     body: formData,
   });
   return response.json();
-};
\ No newline at end of file
+};
+
+// Kitchen display API
+export interface KitchenItem {
+  id: number;
+  department: string;
+  tableId: string;
+  tableName: string;
+  itemId: string;
+  name: string;
+  quantity: number;
+  status: "pending" | "ready" | "served";
+  firedAt: string;
+  readyAt: string | null;
+  servedAt: string | null;
+}
+
+export interface KitchenQueue {
+  department: string;
+  cursor: string;
+  items: KitchenItem[];
+}
+
+// Pass the cursor of the previous response to wait (long-poll) until the queue changes
+export const getKitchenQueue = async (department: string, since?: string): Promise<KitchenQueue> => {
+  const params = new URLSearchParams({ department });
+  if (since !== undefined) {
+    params.set('since', since);
+  }
+  const response = await apiFetch(`${API_BASE_URL}/kitchen/queue?${params}`);
+  return response.json();
+};
+
+export const bumpKitchenItem = async (itemId: number): Promise<KitchenItem> => {
+  const response = await apiFetch(`${API_BASE_URL}/kitchen/items/${itemId}/bump`, {
+    method: 'POST',
+  });
+  return response.json();
+};
+
+export const serveKitchenItem = async (itemId: number): Promise<KitchenItem> => {
+  const response = await apiFetch(`${API_BASE_URL}/kitchen/items/${itemId}/serve`, {
+    method: 'POST',
+  });
+  return response.json();
+};
+
+// Delta sync API
+export interface SyncResponse {
+  watermark: string;
+  full: boolean;
+  changes: {
+    tables: Table[];
+    orders: TableOrder[];
+    menuItems: MenuItem[];
+    categories: Category[];
+    departments: Department[];
+    kotConfig: KOTConfig | null;
+    billConfig: BillConfig | null;
+    restaurantSettings: RestaurantSettings | null;
+    priceRules: PriceRule[];
+  };
+  deleted: {
+    tables: string[];
+    orders: string[];
+    menuItems: string[];
+    categories: string[];
+    departments: string[];
+    priceRules: string[];
+  };
+}
+
+// Pass the watermark of the previous sync; changes are upserts (some rows may repeat)
+export const syncChanges = async (since?: string): Promise<SyncResponse> => {
+  const query = since ? `?since=${encodeURIComponent(since)}` : '';
+  const response = await apiFetch(`${API_BASE_URL}/sync${query}`);
+  return response.json();
+};